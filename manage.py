@@ -6,6 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
+    # Tests default to in-memory SQLite so they need no database server.
+    if sys.argv[1:2] == ['test']:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'task_project.settings_test')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'task_project.settings')
     try:
         from django.core.management import execute_from_command_line
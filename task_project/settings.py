@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tasks.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +51,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'tasks.middleware.WorkspaceMiddleware',
+    'tasks.middleware.RateLimitMiddleware',
 ]
 
 ROOT_URLCONF = 'task_project.urls'
@@ -87,8 +90,93 @@ DATABASES = {
 }
 
 
+# The cache must be shared by all worker processes: writes retire cached
+# calendar counts by bumping a generation in it, which a per-process cache
+# would not see. Run "python manage.py createcachetable" after migrate, or
+# point this at memcached or Redis.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "tasks_cache",
+    }
+}
+
+
+
+
+
+# Tune the Task admin for very large tables: keyset pagination, estimated
+# counts, index-friendly search and set-based bulk actions.
+TASKS_ADMIN_PERFORMANCE_MODE = os.getenv("TASKS_ADMIN_PERFORMANCE_MODE", "0") == "1"
+
+
+# Route only the JSON API from tasks/urls.py; see settings_api.py.
+TASKS_API_ONLY = False
+
+
+# Workspaces let several teams share one deployment. A request picks one by
+# slug with the X-Workspace header or the workspace cookie, e.g. set by the
+# proxy in front of each team's host name, and otherwise gets DEFAULT.
+# TASK_QUOTA caps the tasks outside the trash of a workspace that has no
+# quota of its own; unset or 0 means no limit.
+# Workspaces are not a security boundary: any client may name any of them.
+# List the proxy's addresses in TRUSTED_PROXIES to accept the header from
+# it alone, and set COOKIE to None so clients cannot pick one either.
+TASKS_WORKSPACES = {
+    "HEADER": "X-Workspace",
+    "TRUSTED_PROXIES": [ip for ip in os.getenv("TASKS_WORKSPACE_TRUSTED_PROXIES", "").split(",") if ip],
+    "COOKIE": "workspace",
+    "DEFAULT": os.getenv("TASKS_DEFAULT_WORKSPACE", "default"),
+    "TASK_QUOTA": int(os.getenv("TASKS_WORKSPACE_TASK_QUOTA") or 0) or None,
+}
 
 
+# Per-client token bucket for the task views and API. With more than one
+# worker process, use tasks.throttle.CacheBucketStore on a shared cache.
+# Setting WORKSPACE_RATE adds a bucket shared by each workspace's clients.
+# Behind a proxy, set CLIENT_IP_HEADER to the header it puts the client
+# address in, or all anonymous clients share the proxy's bucket.
+TASKS_RATE_LIMIT = {
+    "RATE": float(os.getenv("TASKS_RATE_LIMIT_RATE", "10")),
+    "BURST": int(os.getenv("TASKS_RATE_LIMIT_BURST", "50")),
+    "STORE": os.getenv("TASKS_RATE_LIMIT_STORE", "tasks.throttle.InMemoryBucketStore"),
+    "WORKSPACE_RATE": float(os.getenv("TASKS_RATE_LIMIT_WORKSPACE_RATE", "0")) or None,
+    "WORKSPACE_BURST": int(os.getenv("TASKS_RATE_LIMIT_WORKSPACE_BURST", "200")),
+    "CLIENT_IP_HEADER": os.getenv("TASKS_RATE_LIMIT_CLIENT_IP_HEADER") or None,
+}
+
+
+# Deleted tasks stay in the trash, restorable, for this many days before
+# the purge_tasks command removes them for good.
+TASKS_TRASH_RETENTION_DAYS = int(os.getenv("TASKS_TRASH_RETENTION_DAYS", "30"))
+
+
+# Columnar task snapshots written by the snapshot_tasks command and
+# downloaded from /tasks/api/snapshot/; the web server may also serve DIR
+# directly. None disables the download.
+TASKS_SNAPSHOTS = {
+    "DIR": os.getenv("TASKS_SNAPSHOT_DIR", str(BASE_DIR / "snapshots")) or None,
+}
+
+
+# Task indexes leave out trashed rows; MySQL, which has no partial indexes,
+# creates them as plain indexes and would warn about it on every command.
+SILENCED_SYSTEM_CHECKS = ["models.W037"]
+
+
+# Prometheus metrics served at /metrics. With more than one worker process,
+# set DIR to a directory all workers can write (e.g. a tmpfs mount) so the
+# scraped worker reports the totals of all of them. None disables metrics.
+# Only ALLOWED_IPS may scrape, or clients sending "Authorization: Bearer
+# TOKEN". Behind a proxy on the same host every request comes from
+# 127.0.0.1, so set TOKEN and empty ALLOWED_IPS, or do not proxy /metrics.
+TASKS_METRICS = {
+    "DIR": os.getenv("TASKS_METRICS_DIR") or None,
+    "FLUSH_INTERVAL": float(os.getenv("TASKS_METRICS_FLUSH_INTERVAL", "1")),
+    "ALLOWED_IPS": [ip for ip in os.getenv("TASKS_METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",") if ip],
+    "TOKEN": os.getenv("TASKS_METRICS_TOKEN") or None,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -0,0 +1,44 @@
+"""
+Lean settings for workers that only serve the JSON API.
+
+Leaves out the admin, sessions, messages, CSRF and static files, and routes
+only /tasks/api/..., so a worker imports and keeps far less in memory.
+Requests are anonymous: without sessions there is no logged-in user, and
+history entries written here have no changed_by.
+
+    DJANGO_SETTINGS_MODULE=task_project.settings_api gunicorn task_project.wsgi
+
+Compare startup with: python manage.py import_report --compare task_project.settings_api
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    # auth and contenttypes provide the user model TaskHistory refers to.
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'tasks',
+]
+
+MIDDLEWARE = [
+    'tasks.middleware.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'tasks.middleware.WorkspaceMiddleware',
+    'tasks.middleware.RateLimitMiddleware',
+]
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+            ],
+        },
+    },
+]
+
+TASKS_API_ONLY = True
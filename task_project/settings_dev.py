@@ -0,0 +1,27 @@
+"""
+Development settings for task_project.
+
+Uses a SQLite file next to manage.py instead of MySQL, for working on the
+app without Docker:
+
+    DJANGO_SETTINGS_MODULE=task_project.settings_dev python manage.py migrate
+    DJANGO_SETTINGS_MODULE=task_project.settings_dev python manage.py runserver
+"""
+
+from .settings import *  # noqa: F401,F403
+
+SECRET_KEY = os.environ.get("SECRET_KEY", "insecure-dev-key")
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+    }
+}
+
+# runserver is a single process, so a local cache is shared by all requests.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
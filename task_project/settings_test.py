@@ -0,0 +1,36 @@
+"""
+Test settings for task_project.
+
+Runs the test suite against in-memory SQLite, so no database server is
+needed. manage.py selects this module for the ``test`` command unless
+DJANGO_SETTINGS_MODULE is set, e.g. to run the tests on MySQL:
+
+    DJANGO_SETTINGS_MODULE=task_project.settings python manage.py test
+"""
+
+from .settings import *  # noqa: F401,F403
+
+SECRET_KEY = os.environ.get("SECRET_KEY", "insecure-test-key")
+
+DEBUG = False
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Hashing with the default PBKDF2 settings dominates tests that create users.
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.MD5PasswordHasher",
+]
+
+# Tests that exercise rate limiting enable it with override_settings.
+TASKS_RATE_LIMIT = None
@@ -14,11 +14,19 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 
+from tasks.metrics import metrics_view
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('tasks/', include('tasks.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
+# The lean API settings leave the admin out of INSTALLED_APPS.
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+
@@ -1,5 +1,158 @@
-from django.contrib import admin
-from .models import Task
+import copy
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import ValidationError
+from django.template.response import TemplateResponse
+from .db import bounded_count
+from .models import (
+    Tag, Task, TaskDependency, TaskHistory, TaskTag, Workspace, WorkspaceTag,
+    parse_tag_names, popular_tags, tag_link_counts,
+)
+from .views import CONFLICT_MESSAGE
+
+
+class TagFilter(admin.SimpleListFilter):
+    """
+    Filter tasks by tag.
+    
+    Lists the most used tags in the workspace. The URL value may also name
+    several tags, separated by ',' to require all of them or by '|' to
+    accept any.
+    """
+    
+    title = 'tag'
+    parameter_name = 'tag'
+    
+    def lookups(self, request, model_admin):
+        return [
+            (name, f'{name} ({count})') for name, count in popular_tags(20, workspace=request.workspace)
+        ]
+    
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        if '|' in value:
+            return queryset.with_tags(parse_tag_names(value.split('|')), match='any', workspace=request.workspace)
+        return queryset.with_tags(parse_tag_names(value), match='all', workspace=request.workspace)
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist paginated by primary key instead of OFFSET and COUNT(*).
+    
+    Pages are addressed by the ``after`` cursor (the last id shown), so
+    deep pages cost the same as the first one. The result count comes from
+    the workspace's task count when nothing is filtered or searched, and
+    from a bounded count otherwise, so it may be approximate.
+    """
+    
+    cursor_var = 'after'
+    keyset = True
+    
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = None
+        if self.cursor_var in request.GET:
+            try:
+                self.cursor = int(request.GET[self.cursor_var])
+            except ValueError:
+                pass
+            # The base class rejects query parameters it cannot filter on.
+            request = copy.copy(request)
+            request.GET = request.GET.copy()
+            del request.GET[self.cursor_var]
+        super().__init__(request, *args, **kwargs)
+        self.add_facets = False
+        self.is_facets_optional = False
+    
+    def get_results(self, request):
+        queryset = self.queryset
+        if self.cursor is not None:
+            queryset = queryset.filter(pk__lt=self.cursor)
+        rows = list(queryset[:self.list_per_page + 1])
+        has_next = len(rows) > self.list_per_page
+        self.result_list = rows[:self.list_per_page]
+        self.next_url = None
+        if has_next:
+            self.next_url = self.get_query_string({self.cursor_var: self.result_list[-1].pk})
+        self.first_url = None
+        if self.cursor is not None:
+            self.first_url = self.get_query_string(remove=[self.cursor_var])
+        
+        if self.get_filters_params() or self.query:
+            self.result_count, self.result_count_exact = bounded_count(
+                self.queryset, self.model_admin.count_limit
+            )
+        else:
+            # The cached workspace may be a minute old.
+            self.result_count, self.result_count_exact = request.workspace.task_count, False
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = has_next or self.cursor is not None
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+
+
+class TaskTagInline(admin.TabularInline):
+    model = TaskTag
+    autocomplete_fields = ('tag',)
+    extra = 1
+
+
+
+class TaskDependencyInline(admin.TabularInline):
+    model = TaskDependency
+    fk_name = 'blocked'
+    raw_id_fields = ('blocker',)
+    verbose_name = 'blocker'
+    verbose_name_plural = 'blocked by'
+    extra = 1
+
+
+class TaskAdminForm(forms.ModelForm):
+    """
+    Task form that puts new tasks in the workspace of the request.
+    
+    Edits submit the version they were loaded with and are refused if the
+    task was saved in the meantime, like TaskForm edits.
+    """
+    
+    loaded_version = forms.IntegerField(required=False, widget=forms.HiddenInput)
+    
+    # Set per request by TaskAdmin.get_form().
+    workspace = None
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Before validation, so the parent and quota are checked against it.
+        if self.instance._state.adding and self.workspace is not None:
+            self.instance.workspace = self.workspace
+        if not self.instance._state.adding:
+            self.fields['loaded_version'].initial = self.instance.version
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.instance._state.adding:
+            return cleaned_data
+        # The admin validates and saves in one transaction, so the row stays
+        # locked until this edit is written.
+        current = (
+            Task.all_objects.select_for_update()
+            .filter(pk=self.instance.pk)
+            .values_list('version', flat=True)
+            .first()
+        )
+        if current != cleaned_data.get('loaded_version'):
+            # Rebased, so submitting again overwrites the other change.
+            self.data = self.data.copy()
+            self.data['loaded_version'] = current
+            raise ValidationError(CONFLICT_MESSAGE)
+        return cleaned_data
 
 
 @admin.register(Task)
@@ -7,28 +160,202 @@ class TaskAdmin(admin.ModelAdmin):
     """
     Admin interface for Task model.
     
+    Lists and edits the tasks of the request's workspace only.
+    
     Features:
     - List display: Shows title, due_date, priority, and status
-    - Filters: Filter by status and priority
+    - Filters: Filter by status, priority and tags
     - Search: Search by title and description
     - Ordering: Default ordering by -created_at
+    - Actions: Set-based status changes
+    
+    With settings.TASKS_ADMIN_PERFORMANCE_MODE the changelist is tuned for
+    very large tables: keyset pagination, approximate counts, no facets,
+    prefix/id search that can use an index, and a delete action that does
+    not load each task. The date filter reads the (workspace, created_at)
+    index.
     """
     
-    list_display = ('title', 'due_date', 'priority', 'status', 'created_at')
-    list_filter = ('status', 'priority', 'created_at')
+    list_display = ('title', 'due_date', 'priority', 'status', 'tag_list', 'created_at')
+    list_filter = ('status', 'priority', TagFilter, 'created_at')
     search_fields = ('title', 'description')
     ordering = ('-created_at',)
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'version')
+    raw_id_fields = ('parent',)
+    inlines = (TaskTagInline, TaskDependencyInline)
+    actions = ('mark_todo', 'mark_in_progress', 'mark_done')
+    form = TaskAdminForm
+    
+    # Rows counted at most for filtered changelists in performance mode.
+    count_limit = 10000
     
     fieldsets = (
         ('Task Information', {
-            'fields': ('title', 'description'),
+            'fields': ('title', 'description', 'loaded_version'),
         }),
         ('Task Details', {
-            'fields': ('due_date', 'priority', 'status'),
+            'fields': ('due_date', 'priority', 'status', 'parent'),
         }),
         ('Timestamps', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('created_at', 'updated_at', 'version'),
             'classes': ('collapse',),
         }),
     )
+    
+    def performance_mode(self):
+        return getattr(settings, 'TASKS_ADMIN_PERFORMANCE_MODE', False)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(workspace=request.workspace).prefetch_related('tags')
+    
+    def get_form(self, request, obj=None, **kwargs):
+        # get_form() builds a new class on every call, so this is per request.
+        form = super().get_form(request, obj, **kwargs)
+        form.workspace = request.workspace
+        return form
+    
+    def get_changelist(self, request, **kwargs):
+        if self.performance_mode():
+            return KeysetChangeList
+        return super().get_changelist(request, **kwargs)
+    
+    def get_ordering(self, request):
+        if self.performance_mode():
+            return ('-pk',)
+        return super().get_ordering(request)
+    
+    def get_sortable_by(self, request):
+        if self.performance_mode():
+            return ()
+        return super().get_sortable_by(request)
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not self.performance_mode() or not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        # An id, or a title prefix: both are answered from an index,
+        # unlike the default LIKE '%term%' over title and description.
+        search_term = search_term.strip()
+        if search_term.isdigit():
+            return queryset.filter(pk=int(search_term)), False
+        return queryset.filter(title__istartswith=search_term), False
+    
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if self.performance_mode() and 'delete_selected' in actions:
+            del actions['delete_selected']
+            actions['bulk_delete'] = self.get_action('bulk_delete')
+        return actions
+    
+    def _set_status(self, request, queryset, status):
+        updated = queryset.bulk_set_status(status, user=request.user)
+        self.message_user(request, f"{updated} task(s) marked as {status}.", messages.SUCCESS)
+    
+    @admin.action(description='Mark selected tasks as To Do', permissions=['change'])
+    def mark_todo(self, request, queryset):
+        self._set_status(request, queryset, 'To Do')
+    
+    @admin.action(description='Mark selected tasks as In Progress', permissions=['change'])
+    def mark_in_progress(self, request, queryset):
+        self._set_status(request, queryset, 'In Progress')
+    
+    @admin.action(description='Mark selected tasks as Done', permissions=['change'])
+    def mark_done(self, request, queryset):
+        self._set_status(request, queryset, 'Done')
+    
+    @admin.action(description='Delete selected tasks', permissions=['delete'])
+    def bulk_delete(self, request, queryset):
+        """
+        Delete tasks with set-based statements after a confirmation page.
+        
+        Unlike the built-in delete_selected, the confirmation page does not
+        list (or load) every task that is about to be deleted.
+        """
+        if request.POST.get('post'):
+            deleted = queryset.bulk_delete()
+            self.message_user(request, f"Deleted {deleted} task(s), including subtasks.", messages.SUCCESS)
+            return None
+        count, exact = bounded_count(queryset, self.count_limit)
+        select_across = request.POST.get('select_across') == '1'
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Are you sure?',
+            'opts': self.model._meta,
+            'count': count,
+            'count_exact': exact,
+            'select_across': select_across,
+            # The changelist insists on selected ids even with select_across.
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/tasks/task/bulk_delete_confirmation.html', context)
+    
+    @admin.display(description='Tags')
+    def tag_list(self, obj):
+        return ', '.join(tag.name for tag in obj.tags.all())
+    
+    def save_model(self, request, obj, form, change):
+        """Save the task and record its changed fields in the audit trail."""
+        changes = obj.diff()
+        super().save_model(request, obj, form, change)
+        TaskHistory.objects.record(obj, changes, user=request.user)
+    
+    def save_related(self, request, form, formsets, change):
+        """Save the inlines and apply their tag link changes to the workspace's tag counts."""
+        tasks = Task.objects.filter(pk=form.instance.pk)
+        before = tag_link_counts(tasks)
+        super().save_related(request, form, formsets, change)
+        after = tag_link_counts(tasks)
+        WorkspaceTag.objects.add_counts({key: after[key] - before[key] for key in before | after})
+
+
+@admin.register(Workspace)
+class WorkspaceAdmin(admin.ModelAdmin):
+    """
+    Admin interface for Workspace model.
+    """
+    
+    list_display = ('name', 'slug', 'task_count', 'task_quota', 'created_at')
+    search_fields = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ('task_count', 'created_at')
+    actions = ('recount_tasks',)
+    
+    @admin.action(description='Recount tasks and tags of selected workspaces', permissions=['change'])
+    def recount_tasks(self, request, queryset):
+        updated = queryset.recount_tasks()
+        queryset.recount_tags()
+        self.message_user(request, f"Recounted the tasks and tags of {updated} workspace(s).", messages.SUCCESS)
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    """
+    Admin interface for Tag model.
+    """
+    
+    list_display = ('name',)
+    search_fields = ('name',)
+
+
+@admin.register(TaskHistory)
+class TaskHistoryAdmin(admin.ModelAdmin):
+    """
+    Read-only admin for the audit trail of the request's workspace.
+    """
+    
+    list_display = ('task', 'changed_at', 'changed_by', 'changed_fields')
+    list_select_related = ('task', 'changed_by')
+    raw_id_fields = ('task',)
+    date_hierarchy = 'changed_at'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(task__workspace=request.workspace)
+    
+    def changed_fields(self, obj):
+        return ', '.join(obj.changes)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,421 @@
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods
+
+from .coalesce import coalesce_get
+from .forms import TaskForm
+from .snapshot import snapshot_path
+from .models import QuotaExceededError, Task, TaskTag, StaleTaskError, parse_tag_names
+from .timeline import (
+    CALENDAR_TASK_LIMIT, CALENDAR_VIEWS, calendar_range, day_counts,
+    parse_anchor, tasks_between,
+)
+from .validation import task_validator
+
+
+VALID_STATUSES = [status for status, _ in Task.STATUS_CHOICES]
+
+VALID_SORT_FIELDS = [
+    'priority', '-priority',
+    'due_date', '-due_date',
+    'created_at', '-created_at',
+]
+
+# Largest JSON array accepted by a bulk create.
+MAX_BULK_CREATE = 1000
+
+# Tasks per page of task_list and ready_tasks, by default and at most.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def task_to_dict(task, tags=None):
+    """
+    Serialize a task to a JSON-compatible dict.
+    
+    ``tags`` is the list of tag names if already known; otherwise they
+    are read from ``task.tags``, which should be prefetched.
+    """
+    if tags is None:
+        tags = [tag.name for tag in task.tags.all()]
+    return {
+        'id': task.pk,
+        'title': task.title,
+        'description': task.description,
+        'due_date': task.due_date.isoformat(),
+        'priority': task.priority,
+        'status': task.status,
+        'created_at': task.created_at.isoformat(),
+        'updated_at': task.updated_at.isoformat(),
+        'version': task.version,
+        'tags': tags,
+        'parent': task.parent_id,
+    }
+
+
+def tag_names_by_task(links):
+    """Map task ids to tag names from a TaskTag queryset in one query."""
+    names = defaultdict(list)
+    for task_id, name in links.order_by('tag__name').values_list('task_id', 'tag__name'):
+        names[task_id].append(name)
+    return names
+
+
+def _json_body(request, many=False):
+    try:
+        data = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if many and isinstance(data, list):
+        return data
+    if not isinstance(data, dict):
+        return None
+    if isinstance(data.get('tags'), list):
+        # TaskForm takes tags as comma-separated text.
+        data['tags'] = ', '.join(parse_tag_names(data['tags']))
+    return data
+
+
+def _request_user(request):
+    # API-only workers (settings_api) run without sessions or auth middleware.
+    return getattr(request, 'user', None)
+
+
+def _bad_request(errors):
+    return JsonResponse({'errors': errors}, status=400)
+
+
+def _quota_exceeded(exc):
+    return JsonResponse({'errors': {'__all__': [str(exc)]}}, status=403)
+
+
+def _paginate(request, tasks, sort_by):
+    """
+    Return a JSON response with one page of ``tasks`` ordered by ``sort_by``.
+    
+    Pages are addressed by ``after``, the id of the last task of the
+    previous page, which the response returns as ``next`` while there are
+    more tasks. ``limit`` sets the page size, up to MAX_PAGE_SIZE. Ties in
+    ``sort_by`` are ordered by id, so the cursor's own sort value and id
+    pick up exactly where the previous page stopped, at the cost of one
+    lookup by primary key instead of an OFFSET.
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return _bad_request({'limit': ['Must be a number.']})
+    field = sort_by.lstrip('-')
+    lookup = 'lt' if sort_by.startswith('-') else 'gt'
+    if 'after' in request.GET:
+        try:
+            after = int(request.GET['after'])
+            # Trashed tasks still work as a cursor.
+            value = Task.all_objects.values_list(field, flat=True).get(pk=after, workspace=request.workspace)
+        except (ValueError, Task.DoesNotExist):
+            return _bad_request({'after': ['Must be the id of a task in this workspace.']})
+        tasks = tasks.filter(
+            Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'pk__{lookup}': after})
+        )
+    page = list(
+        tasks.order_by(sort_by, '-pk' if lookup == 'lt' else 'pk').prefetch_related('tags')[:limit + 1]
+    )
+    return JsonResponse({
+        'results': [task_to_dict(task) for task in page[:limit]],
+        'next': page[limit - 1].pk if len(page) > limit else None,
+    })
+
+
+# The write views are CSRF exempt: API clients are scripts and services,
+# not pages that loaded a CSRF token, and the API does not rely on the
+# session for access; a session user is only recorded in the history.
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@coalesce_get
+def task_list(request):
+    """
+    List tasks, or create one task or a JSON array of tasks.
+    
+    An array is validated as a whole; if any item is invalid nothing is
+    created and ``errors`` maps item indexes to their field errors. Tasks
+    belong to the request's workspace; creating more than its quota
+    allows is refused with 403.
+    
+    GET Parameters:
+    - status: Filter tasks by status (To Do, In Progress, Done)
+    - sort: Sort tasks by 'priority', 'due_date' or 'created_at'
+    - tag: Filter tasks by comma-separated tag names; may be repeated
+    - tag_mode: 'any' (default) or 'all' of the given tags
+    - after, limit: Page cursor and size; see _paginate()
+    """
+    if request.method == 'POST':
+        data = _json_body(request, many=True)
+        if data is None:
+            return _bad_request({'__all__': ['Request body must be a JSON object or array.']})
+        if isinstance(data, list):
+            return _bulk_create(request, data)
+        form = TaskForm(data, workspace=request.workspace)
+        if not form.is_valid():
+            return _bad_request(form.errors)
+        try:
+            task = form.save(user=_request_user(request))
+        except QuotaExceededError as exc:
+            return _quota_exceeded(exc)
+        return JsonResponse(task_to_dict(task), status=201)
+    
+    tasks = Task.objects.filter(workspace=request.workspace)
+    
+    status_filter = request.GET.get('status', '')
+    if status_filter in VALID_STATUSES:
+        tasks = tasks.filter(status=status_filter)
+    
+    tag_mode = 'all' if request.GET.get('tag_mode') == 'all' else 'any'
+    tag_filter = parse_tag_names(','.join(request.GET.getlist('tag')))
+    tasks = tasks.with_tags(tag_filter, match=tag_mode, workspace=request.workspace)
+    
+    sort_by = request.GET.get('sort', '-created_at')
+    if sort_by not in VALID_SORT_FIELDS:
+        sort_by = '-created_at'
+    return _paginate(request, tasks, sort_by)
+
+
+def _bulk_create(request, rows):
+    if len(rows) > MAX_BULK_CREATE:
+        return _bad_request({'__all__': [f'At most {MAX_BULK_CREATE} tasks can be created at once.']})
+    cleaned, errors = task_validator.validate_many(rows)
+    if errors:
+        return _bad_request(errors)
+    try:
+        tasks = Task.objects.bulk_import(cleaned, user=_request_user(request), workspace=request.workspace)
+    except QuotaExceededError as exc:
+        return _quota_exceeded(exc)
+    return JsonResponse({
+        'results': [task_to_dict(task, tags=row['tags']) for task, row in zip(tasks, cleaned)]
+    }, status=201)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'PUT', 'PATCH', 'DELETE'])
+def task_detail(request, pk):
+    """
+    Retrieve, update or delete a task.
+    
+    PUT and PATCH must send the ``version`` that was read. If the task has
+    been saved since, nothing is written and the response is 409 Conflict
+    with the current task in ``current``. DELETE moves the task and its
+    subtasks to the trash; see restore_task().
+    """
+    task = get_object_or_404(Task, pk=pk, workspace=request.workspace)
+    
+    if request.method == 'GET':
+        return JsonResponse(task_to_dict(task))
+    
+    if request.method == 'DELETE':
+        task.soft_delete(user=_request_user(request))
+        return HttpResponse(status=204)
+    
+    data = _json_body(request)
+    if data is None:
+        return _bad_request({'__all__': ['Request body must be a JSON object.']})
+    if 'version' not in data:
+        return _bad_request({'version': ['This field is required.']})
+    if request.method == 'PATCH':
+        # Fill in the fields that were not sent from the stored task.
+        current = task_to_dict(task)
+        current['tags'] = ', '.join(current['tags'])
+        fields = [*TaskForm.Meta.fields, 'tags']
+        data = {**{name: current[name] for name in fields}, **data}
+    
+    form = TaskForm(data, instance=task)
+    if not form.is_valid():
+        return _bad_request(form.errors)
+    try:
+        task = form.save(user=_request_user(request))
+    except StaleTaskError:
+        # 404 if the conflicting change was moving the task to the trash.
+        current = get_object_or_404(Task, pk=pk)
+        return JsonResponse(
+            {'error': 'conflict', 'current': task_to_dict(current)},
+            status=409,
+        )
+    return JsonResponse(task_to_dict(task))
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+def restore_task(request, pk):
+    """
+    Take a task out of the trash, with the subtasks deleted along with it.
+    
+    Refused with 403 if the workspace has no room for them.
+    """
+    task = get_object_or_404(
+        Task.all_objects.filter(workspace=request.workspace, deleted_at__isnull=False), pk=pk
+    )
+    try:
+        task.restore(user=_request_user(request))
+    except QuotaExceededError as exc:
+        return _quota_exceeded(exc)
+    task.refresh_from_db()
+    return JsonResponse(task_to_dict(task))
+
+
+@require_http_methods(['GET'])
+def task_tree(request, pk):
+    """
+    Return a task and all of its subtasks, parents before children.
+    
+    Each node has ``depth`` (relative to the requested task) and
+    ``is_blocked``. The whole tree takes a fixed number of queries.
+    """
+    root = get_object_or_404(Task.objects.with_blocked(), pk=pk, workspace=request.workspace)
+    descendants = Task.objects.subtree(root)
+    nodes = descendants.with_blocked().order_by('path', 'pk')
+    # Flat (task, tag) rows are far cheaper than prefetching 10k managers.
+    tags = tag_names_by_task(TaskTag.objects.filter(
+        Q(task_id=root.pk) | Q(task__in=descendants.values('pk'))
+    ))
+    base_depth = root.depth
+    results = []
+    for task in [root, *nodes]:
+        node = task_to_dict(task, tags=tags.get(task.pk, []))
+        node['depth'] = task.depth - base_depth
+        node['is_blocked'] = task.is_blocked
+        results.append(node)
+    return JsonResponse({'results': results})
+
+
+@require_http_methods(['GET'])
+def ready_tasks(request):
+    """
+    List tasks that can be started: not Done and all blockers Done.
+    
+    GET Parameters:
+    - sort: Sort tasks by 'priority', 'due_date' or 'created_at'
+    - after, limit: Page cursor and size; see _paginate()
+    """
+    sort_by = request.GET.get('sort', 'priority')
+    if sort_by not in VALID_SORT_FIELDS:
+        sort_by = 'priority'
+    return _paginate(request, Task.objects.filter(workspace=request.workspace).ready(), sort_by)
+
+
+@require_http_methods(['GET'])
+@coalesce_get
+def task_calendar(request):
+    """
+    Return per-day task counts, and for week and agenda the tasks, by due date.
+    
+    GET Parameters:
+    - view: 'month' (default), 'week' or 'agenda'
+    - date: Any day in the period, as YYYY-MM-DD (default: today)
+    - status: Filter tasks by status (To Do, In Progress, Done)
+    - tag: Filter tasks by comma-separated tag names; may be repeated
+    - tag_mode: 'any' (default) or 'all' of the given tags
+    
+    ``counts`` maps each day in [start, end) that has tasks to their
+    number. ``truncated`` is true if more than CALENDAR_TASK_LIMIT tasks
+    are due in the period.
+    """
+    view = request.GET.get('view', 'month')
+    if view not in CALENDAR_VIEWS:
+        return _bad_request({'view': [f"Must be one of: {', '.join(CALENDAR_VIEWS)}."]})
+    anchor = parse_anchor(request.GET.get('date'))
+    status_filter = request.GET.get('status', '')
+    if status_filter not in VALID_STATUSES:
+        status_filter = ''
+    tag_filter = parse_tag_names(','.join(request.GET.getlist('tag')))
+    tag_mode = 'all' if request.GET.get('tag_mode') == 'all' else 'any'
+    
+    start, end, previous, following = calendar_range(view, anchor)
+    counts = day_counts(request.workspace, start, end, status_filter, tag_filter, tag_mode)
+    data = {
+        'view': view,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'previous': previous.isoformat(),
+        'next': following.isoformat(),
+        'counts': {day.isoformat(): count for day, count in sorted(counts.items())},
+    }
+    if view != 'month':
+        tasks = list(
+            tasks_between(request.workspace, start, end, status_filter, tag_filter, tag_mode)
+            .order_by('due_date', 'priority', 'pk')
+            .prefetch_related('tags')[:CALENDAR_TASK_LIMIT + 1]
+        )
+        data['truncated'] = len(tasks) > CALENDAR_TASK_LIMIT
+        data['results'] = [task_to_dict(task) for task in tasks[:CALENDAR_TASK_LIMIT]]
+    return JsonResponse(data)
+
+
+@csrf_exempt
+@require_http_methods(['PUT'])
+def task_relations(request, pk):
+    """
+    Set a task's parent and blockers.
+    
+    Body: {"parent": <id or null>, "blocked_by": [<id>, ...]}. Either key
+    may be omitted to leave it unchanged. Cycles are refused with 400.
+    Parents and blockers must be in the request's workspace.
+    """
+    tasks = Task.objects.filter(workspace=request.workspace)
+    task = get_object_or_404(tasks, pk=pk)
+    data = _json_body(request)
+    if data is None:
+        return _bad_request({'__all__': ['Request body must be a JSON object.']})
+    
+    try:
+        with transaction.atomic():
+            if 'parent' in data:
+                parent_id = data['parent']
+                task.parent = None if parent_id is None else get_object_or_404(tasks, pk=parent_id)
+                # Only the parent, so edits saved since the task was read
+                # are kept; save() adds path and version.
+                task.save(update_fields=['parent', 'updated_at'])
+            if 'blocked_by' in data:
+                blockers = tasks.filter(pk__in=data['blocked_by'] or [])
+                task.set_blockers(blockers)
+    except ValidationError as exc:
+        return _bad_request(exc.message_dict if hasattr(exc, 'error_dict') else {'__all__': exc.messages})
+    except (TypeError, ValueError):
+        return _bad_request({'__all__': ['parent must be an id or null and blocked_by a list of ids.']})
+    
+    return JsonResponse({
+        **task_to_dict(task),
+        'blocked_by': sorted(task.blocked_by.values_list('pk', flat=True)),
+    })
+
+
+def _snapshot_modified(request):
+    path = snapshot_path(request.workspace.slug)
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
+    except (TypeError, OSError):
+        return None
+
+
+@require_http_methods(['GET', 'HEAD'])
+@condition(last_modified_func=_snapshot_modified)
+def task_snapshot(request):
+    """
+    Download the latest task snapshot of the request's workspace.
+    
+    Snapshots are written by the snapshot_tasks command and read with
+    tasks.snapshot.SnapshotReader, without a database. Sends Last-Modified,
+    so clients can poll with If-Modified-Since and get 304 until a newer
+    snapshot is written.
+    """
+    path = snapshot_path(request.workspace.slug)
+    try:
+        f = open(path, 'rb')
+    except (TypeError, OSError):
+        raise Http404("No snapshot has been written for this workspace.")
+    return FileResponse(f, as_attachment=True, content_type='application/octet-stream')
@@ -0,0 +1,162 @@
+"""
+Generic class-based versions of the task views.
+
+tasks/urls.py routes to the function-based views in tasks.views; these
+classes are kept for projects that subclass them. They are loaded on first
+access through tasks.views, so workers that never use them skip this
+module.
+"""
+from django.conf import settings
+from django.http import HttpResponseRedirect
+from django.shortcuts import render
+from django.urls import reverse_lazy
+from django.views import View
+from django.views.generic import CreateView, UpdateView, DeleteView
+from .models import QuotaExceededError, Task, StaleTaskError, parse_tag_names, popular_tags
+from .forms import TaskForm
+from .views import _report_conflict
+
+
+class TaskListView(View):
+    """
+    View to display all tasks with filtering and sorting capabilities.
+    
+    GET Parameters:
+    - status: Filter tasks by status (To Do, In Progress, Done)
+    - sort: Sort tasks by 'priority' or 'due_date'
+    - tag: Filter tasks by comma-separated tag names; may be repeated
+    - tag_mode: 'any' (default) or 'all' of the given tags
+    """
+    
+    template_name = 'tasks/task_list.html'
+    
+    def get(self, request):
+        """
+        Handle GET request to display filtered and sorted tasks.
+        """
+        # Get all tasks of the workspace
+        tasks = Task.objects.filter(workspace=request.workspace)
+        
+        # Get filter and sort parameters from request
+        status_filter = request.GET.get('status', '')
+        sort_by = request.GET.get('sort', '-created_at')
+        
+        # Apply status filter if provided
+        if status_filter and status_filter in ['To Do', 'In Progress', 'Done']:
+            tasks = tasks.filter(status=status_filter)
+        
+        # Apply tag filter if provided
+        tag_filter = parse_tag_names(','.join(request.GET.getlist('tag')))
+        tag_mode = 'all' if request.GET.get('tag_mode') == 'all' else 'any'
+        tasks = tasks.with_tags(tag_filter, match=tag_mode, workspace=request.workspace).prefetch_related('tags')
+        
+        # Apply sorting
+        valid_sort_fields = [
+            'priority', '-priority',
+            'due_date', '-due_date',
+            'created_at', '-created_at'
+        ]
+        if sort_by in valid_sort_fields:
+            tasks = tasks.order_by(sort_by)
+        else:
+            tasks = tasks.order_by('-created_at')
+        
+        # Prepare context data
+        context = {
+            'tasks': tasks,
+            'status_choices': Task.STATUS_CHOICES,
+            'priority_choices': Task.PRIORITY_CHOICES,
+            'current_status_filter': status_filter,
+            'current_sort': sort_by,
+            'tag_counts': popular_tags(workspace=request.workspace),
+            'current_tag_filter': tag_filter,
+            'current_tag_mode': tag_mode,
+        }
+        
+        return render(request, self.template_name, context)
+
+
+class WorkspaceTaskMixin:
+    """Limit single-task views to tasks in the request's workspace."""
+    
+    def get_queryset(self):
+        return Task.objects.filter(workspace=self.request.workspace)
+
+
+# Create Task View
+class TaskCreateView(CreateView):
+    """
+    View to create a new task in the request's workspace.
+    """
+    model = Task
+    form_class = TaskForm
+    template_name = 'tasks/task_form.html'
+    success_url = reverse_lazy('tasks:task_list')
+    
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['workspace'] = self.request.workspace
+        return kwargs
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = 'Add New Task'
+        context['button_text'] = 'Create Task'
+        return context
+    
+    def form_valid(self, form):
+        try:
+            self.object = form.save(user=self.request.user)
+        except QuotaExceededError as exc:
+            form.add_error(None, str(exc))
+            response = self.form_invalid(form)
+            response.status_code = 403
+            return response
+        return HttpResponseRedirect(self.get_success_url())
+
+
+# Update Task View
+class TaskUpdateView(WorkspaceTaskMixin, UpdateView):
+    """
+    View to edit an existing task.
+    """
+    model = Task
+    form_class = TaskForm
+    template_name = 'tasks/task_form.html'
+    success_url = reverse_lazy('tasks:task_list')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = f'Edit Task: {self.object.title}'
+        context['button_text'] = 'Update Task'
+        return context
+    
+    def form_valid(self, form):
+        try:
+            self.object = form.save(user=self.request.user)
+        except StaleTaskError:
+            _report_conflict(form, self.object.pk)
+            response = self.form_invalid(form)
+            response.status_code = 409
+            return response
+        return HttpResponseRedirect(self.get_success_url())
+
+
+# Delete Task View
+class TaskDeleteView(WorkspaceTaskMixin, DeleteView):
+    """
+    View to delete a task.
+    """
+    model = Task
+    template_name = 'tasks/task_confirm_delete.html'
+    success_url = reverse_lazy('tasks:task_list')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['retention_days'] = settings.TASKS_TRASH_RETENTION_DAYS
+        return context
+    
+    def form_valid(self, form):
+        # Move to the trash instead of deleting.
+        self.object.soft_delete(user=self.request.user)
+        return HttpResponseRedirect(self.get_success_url())
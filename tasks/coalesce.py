@@ -0,0 +1,115 @@
+import threading
+from functools import wraps
+
+from django.http import HttpResponse
+
+
+# Seconds a request waits for an identical one to finish before rendering
+# the page itself, so one stuck rendering does not hold up the others.
+FOLLOWER_TIMEOUT = 10
+
+
+class SingleFlight:
+    """
+    Run a function once per key for all callers that arrive concurrently.
+    
+    The first caller for a key (the leader) runs the function; callers
+    that arrive while it is running wait and receive the same result or
+    exception. Nothing is cached once the leader finishes.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+    
+    def do(self, key, func, timeout=None):
+        """
+        Return (result, shared) where ``shared`` is False for the leader.
+        
+        A caller that has waited ``timeout`` seconds for the leader stops
+        waiting and runs ``func`` itself, unshared.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            if not call.done.wait(timeout):
+                return func(), False
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = func()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flight = SingleFlight()
+
+
+def coalesce_get(view):
+    """
+    Share one rendering between concurrent identical GET requests.
+    
+    Requests are identical when their workspace, path and query parameters
+    match.
+    Only successful responses are shared; each waiting request gets its
+    own copy, so middleware can still set headers and cookies on it.
+    Waiting requests give up after FOLLOWER_TIMEOUT seconds and render
+    the page themselves.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+        
+        def render():
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            # Copied here, before waiting requests are released: the
+            # leader's middleware goes on to add headers to ``response``.
+            if response.status_code != 200 or response.streaming:
+                return response, None
+            return response, (response.content, list(response.items()))
+        
+        (response, copy), shared = _flight.do(coalesce_key(request), render, timeout=FOLLOWER_TIMEOUT)
+        if not shared:
+            return response
+        if copy is None:
+            # Only successful pages are shared; render this one separately.
+            return view(request, *args, **kwargs)
+        return _copy_response(*copy)
+    return wrapper
+
+
+def coalesce_key(request):
+    """Return the key that identifies identical list requests."""
+    return (
+        request.workspace.pk,
+        request.path,
+        tuple(sorted((name, tuple(values)) for name, values in request.GET.lists())),
+    )
+
+
+def _copy_response(content, headers):
+    copy = HttpResponse(content)
+    for header, value in headers:
+        copy[header] = value
+    return copy
@@ -0,0 +1,9 @@
+def bounded_count(queryset, limit):
+    """
+    Return (count, is_exact) for ``queryset`` without an unbounded COUNT(*).
+    
+    The rows are counted up to ``limit``; a result of ``limit`` means "at
+    least that many".
+    """
+    count = queryset.order_by()[:limit].count()
+    return count, count < limit
@@ -1,5 +1,9 @@
 from django import forms
-from .models import Task
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.models import construct_instance
+from .models import QuotaExceededError, Task, TaskHistory, StaleTaskError, parse_tag_names
+from .validation import task_validator
 
 
 class TaskForm(forms.ModelForm):
@@ -12,6 +16,10 @@ class TaskForm(forms.ModelForm):
     - due_date: Due date for the task
     - priority: Task priority level
     - status: Task status
+    - tags: Comma-separated tag names
+    - version: Hidden; the version the user started editing from
+    
+    New tasks are created in ``workspace``, or the default workspace.
     """
     
     due_date = forms.DateField(
@@ -28,9 +36,23 @@ class TaskForm(forms.ModelForm):
         help_text='Provide details about the task'
     )
     
+    tags = forms.CharField(
+        widget=forms.TextInput(attrs={
+            'placeholder': 'e.g. backend, urgent',
+            'class': 'form-input'
+        }),
+        required=False,
+        help_text='Comma-separated labels'
+    )
+    
+    version = forms.IntegerField(
+        widget=forms.HiddenInput(),
+        required=False
+    )
+    
     class Meta:
         model = Task
-        fields = ['title', 'description', 'due_date', 'priority', 'status']
+        fields = ['title', 'description', 'due_date', 'priority', 'status', 'version']
         widgets = {
             'title': forms.TextInput(attrs={
                 'placeholder': 'Enter task title',
@@ -46,3 +68,84 @@ class TaskForm(forms.ModelForm):
             'priority': 'Select the priority level (1=High, 2=Medium, 3=Low)',
             'status': 'Choose the current status of the task',
         }
+    
+    def __init__(self, *args, workspace=None, **kwargs):
+        if workspace is not None and kwargs.get('instance') is None:
+            kwargs['instance'] = Task(workspace=workspace)
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None and 'tags' not in self.initial:
+            self._initial_tags = [tag.name for tag in self.instance.tags.all()]
+            self.initial['tags'] = ', '.join(self._initial_tags)
+        else:
+            self._initial_tags = parse_tag_names(self.initial.get('tags', ''))
+    
+    def clean_tags(self):
+        return task_validator.clean_tags(self.cleaned_data.get('tags', ''))
+    
+    def clean_version(self):
+        # A missing version means "the version that was just loaded".
+        version = self.cleaned_data.get('version')
+        if version is None:
+            return self.instance.version
+        return version
+    
+    def _post_clean(self):
+        """
+        Copy the cleaned data to the instance and check it with TaskValidator.
+        
+        Replaces ModelForm's instance.full_clean(), which re-runs every model
+        field validator one by one. The form does not edit ``parent``, so
+        Task.clean()'s ancestry check has nothing new to look at.
+        """
+        opts = self._meta
+        try:
+            self.instance = construct_instance(self, self.instance, opts.fields, opts.exclude)
+        except ValidationError as exc:
+            self._update_errors(exc)
+            return
+        _, errors = task_validator.validate(self.cleaned_data, partial=True)
+        for name, messages in errors.items():
+            self.add_error(name, messages)
+    
+    def save(self, commit=True, user=None):
+        """
+        Save the task and record the changed fields in TaskHistory.
+        
+        The task row and its history entry are written in one transaction,
+        so the audit trail never disagrees with the task table. Edits are
+        conditional on the submitted version and raise StaleTaskError if
+        the task was saved by someone else in the meantime. A new task that
+        does not fit in its workspace's quota raises QuotaExceededError.
+        """
+        task = super().save(commit=False)
+        if commit:
+            changes = task.diff()
+            columns = list(changes)
+            tags = self.cleaned_data.get('tags', [])
+            if sorted(tags) != sorted(self._initial_tags):
+                changes['tags'] = [self._initial_tags, tags]
+            quota_error = None
+            with transaction.atomic(savepoint=False):
+                if task._state.adding:
+                    try:
+                        task.save()
+                    except QuotaExceededError as exc:
+                        # Nothing was written; raised below, like StaleTaskError.
+                        quota_error = exc
+                    current = quota_error is None
+                else:
+                    # Only write the columns that actually changed.
+                    current = task.update_if_current(columns)
+                if current:
+                    TaskHistory.objects.record(task, changes, user=user)
+                    self._save_m2m()
+                    if 'tags' in changes:
+                        task.set_tags(tags)
+            if quota_error is not None:
+                raise quota_error
+            if not current:
+                # Raised outside the atomic block, which wrote nothing, so
+                # an enclosing transaction stays usable.
+                raise StaleTaskError(f"Task {task.pk} was modified by someone else.")
+            task.snapshot_loaded_values()
+        return task
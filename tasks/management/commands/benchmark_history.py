@@ -0,0 +1,66 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.forms import ModelForm
+
+from tasks.forms import TaskForm
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare TaskForm.save() latency with and without history recording. "
+        "All rows are rolled back when the benchmark finishes."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument(
+            '--max-ratio', type=float, default=2.0,
+            help='Fail if history makes saves this many times slower (default: 2.0)',
+        )
+    
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        with transaction.atomic():
+            task = Task.objects.create(
+                title='Benchmark task',
+                due_date=date.today() + timedelta(days=7),
+            )
+            # Warm up, then alternate both save paths so that table growth and
+            # cache effects are shared evenly between them.
+            self._time_edit(task, 0, TaskForm.save)
+            baseline = with_history = 0.0
+            for i in range(iterations):
+                # ModelForm.save skips the history bookkeeping in TaskForm.save.
+                baseline += self._time_edit(task, i, ModelForm.save)
+                with_history += self._time_edit(task, i, TaskForm.save)
+            transaction.set_rollback(True)
+        
+        ratio = with_history / baseline
+        self.stdout.write(
+            f"{iterations} edits: baseline {baseline * 1000 / iterations:.3f} ms/save, "
+            f"with history {with_history * 1000 / iterations:.3f} ms/save "
+            f"(x{ratio:.2f})"
+        )
+        if ratio >= options['max_ratio']:
+            raise CommandError(
+                f"History overhead x{ratio:.2f} exceeds x{options['max_ratio']:.2f}"
+            )
+    
+    def _time_edit(self, task, i, save):
+        task = Task.objects.get(pk=task.pk)
+        form = TaskForm({
+            'title': f'Benchmark task {i}',
+            'description': '',
+            'due_date': task.due_date,
+            'priority': (i % 3) + 1,
+            'status': 'In Progress' if i % 2 else 'To Do',
+        }, instance=task)
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        start = time.perf_counter()
+        save(form)
+        return time.perf_counter() - start
@@ -0,0 +1,140 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tasks.models import (
+    Tag, Task, TaskTag, Workspace, default_workspace, popular_tags, tag_counts_cache_key,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate tasks and tags in the default workspace, then time its "
+        "tag-filtered task lists. The generated rows are rolled back unless "
+        "--keep is given."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=1_000_000)
+        parser.add_argument('--tags', type=int, default=10_000)
+        parser.add_argument(
+            '--max-tags-per-task', type=int, default=4,
+            help='Each task gets between 0 and this many tags (default: 4)',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument(
+            '--max-ms', type=float, default=100.0,
+            help='Fail if any median query time exceeds this (default: 100)',
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the generated rows')
+        parser.add_argument('--seed', type=int, default=0)
+    
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.workspace = Workspace.objects.get(pk=default_workspace())
+        with transaction.atomic():
+            tag_names = self._create_tags(options['tags'])
+            self._create_tasks(options)
+            # Tags are picked with a skewed distribution, so the first names
+            # are the popular ones and those further down are rare.
+            popular, rare = tag_names[0], tag_names[len(tag_names) // 2]
+            cases = [
+                ('any, 1 popular tag', [popular], 'any'),
+                ('any, 3 tags', tag_names[:3], 'any'),
+                ('all, 2 popular tags', tag_names[:2], 'all'),
+                ('any, 1 rare tag', [rare], 'any'),
+            ]
+            slowest = 0.0
+            for label, names, match in cases:
+                median = self._time_list(names, match, options)
+                slowest = max(slowest, median)
+                self.stdout.write(f"{label:<22} median {median:8.2f} ms")
+            key = tag_counts_cache_key(self.workspace.pk)
+            median = self._time(
+                lambda: (cache.delete(key), popular_tags(workspace=self.workspace)), options['repeat']
+            )
+            self.stdout.write(f"{'tag counts (uncached)':<22} median {median:8.2f} ms")
+            if not options['keep']:
+                transaction.set_rollback(True)
+        
+        if slowest > options['max_ms']:
+            raise CommandError(
+                f"Tag-filtered list took {slowest:.2f} ms, above {options['max_ms']:.2f} ms"
+            )
+    
+    def _create_tags(self, count):
+        names = [f'bench-tag-{i:05d}' for i in range(count)]
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in names], batch_size=5000, ignore_conflicts=True
+        )
+        ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+        self.tag_ids = [ids[name] for name in names]
+        return names
+    
+    def _create_tasks(self, options):
+        today = date.today()
+        remaining = options['tasks']
+        last_pk = Task.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        started = time.perf_counter()
+        while remaining > 0:
+            size = min(options['batch_size'], remaining)
+            Task.objects.bulk_create([
+                Task(
+                    workspace=self.workspace,
+                    title=f'Benchmark task {i}',
+                    due_date=today + timedelta(days=self.rng.randint(-30, 90)),
+                    priority=self.rng.choice((1, 2, 2, 3)),
+                    status=self.rng.choice(('To Do', 'To Do', 'In Progress', 'Done')),
+                )
+                for i in range(size)
+            ])
+            # MySQL does not return primary keys from bulk inserts.
+            pks = list(Task.objects.filter(pk__gt=last_pk).values_list('pk', flat=True))
+            last_pk = max(pks)
+            links = []
+            for pk in pks:
+                tag_count = self.rng.randint(0, options['max_tags_per_task'])
+                for tag_id in {self._pick_tag() for _ in range(tag_count)}:
+                    links.append(TaskTag(task_id=pk, tag_id=tag_id))
+            TaskTag.objects.bulk_create(links, batch_size=options['batch_size'])
+            remaining -= size
+        # bulk_create() leaves the workspace's task and tag counts alone.
+        Workspace.objects.filter(pk=self.workspace.pk).recount_tasks()
+        Workspace.objects.filter(pk=self.workspace.pk).recount_tags()
+        self.stdout.write(
+            f"Generated {options['tasks']} tasks in {time.perf_counter() - started:.1f} s"
+        )
+    
+    def _pick_tag(self):
+        # Pareto-distributed index: a few tags are on many tasks.
+        index = int(self.rng.paretovariate(1.2)) - 1
+        return self.tag_ids[index % len(self.tag_ids)]
+    
+    def _time_list(self, names, match, options):
+        def run():
+            tasks = (
+                Task.objects.filter(workspace=self.workspace, status='To Do')
+                .with_tags(names, match=match, workspace=self.workspace)
+                .order_by('-priority')
+                .prefetch_related('tags')[:options['page_size']]
+            )
+            for task in tasks:
+                list(task.tags.all())
+        
+        return self._time(run, options['repeat'])
+    
+    def _time(self, func, repeat):
+        func()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
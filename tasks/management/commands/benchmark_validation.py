@@ -0,0 +1,78 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.forms import TaskForm
+from tasks.models import Task
+from tasks.validation import task_validator
+
+
+class Command(BaseCommand):
+    help = (
+        "Time TaskValidator.validate_many() on generated rows, next to "
+        "TaskForm validation of a sample of the same rows."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument(
+            '--form-sample', type=int, default=2000,
+            help='Rows validated with TaskForm to estimate its cost (default: 2000)',
+        )
+        parser.add_argument(
+            '--invalid-ratio', type=float, default=0.05,
+            help='Share of generated rows that are invalid (default: 0.05)',
+        )
+        parser.add_argument(
+            '--max-seconds', type=float, default=1.0,
+            help='Fail if validating all rows takes longer (default: 1.0)',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+    
+    def handle(self, *args, **options):
+        rows = self._rows(options)
+        
+        start = time.perf_counter()
+        cleaned, errors = task_validator.validate_many(rows)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"TaskValidator: {len(rows)} rows in {elapsed * 1000:.1f} ms "
+            f"({len(cleaned)} valid, {len(errors)} invalid)"
+        )
+        
+        sample = rows[:options['form_sample']]
+        if sample:
+            start = time.perf_counter()
+            for row in sample:
+                TaskForm(row).is_valid()
+            form_elapsed = (time.perf_counter() - start) * len(rows) / len(sample)
+            self.stdout.write(
+                f"TaskForm:      {len(rows)} rows in ~{form_elapsed * 1000:.1f} ms "
+                f"(extrapolated from {len(sample)}), x{form_elapsed / elapsed:.1f} slower"
+            )
+        
+        if elapsed > options['max_seconds']:
+            raise CommandError(
+                f"Validating {len(rows)} rows took {elapsed:.2f} s, above {options['max_seconds']:.2f} s"
+            )
+    
+    def _rows(self, options):
+        rng = random.Random(options['seed'])
+        today = date.today()
+        statuses = [value for value, _ in Task.STATUS_CHOICES]
+        rows = []
+        for i in range(options['rows']):
+            row = {
+                'title': f'Imported task {i}',
+                'description': 'Generated for the validation benchmark' if i % 3 else '',
+                'due_date': (today + timedelta(days=rng.randint(-30, 90))).isoformat(),
+                'priority': str(rng.choice((1, 2, 2, 3))),
+                'status': rng.choice(statuses),
+                'tags': 'import, benchmark' if i % 4 == 0 else '',
+            }
+            if rng.random() < options['invalid_ratio']:
+                row[rng.choice(('title', 'due_date', 'priority', 'status'))] = 'x' * 300
+            rows.append(row)
+        return rows
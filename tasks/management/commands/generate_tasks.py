@@ -0,0 +1,131 @@
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+
+from tasks.models import (
+    Tag, Task, TaskTag, Workspace, WorkspaceTag, invalidate_calendar, tag_counts_cache_key,
+    workspace_settings,
+)
+from tasks.synthetic import TaskFactory
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert synthetic tasks with realistic status, priority, due date, "
+        "description and tag distributions, e.g. to load test a local server. "
+        "Rows are inserted in batches without history entries and are not "
+        "limited by the workspace's quota."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=100_000)
+        parser.add_argument(
+            '--tags', type=int, default=50,
+            help='Number of distinct tags to spread over the tasks (default: 50)',
+        )
+        parser.add_argument(
+            '--max-tags-per-task', type=int, default=4,
+            help='Each task gets between 0 and this many tags (default: 4)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Tasks per INSERT and per transaction (default: 5000)',
+        )
+        parser.add_argument(
+            '--workspace', default=workspace_settings().get('DEFAULT', 'default'),
+            help='Slug of the workspace to add the tasks to, created if missing (default: %(default)s)',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+    
+    def handle(self, *args, **options):
+        slug = options['workspace']
+        workspace, _ = Workspace.objects.get_or_create(slug=slug, defaults={'name': slug})
+        factory = TaskFactory(seed=options['seed'], tag_count=options['tags'])
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in factory.tags], batch_size=1000, ignore_conflicts=True
+        )
+        tag_ids = dict(Tag.objects.filter(name__in=factory.tags).values_list('name', 'pk'))
+        
+        total, links = options['tasks'], 0
+        started = time.perf_counter()
+        for done in range(0, total, options['batch_size']):
+            size = min(options['batch_size'], total - done)
+            links += self._insert_batch(workspace, factory, size, tag_ids, options['max_tags_per_task'])
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {done + size} tasks, {(done + size) / (time.perf_counter() - started):.0f}/s")
+        elapsed = time.perf_counter() - started
+        
+        invalidate_calendar(workspace.pk)
+        cache.delete_many([tag_counts_cache_key(), tag_counts_cache_key(workspace.pk)])
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {total} tasks and {links} tag links in {elapsed:.1f} s "
+            f"({total / elapsed if elapsed else 0:.0f} tasks/s)"
+        ))
+    
+    def _insert_batch(self, workspace, factory, size, tag_ids, max_tags):
+        """Insert ``size`` tasks and their tag links; return the number of links."""
+        now = timezone.now()
+        rows = []
+        for _ in range(size):
+            fields = factory.fields()
+            created_at = factory.created_at(now)
+            fields.update(created_at=created_at, updated_at=created_at, workspace_id=workspace.pk)
+            rows.append(fields)
+        with transaction.atomic():
+            last_pk = Task.all_objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+            insert_rows(Task, rows)
+            Workspace.objects.add_tasks(workspace.pk, size, enforce_quota=False)
+            pks = list(Task.all_objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True))
+            if len(pks) != size:
+                raise CommandError("Tasks were inserted concurrently; run the command again.")
+            links = [
+                {'task_id': pk, 'tag_id': tag_ids[name]}
+                for pk in pks
+                for name in factory.tag_names(max_tags)
+            ]
+            insert_rows(TaskTag, links)
+            WorkspaceTag.objects.add_counts(Counter((workspace.pk, link['tag_id']) for link in links))
+        return len(links)
+
+
+def insert_rows(model, rows):
+    """
+    Insert ``rows``, dicts of field attname: value, with one executemany().
+    
+    Going around Model instances and the SQL compiler is several times
+    faster than bulk_create() for millions of rows. Fields missing from
+    the rows get their defaults; date and datetime values are adapted for
+    the database, other values are passed through as they are.
+    """
+    if not rows:
+        return
+    connection = connections[router.db_for_write(model)]
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    columns, adapters, defaults = [], [], []
+    for field in fields:
+        columns.append(connection.ops.quote_name(field.column))
+        if isinstance(field, models.DateTimeField):
+            adapters.append(connection.ops.adapt_datetimefield_value)
+        elif isinstance(field, models.DateField):
+            adapters.append(connection.ops.adapt_datefield_value)
+        else:
+            adapters.append(None)
+        defaults.append(field.get_db_prep_save(field.get_default(), connection))
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join(columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    params = [
+        [
+            (adapt(row[field.attname]) if adapt else row[field.attname]) if field.attname in row else default
+            for field, adapt, default in zip(fields, adapters, defaults)
+        ]
+        for row in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
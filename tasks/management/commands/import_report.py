@@ -0,0 +1,96 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Run in a fresh interpreter: set up Django and load the URLconf, as a
+# worker does before it serves its first request.
+STARTUP_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'modules': len(sys.modules),
+    'maxrss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure worker startup: time to set up Django and load the URLconf, "
+        "modules imported, peak memory, and where the import time goes."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compare', nargs='+', default=[], metavar='SETTINGS_MODULE',
+            help='Also measure these settings modules, e.g. task_project.settings_api',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Cold starts timed per settings module; the median is shown (default: 5)',
+        )
+        parser.add_argument(
+            '--top', type=int, default=15,
+            help='Number of packages listed by import time (default: 15)',
+        )
+    
+    def handle(self, *args, **options):
+        modules = [os.environ.get('DJANGO_SETTINGS_MODULE', 'task_project.settings'), *options['compare']]
+        for module in modules:
+            runs = [self._run(module) for _ in range(options['repeat'])]
+            packages = self._import_times(module)
+            self.stdout.write(self.style.MIGRATE_HEADING(module))
+            self.stdout.write(
+                f"  startup {statistics.median(run['seconds'] for run in runs) * 1000:.0f} ms, "
+                f"{runs[0]['modules']} modules, "
+                f"peak RSS {statistics.median(run['maxrss_kb'] for run in runs) / 1024:.1f} MB"
+            )
+            self.stdout.write(f"  import time by package (total {sum(packages.values()) / 1000:.0f} ms):")
+            for name, micros in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+                self.stdout.write(f"    {micros / 1000:8.1f} ms  {name}")
+    
+    def _run(self, module, *flags):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': module}
+        env.setdefault('SECRET_KEY', 'import-report')
+        result = subprocess.run(
+            [sys.executable, *flags, '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Starting with {module} failed:\n{result.stderr}")
+        if flags:
+            return result
+        return json.loads(result.stdout)
+    
+    def _import_times(self, module):
+        """Return {package: self import time in microseconds} for one cold start."""
+        result = self._run(module, '-X', 'importtime')
+        packages = defaultdict(int)
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                packages[package_name(match.group(4))] += int(match.group(1))
+        return packages
+
+
+def package_name(module):
+    """Group a module under its package, e.g. django.contrib.admin.sites -> django.contrib.admin."""
+    parts = module.split('.')
+    depth = 3 if parts[:2] == ['django', 'contrib'] else 2
+    return '.'.join(parts[:depth])
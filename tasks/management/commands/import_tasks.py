@@ -0,0 +1,88 @@
+import csv
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.models import QuotaExceededError, Task, Workspace, workspace_settings
+from tasks.validation import task_validator
+
+
+class Command(BaseCommand):
+    help = (
+        "Import tasks from a CSV file (with a header row), a JSON array or "
+        "JSON lines. Every row is validated before anything is written."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument(
+            '--format', choices=('csv', 'json', 'jsonl'),
+            help='Input format (default: from the file extension)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows inserted per statement (default: 1000)',
+        )
+        parser.add_argument(
+            '--workspace', default=workspace_settings().get('DEFAULT', 'default'),
+            help='Slug of the workspace to import into (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--skip-invalid', action='store_true',
+            help='Import the valid rows even if some rows are invalid',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only validate the file',
+        )
+        parser.add_argument(
+            '--max-errors', type=int, default=20,
+            help='Number of invalid rows to report (default: 20)',
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            workspace = Workspace.objects.get(slug=options['workspace'])
+        except Workspace.DoesNotExist:
+            raise CommandError(f"Unknown workspace {options['workspace']!r}.")
+        rows = self._read(options['path'], options['format'])
+        cleaned, errors = task_validator.validate_many(rows)
+        for index in list(errors)[:options['max_errors']]:
+            for field, messages in errors[index].items():
+                # Row numbers are 1-based, as in a spreadsheet.
+                self.stderr.write(f"Row {index + 1}: {field}: {' '.join(messages)}")
+        if errors and not options['skip_invalid']:
+            raise CommandError(
+                f"{len(errors)} of {len(rows)} rows are invalid; nothing was imported. "
+                "Use --skip-invalid to import the valid rows."
+            )
+        if options['dry_run']:
+            self.stdout.write(f"{len(cleaned)} valid rows, {len(errors)} invalid rows")
+            return
+        try:
+            tasks = Task.objects.bulk_import(cleaned, batch_size=options['batch_size'], workspace=workspace)
+        except QuotaExceededError as exc:
+            raise CommandError(f"{exc} Nothing was imported.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(tasks)} tasks, skipped {len(errors)} invalid rows"
+        ))
+    
+    def _read(self, path, fmt):
+        fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                if fmt == 'csv':
+                    return list(csv.DictReader(f))
+                if fmt == 'json':
+                    rows = json.load(f)
+                    if not isinstance(rows, list):
+                        raise CommandError("A JSON file must contain an array of tasks.")
+                    return rows
+                if fmt == 'jsonl':
+                    return [json.loads(line) for line in f if line.strip()]
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+        except ValueError as exc:
+            raise CommandError(f"Invalid JSON in {path}: {exc}")
+        raise CommandError(f"Unknown format {fmt!r}; use --format csv, json or jsonl.")
@@ -0,0 +1,321 @@
+import http.client
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.api import VALID_SORT_FIELDS, VALID_STATUSES
+from tasks.models import Task, Workspace, default_workspace, workspace_settings
+from tasks.synthetic import TaskFactory
+
+
+OPERATIONS = ('list', 'filter', 'sort', 'create', 'edit', 'delete')
+
+DEFAULT_MIX = 'list=35,filter=25,sort=15,create=10,edit=10,delete=5'
+
+# Errors a server may cause by closing an idle keep-alive connection.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+def parse_mix(value):
+    """Parse 'list=35,create=10,...' into {operation: weight}."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}'; choose from {', '.join(OPERATIONS)}.")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"Weight of '{name}' must be a number.")
+        if mix[name] < 0:
+            raise ValueError(f"Weight of '{name}' must not be negative.")
+    if not any(mix.values()):
+        raise ValueError("At least one operation needs a positive weight.")
+    return mix
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of sorted ``values``, e.g. fraction=0.95."""
+    if not values:
+        return 0.0
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+class Connection:
+    """
+    Keep-alive HTTP connection to the task API, in one workspace if given.
+    """
+    
+    def __init__(self, url, timeout, workspace=None):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+        self.prefix = parts.path.rstrip('/')
+        self.reused = False
+        self.headers = {}
+        if workspace:
+            self.headers[workspace_settings().get('HEADER', 'X-Workspace')] = workspace
+    
+    def request(self, method, path, data=None):
+        """Send one request and return (status, parsed JSON body or None)."""
+        headers = dict(self.headers)
+        body = None
+        if data is not None:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+        try:
+            return self._send(method, self.prefix + path, body, headers)
+        except STALE_CONNECTION_ERRORS:
+            if not self.reused:
+                raise
+            # The server closed the idle connection; retry once on a new one.
+            return self._send(method, self.prefix + path, body, headers)
+    
+    def _send(self, method, path, body, headers):
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except Exception:
+            self.connection.close()
+            self.reused = False
+            raise
+        self.reused = not response.will_close
+        if response.will_close:
+            self.connection.close()
+        if response.getheader('Content-Type', '').startswith('application/json'):
+            return response.status, json.loads(content)
+        return response.status, None
+    
+    def close(self):
+        self.connection.close()
+
+
+class Worker(threading.Thread):
+    """
+    Send requests until the shared deadline or request budget is used up.
+    
+    Each worker keeps its own results, which are merged after the run, so
+    recording a request takes no lock.
+    """
+    
+    def __init__(self, driver, number):
+        super().__init__(daemon=True)
+        self.driver = driver
+        self.rng = random.Random(driver.seed + number)
+        self.factory = TaskFactory(seed=driver.seed + number, tag_count=driver.tag_count)
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.statuses = Counter()
+    
+    def run(self):
+        driver = self.driver
+        connection = Connection(driver.url, driver.timeout, driver.workspace)
+        operations, weights = list(driver.mix), list(driver.mix.values())
+        try:
+            while time.monotonic() < driver.deadline and next(driver.budget) < driver.max_requests:
+                operation = self.rng.choices(operations, weights)[0]
+                start = time.perf_counter()
+                try:
+                    status = getattr(self, f'do_{operation}')(connection)
+                except (OSError, http.client.HTTPException, ValueError):
+                    status = 'error'
+                if status is None:
+                    # Nothing to edit or delete; not counted.
+                    continue
+                self.latencies[operation].append(time.perf_counter() - start)
+                self.statuses[status] += 1
+                if status == 'error' or status >= 400:
+                    self.errors[operation] += 1
+        finally:
+            connection.close()
+    
+    def read_path(self, params=None):
+        path = self.driver.read_path
+        return f'{path}?{urlencode(params)}' if params else path
+    
+    def do_list(self, connection):
+        return connection.request('GET', self.read_path())[0]
+    
+    def do_filter(self, connection):
+        if self.rng.random() < 0.5:
+            params = {'status': self.rng.choice(VALID_STATUSES)}
+        else:
+            params = {'tag': self.rng.choice(self.factory.tag_names(max_tags=1) or self.factory.tags)}
+        return connection.request('GET', self.read_path(params))[0]
+    
+    def do_sort(self, connection):
+        return connection.request('GET', self.read_path({'sort': self.rng.choice(VALID_SORT_FIELDS)}))[0]
+    
+    def do_create(self, connection):
+        data = self.factory.fields()
+        data['due_date'] = data['due_date'].isoformat()
+        data['tags'] = ', '.join(self.factory.tag_names())
+        status, body = connection.request('POST', '/tasks/api/', data)
+        if status == 201:
+            self.driver.pool.add(body['id'])
+        return status
+    
+    def do_edit(self, connection):
+        """Read a task, then PATCH it with the version that was read."""
+        pk = self.driver.pool.pick(self.rng)
+        if pk is None:
+            return None
+        status, task = connection.request('GET', f'/tasks/api/{pk}/')
+        if status != 200:
+            return status
+        data = {'version': task['version'], 'status': self.rng.choice(VALID_STATUSES)}
+        return connection.request('PATCH', f'/tasks/api/{pk}/', data)[0]
+    
+    def do_delete(self, connection):
+        pk = self.driver.pool.pick(self.rng, remove=True)
+        if pk is None:
+            return None
+        return connection.request('DELETE', f'/tasks/api/{pk}/')[0]
+
+
+class TaskPool:
+    """Ids of tasks that can be edited or deleted, shared by all workers."""
+    
+    def __init__(self, pks):
+        self.pks = list(pks)
+        self.lock = threading.Lock()
+    
+    def add(self, pk):
+        with self.lock:
+            self.pks.append(pk)
+    
+    def pick(self, rng, remove=False):
+        with self.lock:
+            if not self.pks:
+                return None
+            index = rng.randrange(len(self.pks))
+            if not remove:
+                return self.pks[index]
+            # Swap with the last id, so removal does not shift the list.
+            self.pks[index], self.pks[-1] = self.pks[-1], self.pks[index]
+            return self.pks.pop()
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a weighted mix of list, filter, sort, create, edit and delete "
+        "requests against a running server and report throughput, p50/p95/p99 "
+        "latency and error rate. Tasks to edit and delete are the most recent "
+        "ones in this command's database, which should be the server's. Raise "
+        "TASKS_RATE_LIMIT on the server, or most requests get 429."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server to test (default: %(default)s)')
+        parser.add_argument(
+            '--mix', default=DEFAULT_MIX,
+            help='Relative weight of each operation (default: %(default)s)',
+        )
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel clients (default: 8)')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run (default: 30)')
+        parser.add_argument('--requests', type=int, help='Stop after this many operations')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Seconds per request (default: 10)')
+        parser.add_argument(
+            '--reads', choices=('html', 'api'), default='html',
+            help='Send list, filter and sort to the HTML page or the JSON API (default: html)',
+        )
+        parser.add_argument(
+            '--pool-size', type=int, default=10_000,
+            help='Existing tasks available to edit and delete (default: 10000)',
+        )
+        parser.add_argument(
+            '--workspace',
+            help="Slug of the workspace to send requests to (default: the server's default)",
+        )
+        parser.add_argument('--tags', type=int, default=50, help='Tags used by filters and creates (default: 50)')
+        parser.add_argument(
+            '--max-error-rate', type=float,
+            help='Fail if the share of failed operations is higher, e.g. 0.01',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+    
+    def handle(self, *args, **options):
+        try:
+            self.mix = parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.url = options['url']
+        self.timeout = options['timeout']
+        self.seed = options['seed']
+        self.tag_count = options['tags']
+        self.read_path = '/tasks/' if options['reads'] == 'html' else '/tasks/api/'
+        self.max_requests = options['requests'] or math.inf
+        self.budget = itertools.count()
+        self.workspace = options['workspace']
+        tasks = Task.objects.all()
+        if self.workspace:
+            try:
+                tasks = tasks.filter(workspace=Workspace.objects.get(slug=self.workspace))
+            except Workspace.DoesNotExist:
+                raise CommandError(f"Unknown workspace {self.workspace!r}.")
+        else:
+            tasks = tasks.filter(workspace=default_workspace())
+        self.pool = TaskPool(tasks.order_by('-pk').values_list('pk', flat=True)[:options['pool_size']])
+        
+        workers = [Worker(self, number) for number in range(options['concurrency'])]
+        started = time.monotonic()
+        self.deadline = started + options['duration']
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+        
+        total, errors = self._report(workers, elapsed)
+        error_rate = errors / total if total else 0.0
+        if options['max_error_rate'] is not None and error_rate > options['max_error_rate']:
+            raise CommandError(
+                f"Error rate {error_rate:.2%} is above {options['max_error_rate']:.2%}"
+            )
+    
+    def _report(self, workers, elapsed):
+        latencies, errors, statuses = defaultdict(list), Counter(), Counter()
+        for worker in workers:
+            for operation, values in worker.latencies.items():
+                latencies[operation] += values
+            errors.update(worker.errors)
+            statuses.update(worker.statuses)
+        
+        self.stdout.write(
+            f"{'operation':<10}{'count':>8}{'errors':>8}{'req/s':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        )
+        everything = []
+        for operation in [*OPERATIONS, 'total']:
+            if operation == 'total':
+                values, failed = sorted(everything), sum(errors.values())
+            else:
+                values, failed = sorted(latencies.get(operation, ())), errors[operation]
+                everything += values
+            if not values:
+                continue
+            self.stdout.write(
+                f"{operation:<10}{len(values):>8}{failed:>8}{len(values) / elapsed:>9.1f}"
+                + ''.join(
+                    f"{percentile(values, fraction) * 1000:>9.1f}" for fraction in (0.5, 0.95, 0.99, 1.0)
+                )
+            )
+        
+        total, failed = len(everything), sum(errors.values())
+        self.stdout.write(
+            f"{total} operations in {elapsed:.1f} s: {total / elapsed:.1f}/s, "
+            f"error rate {failed / total if total else 0:.2%}"
+        )
+        self.stdout.write(
+            "Status codes: " + ', '.join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str))
+        )
+        return total, failed
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import TaskHistory
+
+
+class Command(BaseCommand):
+    help = "Delete task history entries older than the given number of days."
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=90,
+            help='Keep entries newer than this many days (default: 90)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows deleted per statement (default: 1000)',
+        )
+    
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted = TaskHistory.objects.prune(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} history entries older than {cutoff:%Y-%m-%d %H:%M}"
+        ))
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = "Permanently delete tasks that have been in the trash longer than the given number of days."
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.TASKS_TRASH_RETENTION_DAYS,
+            help='Keep tasks trashed more recently than this many days (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Trashed tasks deleted per transaction, plus their subtasks (default: 500)',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='Seconds to wait between batches, e.g. for replicas to catch up (default: 0.1)',
+        )
+    
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted = Task.all_objects.purge(cutoff, batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} tasks trashed before {cutoff:%Y-%m-%d %H:%M}"
+        ))
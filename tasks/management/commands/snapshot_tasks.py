@@ -0,0 +1,139 @@
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tasks.models import Task, TaskTag, Workspace
+from tasks.snapshot import COLUMNS, SnapshotReader, snapshot_path, write_snapshot
+
+
+# Task fields read for a snapshot; tags are read separately.
+FIELDS = [name for name in COLUMNS if name != 'tags'] + ['deleted_at']
+
+
+class Command(BaseCommand):
+    help = (
+        "Write each workspace's live tasks to a columnar snapshot file in "
+        "TASKS_SNAPSHOTS['DIR'], downloaded from /tasks/api/snapshot/. An "
+        "existing snapshot is brought up to date by reading only the tasks "
+        "updated since it was written."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workspace', action='append',
+            help='Slug of a workspace to snapshot; may be repeated (default: all)',
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Read every task instead of updating the existing snapshots',
+        )
+        parser.add_argument(
+            '--overlap', type=float, default=300,
+            help=(
+                'Also re-read tasks updated this many seconds before the last snapshot, '
+                'to catch transactions that committed late (default: 300)'
+            ),
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Tasks whose tags are read per query (default: 1000)',
+        )
+    
+    def handle(self, *args, **options):
+        workspaces = Workspace.objects.order_by('pk')
+        if options['workspace']:
+            workspaces = workspaces.filter(slug__in=options['workspace'])
+            missing = set(options['workspace']) - {workspace.slug for workspace in workspaces}
+            if missing:
+                raise CommandError(f"Unknown workspaces: {', '.join(sorted(missing))}.")
+        for workspace in workspaces:
+            self._snapshot(workspace, options)
+    
+    def _snapshot(self, workspace, options):
+        path = snapshot_path(workspace.slug)
+        if path is None:
+            raise CommandError("Set TASKS_SNAPSHOTS['DIR'] to write snapshots.")
+        started, clock = timezone.now(), time.perf_counter()
+        tasks = Task.all_objects.filter(workspace=workspace)
+        live = Task.objects.filter(workspace=workspace)
+        since = None
+        if not options['full'] and os.path.exists(path):
+            with SnapshotReader(path) as snapshot:
+                since = datetime.fromisoformat(snapshot.meta['high_water']) - timedelta(seconds=options['overlap'])
+                # Tasks moved to the trash are updated too, so they are read and dropped.
+                tasks = tasks.filter(updated_at__gte=since)
+                if len(snapshot) == live.count() and not tasks.exists():
+                    self.stdout.write(f"{workspace.slug}: {len(snapshot)} tasks, up to date")
+                    return
+                columns = {name: snapshot.values(name) for name in COLUMNS}
+        else:
+            columns, tasks = {name: [] for name in COLUMNS}, tasks.filter(deleted_at__isnull=True)
+        read, removed = self._merge(columns, tasks, options['batch_size'])
+        
+        count = live.count()
+        if since is not None and len(columns['id']) != count:
+            # Tasks were deleted or written without updating updated_at,
+            # e.g. outside the trash; only a full read catches those.
+            self.stdout.write(f"{workspace.slug}: snapshot has {len(columns['id'])} of {count} tasks, reading all")
+            return self._snapshot(workspace, {**options, 'full': True})
+        
+        size = write_snapshot(path, columns, {
+            'workspace': workspace.slug,
+            # Tasks updated from here on go into the next snapshot.
+            'high_water': started.isoformat(),
+        })
+        self.stdout.write(self.style.SUCCESS(
+            f"{workspace.slug}: wrote {len(columns['id'])} tasks to {path} ({size} bytes), "
+            f"{'full' if since is None else 'incremental'}: {read} read, {removed} removed "
+            f"in {time.perf_counter() - clock:.1f} s"
+        ))
+    
+    def _merge(self, columns, tasks, batch_size):
+        """
+        Apply ``tasks`` to ``columns``, replacing rows by id.
+        
+        Tasks are read with one query, and their tags ``batch_size`` tasks
+        at a time. Trashed tasks are removed. Returns the number of tasks
+        read and removed.
+        """
+        position = {pk: index for index, pk in enumerate(columns['id'])}
+        names = list(COLUMNS)
+        appended, removed, read = False, set(), 0
+        rows = tasks.order_by().values_list(*FIELDS).iterator(chunk_size=batch_size)
+        while batch := list(islice(rows, batch_size)):
+            read += len(batch)
+            tags = defaultdict(list)
+            links = TaskTag.objects.filter(task_id__in=[row[0] for row in batch]).order_by('tag__name')
+            for task_id, name in links.values_list('task_id', 'tag__name'):
+                tags[task_id].append(name)
+            for *values, deleted_at in batch:
+                row = dict(zip(FIELDS, values))
+                row['parent_id'] = row['parent_id'] or 0
+                row['tags'] = ','.join(tags[row['id']])
+                index = position.get(row['id'])
+                if deleted_at is not None:
+                    if index is not None:
+                        removed.add(index)
+                elif index is None:
+                    position[row['id']] = len(columns['id'])
+                    appended = True
+                    for name in names:
+                        columns[name].append(row[name])
+                else:
+                    for name in names:
+                        columns[name][index] = row[name]
+        
+        if removed or appended:
+            # Rows are kept in id order; restored tasks keep their old ids,
+            # so even appended rows may belong in the middle.
+            ids = columns['id']
+            order = sorted((index for index in range(len(ids)) if index not in removed), key=ids.__getitem__)
+            for name in names:
+                values = columns[name]
+                columns[name] = [values[index] for index in order]
+        return read, len(removed)
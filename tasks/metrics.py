@@ -0,0 +1,335 @@
+import fcntl
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+
+# Upper bounds, in seconds, of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+TASK_COUNTS_CACHE_KEY = 'tasks:metrics:task_counts'
+TASK_COUNTS_TIMEOUT = 30
+
+# name: (type, help) of every exported metric.
+METRICS = {
+    'tasks_http_requests_total': ('counter', 'HTTP requests by URL name, method and status.'),
+    'tasks_http_request_duration_seconds': ('histogram', 'HTTP request latency by URL name.'),
+    'tasks_db_queries_total': ('counter', 'Database queries run while handling requests, by URL name.'),
+    'tasks_db_query_duration_seconds_total': ('counter', 'Time spent in database queries, by URL name.'),
+    'tasks_cache_requests_total': ('counter', 'Cache lookups by cache and result (hit or miss).'),
+    'tasks_cache_hit_ratio': ('gauge', 'Share of cache lookups that were hits, by cache.'),
+    'tasks_tasks': ('gauge', 'Tasks by status and priority, refreshed every 30 seconds.'),
+}
+
+
+class MetricsRegistry:
+    """
+    Counters for one process, written without locks.
+    
+    Every thread adds to its own dict, so updates never contend; a lock is
+    only taken the first time a thread records something and when the
+    buffers are summed. Values are keyed by (metric name, labels), where
+    labels is a sorted tuple of (name, value) pairs. Histogram buckets are
+    stored per bucket and made cumulative when rendered.
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """Drop all recorded values."""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._buffers = []
+        self._retired = defaultdict(float)
+        self._last_flush = 0.0
+    
+    def _buffer(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = defaultdict(float)
+            with self._lock:
+                self._buffers.append((threading.current_thread(), values))
+            return values
+    
+    def inc(self, name, labels=(), amount=1):
+        self._buffer()[name, labels] += amount
+    
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        """Record ``value`` in histogram ``name``."""
+        values = self._buffer()
+        le = next((bound for bound in buckets if value <= bound), '+Inf')
+        values[f'{name}_bucket', labels + (('le', str(le)),)] += 1
+        values[f'{name}_sum', labels] += value
+        values[f'{name}_count', labels] += 1
+    
+    def snapshot(self):
+        """Return {(name, labels): value} summed over all threads."""
+        totals = defaultdict(float)
+        with self._lock:
+            live = []
+            for thread, values in self._buffers:
+                # dict() copies in one step under the GIL, so it is safe
+                # while the owning thread keeps writing.
+                copy = dict(values)
+                if thread.is_alive():
+                    live.append((thread, values))
+                    target = totals
+                else:
+                    # Fold finished threads' counts away for good.
+                    target = self._retired
+                for key, value in copy.items():
+                    target[key] += value
+            self._buffers = live
+            for key, value in self._retired.items():
+                totals[key] += value
+        return totals
+    
+    def maybe_flush(self, store, interval):
+        """Write this process's snapshot to ``store`` at most every ``interval`` seconds."""
+        now = time.monotonic()
+        if now - self._last_flush >= interval:
+            self._last_flush = now
+            store.write(self.snapshot())
+
+
+class FileStore:
+    """
+    Share per-process snapshots through files in one directory.
+    
+    Each process owns one file, named after the host and process id, and
+    replaces it atomically; readers sum all files. The counts of processes
+    that exited are kept, so counters never go backwards: read() folds the
+    files of exited processes on this host into one retired.json, so the
+    number of files stays at about one per live worker and host.
+    """
+    
+    RETIRED = 'retired.json'
+    
+    def __init__(self, directory):
+        self.directory = directory
+        self.prefix = f'{socket.gethostname()}-'
+        self.path = os.path.join(directory, f'{self.prefix}{os.getpid()}.json')
+        if os.path.exists(self.path):
+            # Left by an exited process that had the same id.
+            self.retire([os.path.basename(self.path)])
+    
+    def write(self, snapshot):
+        self._write(self.path, [[name, labels, value] for (name, labels), value in snapshot.items()])
+    
+    def _write(self, path, rows):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(rows, f)
+        os.replace(tmp_path, path)
+    
+    def read(self):
+        """Return the snapshots of all processes summed together."""
+        self.retire(self._exited())
+        totals = defaultdict(float)
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.json'):
+                self._add(totals, filename)
+        return totals
+    
+    def _add(self, totals, filename):
+        try:
+            with open(os.path.join(self.directory, filename)) as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            # Removed or half-written by someone else; skip this scrape.
+            return
+        for name, labels, value in rows:
+            totals[name, tuple(tuple(pair) for pair in labels)] += value
+    
+    def _exited(self):
+        """Return the files of this host's processes that are no longer running."""
+        exited = []
+        for filename in os.listdir(self.directory):
+            pid = filename[len(self.prefix):-len('.json')]
+            if not (filename.startswith(self.prefix) and filename.endswith('.json') and pid.isdigit()):
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                exited.append(filename)
+            except PermissionError:
+                # Running, as another user.
+                pass
+        return exited
+    
+    def retire(self, filenames):
+        """Add the counts in ``filenames`` to retired.json and remove them."""
+        if not filenames:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Serializes scrapes that find the same files, so none is added twice.
+        with open(os.path.join(self.directory, 'retired.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            filenames = [name for name in filenames if os.path.exists(os.path.join(self.directory, name))]
+            if not filenames:
+                return
+            totals = defaultdict(float)
+            for filename in [self.RETIRED, *filenames]:
+                self._add(totals, filename)
+            self._write(
+                os.path.join(self.directory, self.RETIRED),
+                [[name, labels, value] for (name, labels), value in totals.items()],
+            )
+            for filename in filenames:
+                os.remove(os.path.join(self.directory, filename))
+
+
+registry = MetricsRegistry()
+
+# A worker forked from a process that already served requests (e.g. with
+# gunicorn --preload) must not report its parent's counts a second time.
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset)
+
+
+_stores = {}
+
+
+def get_store():
+    """Return the FileStore for TASKS_METRICS['DIR'], or None if it is not set."""
+    directory = (getattr(settings, 'TASKS_METRICS', None) or {}).get('DIR')
+    if not directory:
+        return None
+    # Keyed by process id too: a forked worker must write its own file.
+    key = (directory, os.getpid())
+    if key not in _stores:
+        _stores[key] = FileStore(directory)
+    return _stores[key]
+
+
+def record_request(view, method, status, seconds, queries, query_seconds):
+    """Record one handled request."""
+    labels = (('view', view),)
+    registry.inc('tasks_http_requests_total', labels + (('method', method), ('status', str(status))))
+    registry.observe('tasks_http_request_duration_seconds', labels, seconds)
+    registry.inc('tasks_db_queries_total', labels, queries)
+    registry.inc('tasks_db_query_duration_seconds_total', labels, query_seconds)
+
+
+def record_cache(name, hit):
+    """Record a lookup of cached value ``name``."""
+    registry.inc('tasks_cache_requests_total', (('cache', name), ('result', 'hit' if hit else 'miss')))
+
+
+def task_counts():
+    """
+    Return [(status, priority, count), ...] for all tasks.
+    
+    One GROUP BY over the (status, priority) index, cached for 30 seconds
+    so frequent scrapes do not scan a large table each time.
+    """
+    # Imported here because models record their cache lookups in this module.
+    from .models import Task
+    
+    counts = cache.get(TASK_COUNTS_CACHE_KEY)
+    record_cache('task_counts', counts is not None)
+    if counts is None:
+        counts = list(
+            Task.objects.order_by().values_list('status', 'priority').annotate(count=Count('pk'))
+        )
+        cache.set(TASK_COUNTS_CACHE_KEY, counts, TASK_COUNTS_TIMEOUT)
+    return counts
+
+
+def render(totals, counts=()):
+    """
+    Render summed values in the Prometheus text exposition format.
+    
+    ``counts`` are the (status, priority, count) rows of task_counts().
+    """
+    samples = defaultdict(list)
+    for (name, labels), value in totals.items():
+        samples[name].append((labels, value))
+    
+    # Derived gauges.
+    requests = defaultdict(lambda: [0.0, 0.0])
+    for labels, value in samples.get('tasks_cache_requests_total', ()):
+        labels = dict(labels)
+        requests[labels['cache']][labels['result'] == 'hit'] += value
+    for name, (misses, hits) in requests.items():
+        samples['tasks_cache_hit_ratio'].append(((('cache', name),), hits / (hits + misses)))
+    for status, priority, count in counts:
+        samples['tasks_tasks'].append(((('status', status), ('priority', str(priority))), count))
+    
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            lines.extend(_histogram_lines(name, samples))
+        else:
+            for labels, value in sorted(samples.get(name, ())):
+                lines.append(_sample(name, labels, value))
+    return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(name, samples):
+    buckets = defaultdict(dict)
+    for labels, value in samples.get(f'{name}_bucket', ()):
+        buckets[labels[:-1]][labels[-1][1]] = value
+    sums = dict(samples.get(f'{name}_sum', ()))
+    for labels, count in sorted(samples.get(f'{name}_count', ())):
+        cumulative = 0
+        for bound in (*LATENCY_BUCKETS, '+Inf'):
+            cumulative += buckets[labels].get(str(bound), 0)
+            yield _sample(f'{name}_bucket', labels + (('le', str(bound)),), cumulative)
+        yield _sample(f'{name}_sum', labels, sums.get(labels, 0))
+        yield _sample(f'{name}_count', labels, count)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample(name, labels, value):
+    if labels:
+        name = '{}{{{}}}'.format(name, ','.join(f'{key}="{_escape(val)}"' for key, val in labels))
+    if isinstance(value, float):
+        # Counters are floats; whole numbers are written in full, not as
+        # e.g. 1.23457e+06, so rate() sees every increment.
+        value = int(value) if value.is_integer() else repr(value)
+    return f'{name} {value}'
+
+
+def metrics_view(request):
+    """
+    Expose the metrics of all worker processes for Prometheus.
+    
+    Returns 404 unless settings.TASKS_METRICS is set, and 403 unless the
+    request comes from one of its ALLOWED_IPS or sends its TOKEN as
+    "Authorization: Bearer <token>".
+    """
+    config = getattr(settings, 'TASKS_METRICS', None)
+    if not config:
+        raise Http404
+    token = config.get('TOKEN')
+    authorized = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized and request.META.get('REMOTE_ADDR') not in config.get('ALLOWED_IPS', ()):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    # Counted first, so this scrape's cache lookup is in the snapshot.
+    counts = task_counts()
+    store = get_store()
+    if store is None:
+        totals = registry.snapshot()
+    else:
+        store.write(registry.snapshot())
+        totals = store.read()
+    return HttpResponse(render(totals, counts), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,182 @@
+import math
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import Workspace, workspace_settings
+
+
+class WorkspaceMiddleware:
+    """
+    Set ``request.workspace`` to the workspace the request works in.
+    
+    Configured by settings.TASKS_WORKSPACES:
+    - HEADER: Request header naming the workspace by slug
+    - TRUSTED_PROXIES: Addresses the header is accepted from; empty
+      accepts it from any client
+    - COOKIE: Cookie naming the workspace, used without the header; None
+      ignores cookies
+    - DEFAULT: Slug of the workspace used when neither is sent
+    
+    The workspace is looked up on first access, from a short-lived cache,
+    so requests that never touch tasks skip it. An unknown slug is a 404.
+    
+    Workspaces separate teams' tasks, not their permissions: whoever can
+    send the header or set the cookie works in the workspace it names. To
+    pin clients to a workspace, let only a proxy set the header, list it
+    in TRUSTED_PROXIES and set COOKIE to None.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = workspace_settings()
+        self.header = config.get('HEADER', 'X-Workspace')
+        self.trusted_proxies = frozenset(config.get('TRUSTED_PROXIES') or ())
+        self.cookie = config.get('COOKIE', 'workspace')
+        self.default = config.get('DEFAULT', 'default')
+    
+    def __call__(self, request):
+        slug = None
+        if not self.trusted_proxies or request.META.get('REMOTE_ADDR') in self.trusted_proxies:
+            slug = request.headers.get(self.header)
+        if not slug and self.cookie:
+            slug = request.COOKIES.get(self.cookie)
+        slug = slug or self.default
+        request.workspace = SimpleLazyObject(lambda: self.get_workspace(slug))
+        return self.get_response(request)
+    
+    def get_workspace(self, slug):
+        workspace = Workspace.objects.get_cached(slug)
+        if workspace is None:
+            raise Http404(f"No workspace '{slug}'.")
+        return workspace
+
+
+class RateLimitMiddleware:
+    """
+    Per-client token-bucket rate limiting for the tasks app.
+    
+    Configured by settings.TASKS_RATE_LIMIT:
+    - RATE: Tokens added per second
+    - BURST: Bucket size, i.e. requests allowed in a burst
+    - STORE: Dotted path of the bucket store class
+    - OPTIONS: Keyword arguments for the store
+    - WORKSPACE_RATE, WORKSPACE_BURST: Optional second bucket shared by
+      all clients of a workspace, so one busy workspace cannot occupy
+      every worker
+    - CLIENT_IP_HEADER: Request header with the client address set by a
+      trusted proxy, e.g. 'X-Forwarded-For'; the last address in it is
+      used. Without it the address is REMOTE_ADDR, which behind a proxy
+      is the proxy's, so all anonymous clients share one bucket. Only set
+      it when the proxy overwrites or appends to the header, as clients
+      can send it themselves.
+    
+    Clients are identified by user id when logged in, otherwise by IP
+    address. Requests over the limit get 429 with a Retry-After header.
+    Only views in the 'tasks' namespace are limited; the admin is not.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = getattr(settings, 'TASKS_RATE_LIMIT', None)
+        if self.config:
+            store_class = import_string(self.config.get('STORE', 'tasks.throttle.InMemoryBucketStore'))
+            self.store = store_class(**self.config.get('OPTIONS', {}))
+    
+    def __call__(self, request):
+        return self.get_response(request)
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.config or request.resolver_match.namespace != 'tasks':
+            return None
+        allowed, retry_after = self.store.take(
+            self.client_key(request),
+            rate=self.config['RATE'],
+            capacity=self.config['BURST'],
+        )
+        if allowed and self.config.get('WORKSPACE_RATE'):
+            allowed, retry_after = self.store.take(
+                f'workspace:{request.workspace.pk}',
+                rate=self.config['WORKSPACE_RATE'],
+                capacity=self.config['WORKSPACE_BURST'],
+            )
+        if allowed:
+            return None
+        response = HttpResponse('Too many requests, please slow down.', status=429, content_type='text/plain')
+        response['Retry-After'] = str(math.ceil(retry_after))
+        return response
+    
+    def client_key(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+        header = self.config.get('CLIENT_IP_HEADER')
+        address = request.headers.get(header, '') if header else ''
+        # The nearest proxy appends the address it saw to the end of a list.
+        address = address.rsplit(',', 1)[-1].strip() or request.META.get('REMOTE_ADDR', '')
+        return f'ip:{address}'
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries and the time spent in them."""
+    
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+    
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """
+    Record request latency and database usage for /metrics.
+    
+    Enabled by settings.TASKS_METRICS:
+    - DIR: Directory where each worker process writes its counters so the
+      scraped process can report them all; leave unset for one process
+    - FLUSH_INTERVAL: Seconds between writes to DIR
+    
+    Requests are labelled by URL name, e.g. 'tasks:task_list', or
+    'unmatched' when no URL matched. Put this middleware first so the
+    latency covers the rest of the stack.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = getattr(settings, 'TASKS_METRICS', None)
+        if not self.config:
+            raise MiddlewareNotUsed
+    
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        match = request.resolver_match
+        metrics.record_request(
+            match.view_name if match else 'unmatched',
+            request.method,
+            response.status_code,
+            time.perf_counter() - start,
+            timer.count,
+            timer.seconds,
+        )
+        store = metrics.get_store()
+        if store is not None:
+            metrics.registry.maybe_flush(store, self.config.get('FLUSH_INTERVAL', 1.0))
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-19 15:39
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+                ('changes', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='tasks.task')),
+            ],
+            options={
+                'verbose_name_plural': 'task history',
+                'ordering': ['-changed_at'],
+                'indexes': [models.Index(fields=['task', '-changed_at'], name='tasks_taskh_task_id_734326_idx'), models.Index(fields=['changed_at'], name='tasks_taskh_changed_4a0e1d_idx')],
+            },
+        ),
+    ]
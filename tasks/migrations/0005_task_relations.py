@@ -0,0 +1,52 @@
+# Generated by Django 5.1.4 on 2026-10-19 15:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='parent',
+            field=models.ForeignKey(blank=True, help_text='Task this one is a subtask of', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='subtasks', to='tasks.task'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='TaskDependency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blocked', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocked_by_links', to='tasks.task')),
+                ('blocker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocking_links', to='tasks.task')),
+            ],
+            options={
+                'verbose_name_plural': 'task dependencies',
+            },
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='blocked_by',
+            field=models.ManyToManyField(blank=True, related_name='blocks', through='tasks.TaskDependency', to='tasks.task'),
+        ),
+        migrations.AddIndex(
+            model_name='taskdependency',
+            index=models.Index(fields=['blocked', 'blocker'], name='tasks_taskd_blocked_dc0eae_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskdependency',
+            constraint=models.UniqueConstraint(fields=('blocker', 'blocked'), name='tasks_taskdependency_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskdependency',
+            constraint=models.CheckConstraint(condition=models.Q(('blocker', models.F('blocked')), _negated=True), name='tasks_taskdependency_not_self'),
+        ),
+    ]
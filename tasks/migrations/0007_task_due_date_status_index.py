@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-19 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_title_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['due_date', 'status'], name='tasks_task_due_dat_3f7773_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='tasks_task_due_dat_bce847_idx',
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_task_due_date_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When the task was moved to the trash', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['status', '-priority'], name='tasks_live_status_prio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['due_date', 'status'], name='tasks_live_due_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['title'], name='tasks_live_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='tasks_trash_deleted_at_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='tasks_task_status_314078_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='tasks_task_title_6b13c2_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='tasks_task_due_dat_3f7773_idx',
+        ),
+    ]
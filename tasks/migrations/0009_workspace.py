@@ -0,0 +1,64 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+# Existing tasks are moved to the default workspace this many at a time.
+BATCH_SIZE = 10000
+
+
+def create_default_workspace(apps, schema_editor):
+    Workspace = apps.get_model('tasks', 'Workspace')
+    slug = getattr(settings, 'TASKS_WORKSPACES', {}).get('DEFAULT', 'default')
+    Workspace.objects.using(schema_editor.connection.alias).get_or_create(
+        slug=slug, defaults={'name': slug.replace('-', ' ').title()}
+    )
+
+
+def assign_default_workspace(apps, schema_editor):
+    """Put all existing tasks in the default workspace, in short UPDATEs by id range."""
+    Workspace = apps.get_model('tasks', 'Workspace')
+    Task = apps.get_model('tasks', 'Task')
+    using = schema_editor.connection.alias
+    slug = getattr(settings, 'TASKS_WORKSPACES', {}).get('DEFAULT', 'default')
+    workspace = Workspace.objects.using(using).get(slug=slug)
+    tasks = Task.objects.using(using)
+    last_pk = tasks.aggregate(last=Max('pk'))['last'] or 0
+    for start in range(0, last_pk + 1, BATCH_SIZE):
+        tasks.filter(pk__gte=start, pk__lt=start + BATCH_SIZE).update(workspace=workspace)
+    workspace.task_count = tasks.filter(deleted_at__isnull=True).count()
+    workspace.save(update_fields=['task_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_task_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Workspace',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Workspace name', max_length=100)),
+                ('slug', models.SlugField(help_text='Sent in the X-Workspace header to pick this workspace', unique=True)),
+                ('task_quota', models.PositiveIntegerField(blank=True, help_text='Most tasks outside the trash; leave empty for the default', null=True)),
+                ('task_count', models.PositiveIntegerField(default=0, editable=False, help_text='Tasks outside the trash')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(create_default_workspace, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='task',
+            name='workspace',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='tasks', to='tasks.workspace'),
+        ),
+        migrations.RunPython(assign_default_workspace, migrations.RunPython.noop),
+    ]
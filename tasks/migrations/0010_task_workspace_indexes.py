@@ -0,0 +1,67 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:33
+
+import django.db.models.deletion
+import tasks.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_workspace'),
+    ]
+
+    operations = [
+        # 0009 filled the column, so the database only gains NOT NULL. With
+        # the default in the database operation, the schema editor would
+        # call default_workspace() to fill NULL rows, and that reads the
+        # current Workspace model rather than the one of this migration.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AlterField(
+                    model_name='task',
+                    name='workspace',
+                    field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='tasks', to='tasks.workspace'),
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='task',
+                    name='workspace',
+                    field=models.ForeignKey(db_index=False, default=tasks.models.default_workspace, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='tasks', to='tasks.workspace'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['workspace', '-created_at'], name='tasks_live_ws_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['workspace', 'status', '-priority'], name='tasks_live_ws_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['workspace', 'due_date', 'status'], name='tasks_live_ws_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['workspace', 'title'], name='tasks_live_ws_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['workspace', '-deleted_at'], name='tasks_trash_ws_deleted_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='tasks_live_status_prio_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='tasks_live_due_status_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='tasks_live_title_idx',
+        ),
+    ]
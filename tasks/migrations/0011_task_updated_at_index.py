@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_task_workspace_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['workspace', 'updated_at'], name='tasks_ws_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_tags(apps, schema_editor):
+    """Count the tags of the tasks outside the trash, per workspace, with one GROUP BY."""
+    TaskTag = apps.get_model('tasks', 'TaskTag')
+    WorkspaceTag = apps.get_model('tasks', 'WorkspaceTag')
+    using = schema_editor.connection.alias
+    links = (
+        TaskTag.objects.using(using)
+        .filter(task__deleted_at__isnull=True)
+        .order_by()
+        .values_list('task__workspace_id', 'tag_id')
+        .annotate(count=Count('pk'))
+    )
+    WorkspaceTag.objects.using(using).bulk_create([
+        WorkspaceTag(workspace_id=workspace_id, tag_id=tag_id, task_count=count)
+        for workspace_id, tag_id, count in links
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_task_updated_at_index'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='WorkspaceTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_count', models.PositiveIntegerField(default=0)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='workspace_counts', to='tasks.tag')),
+                ('workspace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_counts', to='tasks.workspace')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['workspace', '-task_count'], name='tasks_ws_tag_count_idx')],
+                'constraints': [models.UniqueConstraint(fields=('workspace', 'tag'), name='tasks_workspacetag_unique')],
+            },
+        ),
+        migrations.RunPython(count_tags, migrations.RunPython.noop),
+    ]
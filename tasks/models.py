@@ -1,6 +1,642 @@
-from django.db import models
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import DEFERRED, Count, Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Concat, Greatest, Substr
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .metrics import record_cache
+
+
+class StaleTaskError(Exception):
+    """Raised when a task was changed by someone else since it was loaded."""
+
+
+class QuotaExceededError(Exception):
+    """Raised when a workspace has no room for more tasks."""
+
+
+WORKSPACE_CACHE_TIMEOUT = 60
+
+
+def workspace_settings():
+    return getattr(settings, 'TASKS_WORKSPACES', None) or {}
+
+
+class WorkspaceQuerySet(models.QuerySet):
+
+    def get_cached(self, slug):
+        """
+        Return the workspace with ``slug``, or None if there is none.
+        
+        Every request resolves its workspace, so lookups are cached for a
+        minute; saving a workspace drops its cached copy.
+        """
+        key = Workspace.cache_key(slug)
+        workspace = cache.get(key)
+        record_cache('workspace', workspace is not None)
+        if workspace is None:
+            workspace = self.filter(slug=slug).first()
+            if workspace is not None:
+                cache.set(key, workspace, WORKSPACE_CACHE_TIMEOUT)
+        return workspace
+    
+    def add_tasks(self, workspace_id, count, enforce_quota=True):
+        """
+        Add ``count``, negative to remove, to a workspace's task count.
+        
+        With ``enforce_quota`` an increase beyond the quota is refused and
+        nothing is written. The check is part of the UPDATE, so concurrent
+        writers cannot overshoot the quota between reading and writing.
+        Decreases stop at zero. Returns False if the increase was refused.
+        """
+        workspaces = self.filter(pk=workspace_id)
+        if count < 0:
+            # Rows inserted around the count must not make deletes fail.
+            return workspaces.update(task_count=Greatest(F('task_count') + count, 0)) > 0
+        if enforce_quota and count > 0:
+            default = workspace_settings().get('TASK_QUOTA')
+            quota = F('task_quota') if default is None else Coalesce('task_quota', Value(default))
+            workspaces = workspaces.alias(quota=quota).filter(
+                Q(quota__isnull=True) | Q(quota__gte=F('task_count') + count)
+            )
+        return workspaces.update(task_count=F('task_count') + count) > 0
+    
+    def add_task_counts(self, counts, enforce_quota=True):
+        """
+        Apply add_tasks() to each {workspace_id: count} in ``counts``.
+        
+        Raises QuotaExceededError if an increase does not fit; call this in
+        the transaction that writes the tasks so it all rolls back.
+        """
+        # A fixed order, so concurrent writers lock the rows alike.
+        for workspace_id, count in sorted(counts.items()):
+            if count and not self.add_tasks(workspace_id, count, enforce_quota):
+                raise self.get(pk=workspace_id).quota_exceeded()
+    
+    def recount_tasks(self):
+        """
+        Recompute task_count from the task table with one UPDATE.
+        
+        Fixes counts after tasks were inserted or deleted around the ORM,
+        e.g. with plain bulk_create(). Returns the number of workspaces.
+        """
+        live = (
+            Task.objects.filter(workspace=OuterRef('pk'))
+            .order_by()
+            .values('workspace')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        return self.update(task_count=Coalesce(Subquery(live), 0))
+    
+    def recount_tags(self):
+        """
+        Recompute the workspaces' WorkspaceTag counts from the tag links.
+        
+        Fixes counts after tags were linked or unlinked around the ORM,
+        e.g. with plain bulk_create(). Returns the number of counts written.
+        """
+        using = self.db
+        ids = list(self.values_list('pk', flat=True))
+        links = (
+            TaskTag.objects.using(using)
+            .filter(task__workspace_id__in=ids, task__deleted_at__isnull=True)
+            .order_by()
+            .values_list('task__workspace_id', 'tag_id')
+            .annotate(count=Count('pk'))
+        )
+        with transaction.atomic(using=using):
+            WorkspaceTag.objects.using(using).filter(workspace_id__in=ids).delete()
+            counts = WorkspaceTag.objects.using(using).bulk_create([
+                WorkspaceTag(workspace_id=workspace_id, tag_id=tag_id, task_count=count)
+                for workspace_id, tag_id, count in links
+            ], batch_size=1000)
+        return len(counts)
+
+
+class Workspace(models.Model):
+    """
+    Tenant boundary: every task belongs to exactly one workspace.
+    
+    Fields:
+    - name: Display name
+    - slug: Identifies the workspace in requests; see WorkspaceMiddleware
+    - task_quota: Most tasks outside the trash, or empty for the
+      TASKS_WORKSPACES['TASK_QUOTA'] default
+    - task_count: Tasks outside the trash, kept up to date by every Task
+      write so the quota is checked without counting rows
+    
+    Code that inserts or deletes tasks around Task.save() and the
+    TaskQuerySet bulk methods must call add_tasks() itself, or
+    recount_tasks() afterwards; likewise WorkspaceTag.objects.add_counts()
+    or recount_tags() for tag links.
+    """
+    
+    name = models.CharField(
+        max_length=100,
+        help_text="Workspace name"
+    )
+    slug = models.SlugField(
+        unique=True,
+        help_text="Sent in the X-Workspace header to pick this workspace"
+    )
+    task_quota = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Most tasks outside the trash; leave empty for the default"
+    )
+    task_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Tasks outside the trash"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = WorkspaceQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+    
+    @staticmethod
+    def cache_key(slug):
+        return f'tasks:workspace:{slug}'
+    
+    @property
+    def quota(self):
+        """Most tasks allowed outside the trash, or None for no limit."""
+        if self.task_quota is not None:
+            return self.task_quota
+        return workspace_settings().get('TASK_QUOTA')
+    
+    def has_room(self, count=1):
+        return self.quota is None or self.task_count + count <= self.quota
+    
+    def quota_exceeded(self):
+        return QuotaExceededError(f"Workspace '{self.name}' has reached its limit of {self.quota} tasks.")
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        cache.delete(self.cache_key(self.slug))
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        cache.delete(self.cache_key(self.slug))
+        return result
+
+
+def default_workspace():
+    """Return the id of the TASKS_WORKSPACES['DEFAULT'] workspace, the default for new tasks."""
+    slug = workspace_settings().get('DEFAULT', 'default')
+    workspace = Workspace.objects.get_cached(slug)
+    if workspace is None:
+        raise ImproperlyConfigured(f"The default workspace '{slug}' does not exist.")
+    return workspace.pk
+
+
+class Tag(models.Model):
+    """
+    Label that can be attached to any number of tasks.
+    """
+    
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+        help_text="Tag name"
+    )
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+# Width of one zero-padded task id in Task.path.
+PATH_STEP_WIDTH = 10
+
+
+def path_step(pk):
+    """Return the Task.path segment for the task with primary key ``pk``."""
+    return f'{pk:0{PATH_STEP_WIDTH}d}/'
+
+
+TAG_COUNTS_CACHE_KEY = 'tasks:tag_counts'
+TAG_COUNTS_TIMEOUT = 60
+POPULAR_TAGS_LIMIT = 200
+
+
+def tag_counts_cache_key(workspace_id=None):
+    if workspace_id is None:
+        return TAG_COUNTS_CACHE_KEY
+    return f'{TAG_COUNTS_CACHE_KEY}:{workspace_id}'
+
+
+def popular_tags(limit=50, workspace=None):
+    """
+    Return up to ``limit`` (name, task_count) pairs, most used first.
+    
+    Only tasks in ``workspace`` are counted, or in all workspaces if it is
+    None. The counts are read from WorkspaceTag, which every tag and trash
+    write keeps current, instead of counting the links; the result is
+    cached for a minute.
+    """
+    key = tag_counts_cache_key(None if workspace is None else workspace.pk)
+    counts = cache.get(key)
+    record_cache('tag_counts', counts is not None)
+    if counts is None:
+        rows = WorkspaceTag.objects.filter(task_count__gt=0)
+        if workspace is not None:
+            rows = rows.filter(workspace=workspace).values_list('tag__name', 'task_count')
+        else:
+            rows = rows.values_list('tag__name').annotate(task_count=Sum('task_count'))
+        counts = list(rows.order_by('-task_count', 'tag__name')[:POPULAR_TAGS_LIMIT])
+        cache.set(key, counts, TAG_COUNTS_TIMEOUT)
+    return counts[:limit]
+
+
+CALENDAR_GENERATION_KEY = 'tasks:calendar:generation'
+
+
+def calendar_generation(workspace_id):
+    """
+    Return the current generation of a workspace's cached calendar counts.
+    
+    Cached counts are keyed by generation, so bumping it with
+    invalidate_calendar() retires all of them at once. Each workspace
+    has its own generation: writes in a busy workspace leave the other
+    workspaces' cached counts alone.
+    """
+    key = f'{CALENDAR_GENERATION_KEY}:{workspace_id}'
+    generation = cache.get(key)
+    if generation is None:
+        # A fresh value, in case the old one was evicted: counts cached
+        # under any earlier generation must never be read again.
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_calendar(*workspace_ids):
+    """Retire the cached calendar counts of workspaces whose tasks were written."""
+    for workspace_id in set(workspace_ids):
+        try:
+            cache.incr(f'{CALENDAR_GENERATION_KEY}:{workspace_id}')
+        except ValueError:
+            calendar_generation(workspace_id)
+
+
+def parse_tag_names(value):
+    """Split a comma-separated string or a list into unique tag names."""
+    if isinstance(value, str):
+        value = value.split(',')
+    names = (str(name).strip() for name in value or ())
+    return list(dict.fromkeys(name for name in names if name))
+
+
+class TaskQuerySet(models.QuerySet):
+
+    def with_tags(self, names, match='any', workspace=None):
+        """
+        Filter tasks by tag names.
+        
+        ``match='any'`` keeps tasks with at least one of the tags (OR) and
+        ``match='all'`` keeps tasks that have every tag (AND). The result
+        never contains duplicate rows.
+        
+        Rare tags are resolved from the (tag, task) index of TaskTag, while
+        popular tags are checked per candidate task through the (task, tag)
+        index, which lets a sorted, limited list stop after one page. Pass
+        the ``workspace`` the tasks are filtered by, so popularity is judged
+        by its tasks rather than by the whole table.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return self
+        tags = dict(Tag.objects.filter(name__in=names).values_list('pk', 'name'))
+        popular = {name for name, _ in popular_tags(limit=POPULAR_TAGS_LIMIT, workspace=workspace)}
+        rare_ids = [pk for pk, name in tags.items() if name not in popular]
+        
+        if match == 'all':
+            if len(tags) < len(names):
+                return self.none()
+            queryset = self
+            probe_ids = list(tags)
+            if rare_ids:
+                probe_ids.remove(rare_ids[0])
+                queryset = queryset.filter(
+                    pk__in=TaskTag.objects.filter(tag_id=rare_ids[0]).values('task_id')
+                )
+            for tag_id in probe_ids:
+                queryset = queryset.filter(Exists(
+                    TaskTag.objects.filter(task_id=OuterRef('pk'), tag_id=tag_id)
+                ))
+            return queryset
+        
+        if len(rare_ids) == len(tags):
+            return self.filter(
+                pk__in=TaskTag.objects.filter(tag_id__in=rare_ids).values('task_id')
+            )
+        return self.filter(Exists(
+            TaskTag.objects.filter(task_id=OuterRef('pk'), tag_id__in=list(tags))
+        ))
+    
+    
+    def subtree(self, task):
+        """
+        Return all descendants of ``task`` in one index range scan on path.
+        
+        Descendant paths all start with ``task.subtree_prefix``, which ends
+        in '/'. Since '/' sorts just before '0', they are exactly the paths
+        in [prefix, prefix-with-'/'-replaced-by-'0'), a plain B-tree range
+        on every database backend.
+        """
+        prefix = task.subtree_prefix
+        return self.filter(path__gte=prefix, path__lt=prefix[:-1] + '0')
+    
+    def with_blocked(self):
+        """Annotate ``is_blocked``: True if any blocker outside the trash is not Done."""
+        return self.annotate(is_blocked=Exists(
+            TaskDependency.objects.filter(
+                blocked_id=OuterRef('pk'), blocker__deleted_at__isnull=True
+            ).exclude(blocker__status='Done')
+        ))
+    
+    def bulk_set_status(self, status, user=None):
+        """
+        Set the status of every matching task with one UPDATE statement.
+        
+        Only (id, status) pairs are read, to write the history entries in
+        batches; no Task instances are loaded. Returns the number of tasks
+        that changed.
+        """
+        pending = self.exclude(status=status)
+        with transaction.atomic():
+            changed = list(pending.select_for_update().values_list('pk', 'status', 'workspace_id'))
+            updated = pending.update(
+                status=status,
+                version=F('version') + 1,
+                updated_at=timezone.now(),
+            )
+            TaskHistory.objects.record_bulk(
+                ((pk, {'status': [old, status]}) for pk, old, _ in changed), user=user
+            )
+        invalidate_calendar(*(workspace_id for _, _, workspace_id in changed))
+        return updated
+    
+    def bulk_import(self, rows, user=None, batch_size=1000, workspace=None):
+        """
+        Create tasks from validated rows with batched INSERT statements.
+        
+        ``rows`` are dicts as returned by TaskValidator.validate(): Task
+        field values plus a list of tag names under 'tags'. Tags, tag links
+        and creation history are written in batches as well. The tasks go
+        to ``workspace``, or the default one; if they do not all fit in its
+        quota, QuotaExceededError is raised and nothing is created. Returns
+        the created tasks.
+        """
+        using = self.db
+        manager = self.model._base_manager.using(using)
+        workspace_id = default_workspace() if workspace is None else workspace.pk
+        created = []
+        with transaction.atomic(using=using):
+            Workspace.objects.using(using).add_task_counts({workspace_id: len(rows)})
+            names = {name for row in rows for name in row.get('tags', ())}
+            Tag.objects.using(using).bulk_create(
+                [Tag(name=name) for name in names], batch_size=batch_size, ignore_conflicts=True
+            )
+            tag_ids = dict(Tag.objects.using(using).filter(name__in=names).values_list('name', 'pk'))
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                tasks = [
+                    self.model(
+                        workspace_id=workspace_id,
+                        **{name: value for name, value in row.items() if name != 'tags'}
+                    )
+                    for row in batch
+                ]
+                last_pk = manager.order_by('-pk').values_list('pk', flat=True).first() or 0
+                manager.bulk_create(tasks)
+                if tasks and tasks[0].pk is None:
+                    # MySQL does not return primary keys from bulk inserts.
+                    pks = list(manager.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True))
+                    if len(pks) != len(tasks):
+                        raise RuntimeError("Tasks were inserted concurrently; retry the import.")
+                    for task, pk in zip(tasks, pks):
+                        task.pk = pk
+                links = [
+                    TaskTag(task_id=task.pk, tag_id=tag_ids[name])
+                    for task, row in zip(tasks, batch)
+                    for name in row.get('tags', ())
+                ]
+                TaskTag.objects.using(using).bulk_create(links)
+                WorkspaceTag.objects.using(using).add_counts(
+                    Counter((workspace_id, link.tag_id) for link in links)
+                )
+                entries = []
+                for task, row in zip(tasks, batch):
+                    changes = {name: [None, getattr(task, name)] for name in self.model.TRACKED_FIELDS}
+                    if row.get('tags'):
+                        changes['tags'] = [[], row['tags']]
+                    entries.append((task.pk, changes))
+                TaskHistory.objects.using(using).record_bulk(entries, user=user)
+                created += tasks
+        invalidate_calendar(workspace_id)
+        return created
+    
+    def _ids_with_descendants(self):
+        """
+        Return the ids of matching tasks and of all their subtasks.
+        
+        Subtasks are found level by level through the parent index, in or
+        out of the trash; no Task instances are loaded.
+        """
+        ids = list(self.values_list('pk', flat=True))
+        seen = set(ids)
+        level = ids
+        while level:
+            level = [
+                pk for pk in self.model._base_manager.using(self.db)
+                .filter(parent_id__in=level)
+                .values_list('pk', flat=True)
+                if pk not in seen
+            ]
+            seen.update(level)
+            ids += level
+        return ids
+    
+    def bulk_delete(self, batch_size=1000):
+        """
+        Permanently delete matching tasks, their subtasks and dependent rows.
+        
+        Works on ids only: every table is cleared with one DELETE per batch
+        of ids. Unlike QuerySet.delete() no Task instances are loaded.
+        Returns the number of tasks deleted.
+        """
+        using = self.db
+        with transaction.atomic(using=using):
+            ids = self._ids_with_descendants()
+            batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+            live, tags = Counter(), Counter()
+            for batch in batches:
+                live_batch = self.model.objects.using(using).filter(pk__in=batch)
+                live.update(dict(live_batch.order_by().values_list('workspace_id').annotate(Count('pk'))))
+                tags.update(tag_link_counts(live_batch))
+            # Detach subtasks first so no row references a deleted parent.
+            for batch in batches:
+                self.model._base_manager.using(using).filter(pk__in=batch).update(parent=None)
+            for batch in batches:
+                TaskHistory.objects.using(using).filter(task_id__in=batch).delete()
+                TaskTag.objects.using(using).filter(task_id__in=batch).delete()
+                TaskDependency.objects.using(using).filter(
+                    Q(blocker_id__in=batch) | Q(blocked_id__in=batch)
+                ).delete()
+                # _raw_delete skips the collector, which would load every task.
+                self.model._base_manager.using(using).filter(pk__in=batch)._raw_delete(using)
+            Workspace.objects.using(using).add_task_counts({pk: -count for pk, count in live.items()})
+            WorkspaceTag.objects.using(using).add_counts({key: -count for key, count in tags.items()})
+        invalidate_calendar(*live)
+        return len(ids)
+    
+    def delete(self):
+        """
+        Permanently delete matching tasks and their subtasks with bulk_delete().
+        
+        The plain QuerySet.delete(), used e.g. by the admin's delete_selected,
+        would leave the workspace task counts and calendars stale.
+        """
+        deleted = self.bulk_delete()
+        return deleted, {self.model._meta.label: deleted}
+    
+    delete.alters_data = True
+    delete.queryset_only = True
+    
+    def soft_delete(self, user=None, batch_size=1000):
+        """
+        Move matching tasks and all their subtasks to the trash.
+        
+        Only deleted_at is set, with one UPDATE per batch of ids, so the
+        tasks can be restored until purge() removes them. Subtasks already
+        in the trash keep their own deletion time. Returns the number of
+        tasks moved.
+        """
+        using = self.db
+        manager = self.model._base_manager.using(using)
+        now = timezone.now()
+        trashed, tags = Counter(), Counter()
+        with transaction.atomic(using=using):
+            ids = self._ids_with_descendants()
+            for start in range(0, len(ids), batch_size):
+                live = manager.filter(pk__in=ids[start:start + batch_size], deleted_at__isnull=True)
+                rows = list(live.select_for_update().values_list('pk', 'workspace_id'))
+                tags.update(tag_link_counts(manager.filter(pk__in=[pk for pk, _ in rows])))
+                manager.filter(pk__in=[pk for pk, _ in rows]).update(deleted_at=now, updated_at=now)
+                TaskHistory.objects.using(using).record_bulk(
+                    ((pk, {'deleted_at': [None, now]}) for pk, _ in rows), user=user
+                )
+                trashed.update(workspace_id for _, workspace_id in rows)
+            Workspace.objects.using(using).add_task_counts({pk: -count for pk, count in trashed.items()})
+            WorkspaceTag.objects.using(using).add_counts({key: -count for key, count in tags.items()})
+        invalidate_calendar(*trashed)
+        return trashed.total()
+    
+    def restore(self, user=None):
+        """
+        Take matching tasks out of the trash.
+        
+        Subtasks that were trashed together with a task, i.e. at the same
+        time, come back with it. Trashed ancestors are restored as well, so
+        no restored task is left under a parent in the trash. Restored
+        tasks count against their workspace's quota again; if they do not
+        fit, QuotaExceededError is raised and nothing is restored. Returns
+        the number of tasks restored.
+        """
+        using = self.db
+        manager = self.model._base_manager.using(using)
+        now = timezone.now()
+        with transaction.atomic(using=using):
+            ids = set()
+            trashed = self.filter(deleted_at__isnull=False).values_list(
+                'pk', 'path', 'deleted_at', 'workspace_id'
+            )
+            for pk, path, deleted_at, workspace_id in trashed:
+                ids.add(pk)
+                ids.update(int(step) for step in path.split('/') if step)
+                ids.update(
+                    self.model.all_objects.using(using)
+                    .subtree(self.model(pk=pk, path=path, workspace_id=workspace_id))
+                    .filter(deleted_at=deleted_at)
+                    .values_list('pk', flat=True)
+                )
+            restored = list(
+                manager.filter(pk__in=ids, deleted_at__isnull=False)
+                .select_for_update()
+                .values_list('pk', 'deleted_at', 'workspace_id')
+            )
+            counts = Counter(workspace_id for _, _, workspace_id in restored)
+            Workspace.objects.using(using).add_task_counts(counts)
+            WorkspaceTag.objects.using(using).add_counts(
+                tag_link_counts(manager.filter(pk__in=[pk for pk, _, _ in restored]))
+            )
+            manager.filter(pk__in=[pk for pk, _, _ in restored]).update(deleted_at=None, updated_at=now)
+            TaskHistory.objects.using(using).record_bulk(
+                ((pk, {'deleted_at': [deleted_at, None]}) for pk, deleted_at, _ in restored), user=user
+            )
+        invalidate_calendar(*counts)
+        return len(restored)
+    
+    def purge(self, before, batch_size=500, pause=0):
+        """
+        Permanently delete tasks moved to the trash before ``before``.
+        
+        Tasks are deleted in small batches, oldest first, each with
+        bulk_delete() in its own transaction. Short transactions keep lock
+        times low, and ``pause`` seconds between batches let replicas catch
+        up. Returns the number of tasks deleted.
+        """
+        deleted = 0
+        while True:
+            pks = list(
+                self.filter(deleted_at__lt=before)
+                .order_by('deleted_at')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return deleted
+            deleted += self.model.all_objects.using(self.db).filter(pk__in=pks).bulk_delete(batch_size)
+            if pause:
+                time.sleep(pause)
+    
+    def ready(self):
+        """
+        Return tasks that are not Done and whose blockers are all Done.
+        
+        This is a single query with a correlated NOT EXISTS served by the
+        (blocked, blocker) index, whatever the number of dependencies.
+        """
+        return self.exclude(status='Done').with_blocked().filter(is_blocked=False)
+
+
+class TaskManager(models.Manager.from_queryset(TaskQuerySet)):
+    """Default Task manager; hides tasks in the trash."""
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+# Partial index condition: only tasks outside the trash are indexed. MySQL
+# does not support conditions and creates these as plain indexes instead.
+LIVE_TASKS = Q(deleted_at__isnull=True)
+
 
 class Task(models.Model):
     """
@@ -14,6 +650,16 @@ class Task(models.Model):
     - status: Current status of the task
     - created_at: When the task was created
     - updated_at: Last time the task was modified
+    - version: Incremented on every update, used for optimistic locking
+    - tags: Labels attached to the task
+    - parent: Task this one is a subtask of
+    - path: Zero-padded ids of all ancestors, e.g. '0000000001/0000000007/'
+    - blocked_by: Tasks that must be Done before this one can start
+    - deleted_at: When the task was moved to the trash, or None
+    - workspace: Workspace the task belongs to; subtasks and blockers are
+      always in the same one
+    
+    ``objects`` leaves out tasks in the trash; ``all_objects`` includes them.
     """
     
     PRIORITY_CHOICES = [
@@ -53,17 +699,553 @@ class Task(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(
+        default=1,
+        help_text="Incremented on every update"
+    )
+    tags = models.ManyToManyField(
+        Tag,
+        through='TaskTag',
+        related_name='tasks',
+        blank=True,
+    )
+    parent = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='subtasks',
+        help_text="Task this one is a subtask of"
+    )
+    path = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        editable=False,
+        db_index=True,
+    )
+    blocked_by = models.ManyToManyField(
+        'self',
+        through='TaskDependency',
+        through_fields=('blocked', 'blocker'),
+        symmetrical=False,
+        related_name='blocks',
+        blank=True,
+    )
+    
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When the task was moved to the trash"
+    )
+    workspace = models.ForeignKey(
+        Workspace,
+        on_delete=models.PROTECT,
+        related_name='tasks',
+        default=default_workspace,
+        editable=False,
+        # The indexes below all start with the workspace.
+        db_index=False,
+    )
+    
+    objects = TaskManager()
+    all_objects = TaskQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
+        # Each workspace's rows are one contiguous range of every index, so
+        # a small workspace's lists never scan past a large one's tasks.
         indexes = [
-            models.Index(fields=['status', '-priority']),
-            models.Index(fields=['due_date']),
+            models.Index(
+                fields=['workspace', '-created_at'], condition=LIVE_TASKS, name='tasks_live_ws_created_idx'
+            ),
+            models.Index(
+                fields=['workspace', 'status', '-priority'], condition=LIVE_TASKS, name='tasks_live_ws_status_idx'
+            ),
+            # Calendar ranges filter by status and count per day from the
+            # index alone.
+            models.Index(
+                fields=['workspace', 'due_date', 'status'], condition=LIVE_TASKS, name='tasks_live_ws_due_idx'
+            ),
+            models.Index(fields=['workspace', 'title'], condition=LIVE_TASKS, name='tasks_live_ws_title_idx'),
+            # The trash view; only trashed tasks are indexed.
+            models.Index(
+                fields=['workspace', '-deleted_at'], condition=Q(deleted_at__isnull=False),
+                name='tasks_trash_ws_deleted_idx',
+            ),
+            # purge() empties the trash of all workspaces, oldest first.
+            models.Index(
+                fields=['deleted_at'], condition=Q(deleted_at__isnull=False), name='tasks_trash_deleted_at_idx'
+            ),
+            # snapshot_tasks reads the tasks updated since its last run,
+            # trashed ones included.
+            models.Index(fields=['workspace', 'updated_at'], name='tasks_ws_updated_idx'),
         ]
     
+    # Fields whose changes are recorded in TaskHistory.
+    TRACKED_FIELDS = ('title', 'description', 'due_date', 'priority', 'status')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so diff() does not need another query.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
     def __str__(self):
         return f"{self.title} ({self.get_status_display()})"
     
+    @property
+    def subtree_prefix(self):
+        """Path shared by all descendants of this task."""
+        return self.path + path_step(self.pk)
+    
+    @property
+    def depth(self):
+        """Number of ancestors; 0 for top-level tasks."""
+        return len(self.path) // (PATH_STEP_WIDTH + 1)
+    
+    def clean(self):
+        super().clean()
+        if self.parent_id is not None:
+            self._path_under(self.parent_id)
+        if self._state.adding:
+            workspace = Workspace.objects.get(pk=self.workspace_id)
+            if not workspace.has_room():
+                raise ValidationError(str(workspace.quota_exceeded()))
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        updating = not self._state.adding
+        # Plain saves still bump the version so concurrent editors notice
+        # them. The database increments it, so two saves of the same loaded
+        # task never write the same version.
+        if updating:
+            self.version = F('version') + 1
+            if update_fields is not None:
+                update_fields = kwargs['update_fields'] = {*update_fields, 'version'}
+        
+        old_prefix = None
+        if self._parent_changed():
+            if not self._state.adding:
+                old_prefix = self.subtree_prefix
+            self.path = self._path_under(self.parent_id)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'path'}
+        
+        if self._state.adding:
+            # Counted against the quota in the INSERT's transaction, but
+            # raised outside it, so an enclosing transaction stays usable.
+            with transaction.atomic(savepoint=False):
+                added = Workspace.objects.add_tasks(self.workspace_id, 1)
+                if added:
+                    super().save(*args, **kwargs)
+            if not added:
+                raise Workspace.objects.get(pk=self.workspace_id).quota_exceeded()
+        elif old_prefix is None or old_prefix == self.subtree_prefix:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self._move_descendants(old_prefix)
+        if updating:
+            self.refresh_from_db(fields=['version'])
+        self.snapshot_loaded_values()
+        invalidate_calendar(self.workspace_id)
+    
+    def delete(self, *args, **kwargs):
+        """Permanently delete the task; see soft_delete() to move it to the trash."""
+        tasks = type(self).objects
+        live_tasks = tasks.filter(Q(pk=self.pk) | Q(pk__in=tasks.subtree(self).values('pk')))
+        with transaction.atomic():
+            live = live_tasks.count()
+            tags = tag_link_counts(live_tasks)
+            result = super().delete(*args, **kwargs)
+            Workspace.objects.add_tasks(self.workspace_id, -live)
+            WorkspaceTag.objects.add_counts({key: -count for key, count in tags.items()})
+        invalidate_calendar(self.workspace_id)
+        return result
+    
+    def soft_delete(self, user=None):
+        """Move the task and its subtasks to the trash."""
+        type(self).all_objects.filter(pk=self.pk).soft_delete(user=user)
+        self.deleted_at = type(self)._base_manager.values_list('deleted_at', flat=True).get(pk=self.pk)
+    
+    def restore(self, user=None):
+        """Take the task, the subtasks trashed with it and its ancestors out of the trash."""
+        type(self).all_objects.filter(pk=self.pk).restore(user=user)
+        self.deleted_at = None
+    
+    def _parent_changed(self):
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None:
+            return self.parent_id is not None or bool(self.path)
+        return loaded.get('parent_id', DEFERRED) != self.parent_id
+    
+    def _path_under(self, parent_id):
+        """
+        Return the path for a task placed under ``parent_id``.
+        
+        Raises ValidationError if that would make the task its own ancestor,
+        nest deeper than the path column allows or cross workspaces.
+        """
+        if parent_id is None:
+            return ''
+        parent_field = self._meta.get_field('parent')
+        if parent_field.is_cached(self) and self.parent_id == parent_id:
+            parent_path, parent_workspace_id = self.parent.path, self.parent.workspace_id
+        else:
+            parent_path, parent_workspace_id = (
+                type(self)._base_manager.values_list('path', 'workspace_id').get(pk=parent_id)
+            )
+        if parent_workspace_id != self.workspace_id:
+            raise ValidationError({'parent': 'A subtask must be in the same workspace as its parent.'})
+        path = parent_path + path_step(parent_id)
+        if self.pk is not None and (parent_id == self.pk or path.startswith(self.subtree_prefix)):
+            raise ValidationError({'parent': 'A task cannot be a subtask of itself or of its own subtasks.'})
+        if len(path) + PATH_STEP_WIDTH + 1 > self._meta.get_field('path').max_length:
+            raise ValidationError({'parent': 'Subtasks cannot be nested this deep.'})
+        return path
+    
+    def _move_descendants(self, old_prefix):
+        """Rewrite the paths of all descendants in a single UPDATE."""
+        new_prefix = self.subtree_prefix
+        # Substr() is 1-based.
+        type(self)._base_manager.filter(
+            path__gte=old_prefix, path__lt=old_prefix[:-1] + '0'
+        ).update(path=Concat(Value(new_prefix), Substr('path', len(old_prefix) + 1)))
+    
+    def is_ready(self):
+        """Return True if the task is not Done and no blocker is unfinished."""
+        return self.status != 'Done' and not self.blocked_by.exclude(status='Done').exists()
+    
+    def add_blocker(self, blocker):
+        """
+        Record that ``blocker`` must be Done before this task can start.
+        
+        Raises ValidationError if the dependency would create a cycle or
+        cross workspaces.
+        """
+        TaskDependency.check_workspaces(blocker.workspace_id, self.workspace_id)
+        TaskDependency.check_cycle(blocker.pk, self.pk)
+        TaskDependency.objects.get_or_create(blocker=blocker, blocked=self)
+    
+    def set_blockers(self, blockers):
+        """Replace this task's blockers, refusing any that create a cycle or cross workspaces."""
+        for blocker in blockers:
+            TaskDependency.check_workspaces(blocker.workspace_id, self.workspace_id)
+        blocker_ids = {blocker.pk for blocker in blockers}
+        current = set(self.blocked_by.values_list('pk', flat=True))
+        for blocker_id in blocker_ids - current:
+            TaskDependency.check_cycle(blocker_id, self.pk)
+        with transaction.atomic():
+            TaskDependency.objects.filter(
+                blocked=self, blocker_id__in=current - blocker_ids
+            ).delete()
+            TaskDependency.objects.bulk_create([
+                TaskDependency(blocker_id=blocker_id, blocked=self)
+                for blocker_id in blocker_ids - current
+            ])
+    
+    def update_if_current(self, fields):
+        """
+        Write ``fields`` only if nobody saved the task since it was loaded.
+        
+        Issues a single ``UPDATE ... WHERE id = %s AND version = %s`` so
+        concurrent edits are detected without row locks. Returns False, and
+        writes nothing, when the stored version no longer matches or the
+        task was moved to the trash in the meantime.
+        """
+        values = {name: getattr(self, name) for name in fields}
+        values['updated_at'] = timezone.now()
+        updated = type(self)._base_manager.filter(
+            pk=self.pk, version=self.version, deleted_at__isnull=True
+        ).update(version=F('version') + 1, **values)
+        if not updated:
+            return False
+        self.version += 1
+        self.updated_at = values['updated_at']
+        if {'due_date', 'status'} & values.keys():
+            invalidate_calendar(self.workspace_id)
+        return True
+    
+    def diff(self):
+        """
+        Return {field: [old, new]} for tracked fields changed since load.
+        
+        Unsaved tasks report every tracked field with an old value of None.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None:
+            return {name: [None, getattr(self, name)] for name in self.TRACKED_FIELDS}
+        changes = {}
+        for name in self.TRACKED_FIELDS:
+            if loaded.get(name, DEFERRED) is DEFERRED:
+                continue
+            old, new = loaded[name], getattr(self, name)
+            if old != new:
+                changes[name] = [old, new]
+        return changes
+    
+    def set_tags(self, names):
+        """
+        Replace the task's tags, creating missing tags in one statement.
+        
+        The workspace's tag counts are updated for a task outside the trash.
+        Calendar counts can be filtered by tag, so the workspace's cached
+        counts are retired as well.
+        """
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+        new = set(Tag.objects.filter(name__in=names).values_list('pk', flat=True))
+        old = set(self.tag_links.values_list('tag_id', flat=True))
+        self.tags.set(new)
+        if self.deleted_at is None:
+            WorkspaceTag.objects.add_counts({
+                **{(self.workspace_id, tag_id): 1 for tag_id in new - old},
+                **{(self.workspace_id, tag_id): -1 for tag_id in old - new},
+            })
+        invalidate_calendar(self.workspace_id)
+    
+    def snapshot_loaded_values(self):
+        """Reset the diff() and parent baseline to the current values."""
+        self._loaded_values = {
+            name: getattr(self, name) for name in (*self.TRACKED_FIELDS, 'parent_id')
+        }
+    
     def get_priority_display_custom(self):
         """Return priority as string."""
         return dict(self.PRIORITY_CHOICES).get(self.priority, 'Unknown')
+
+
+class TaskTag(models.Model):
+    """
+    Link between a task and a tag.
+    
+    The unique constraint indexes (task, tag) for rendering a task's tags;
+    the extra (tag, task) index serves tag-filtered task lists.
+    """
+    
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='task_links')
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'tag'], name='tasks_tasktag_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', 'task']),
+        ]
+    
+    def __str__(self):
+        return f"{self.task_id} - {self.tag_id}"
+
+
+def tag_link_counts(tasks):
+    """Return a Counter of (workspace_id, tag_id): links of the Task queryset ``tasks``."""
+    links = (
+        TaskTag.objects.using(tasks.db)
+        .filter(task__in=tasks.values('pk'))
+        .order_by()
+        .values_list('task__workspace_id', 'tag_id')
+        .annotate(count=Count('pk'))
+    )
+    return Counter({(workspace_id, tag_id): count for workspace_id, tag_id, count in links})
+
+
+class WorkspaceTagQuerySet(models.QuerySet):
+
+    def add_counts(self, counts):
+        """
+        Add each {(workspace_id, tag_id): count} in ``counts``, negative to remove.
+        
+        Missing rows are created first. Each count is then changed by an
+        UPDATE relative to the stored value, one per workspace and amount,
+        so concurrent writers do not overwrite each other's changes.
+        Decreases stop at zero.
+        """
+        counts = {key: count for key, count in counts.items() if count}
+        if not counts:
+            return
+        self.bulk_create([
+            WorkspaceTag(workspace_id=workspace_id, tag_id=tag_id) for workspace_id, tag_id in sorted(counts)
+        ], ignore_conflicts=True)
+        tag_ids = defaultdict(list)
+        for (workspace_id, tag_id), count in counts.items():
+            tag_ids[workspace_id, count].append(tag_id)
+        for (workspace_id, count), ids in sorted(tag_ids.items()):
+            self.filter(workspace_id=workspace_id, tag_id__in=ids).update(
+                task_count=Greatest(F('task_count') + count, 0)
+            )
+
+
+class WorkspaceTag(models.Model):
+    """
+    Number of tasks outside the trash in a workspace that carry a tag.
+    
+    Kept up to date by every write that links or unlinks tags or moves
+    tasks in and out of the trash, so popular_tags() reads the counts
+    instead of joining every tag link to its task.
+    """
+    
+    workspace = models.ForeignKey(Workspace, on_delete=models.CASCADE, related_name='tag_counts')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='workspace_counts')
+    task_count = models.PositiveIntegerField(default=0)
+    
+    objects = WorkspaceTagQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['workspace', 'tag'], name='tasks_workspacetag_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['workspace', '-task_count'], name='tasks_ws_tag_count_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.workspace_id} - {self.tag_id}: {self.task_count}"
+
+
+class TaskDependency(models.Model):
+    """
+    ``blocker`` must be Done before ``blocked`` can start.
+    
+    The unique constraint indexes (blocker, blocked) for walking the graph
+    forwards; the (blocked, blocker) index serves readiness checks.
+    """
+    
+    blocker = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='blocking_links')
+    blocked = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='blocked_by_links')
+    
+    class Meta:
+        verbose_name_plural = 'task dependencies'
+        constraints = [
+            models.UniqueConstraint(fields=['blocker', 'blocked'], name='tasks_taskdependency_unique'),
+            models.CheckConstraint(
+                condition=~Q(blocker=F('blocked')),
+                name='tasks_taskdependency_not_self',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['blocked', 'blocker']),
+        ]
+    
+    def __str__(self):
+        return f"{self.blocker_id} blocks {self.blocked_id}"
+    
+    def clean(self):
+        super().clean()
+        if self.blocker_id is not None and self.blocked_id is not None:
+            self.check_workspaces(self.blocker.workspace_id, self.blocked.workspace_id)
+            self.check_cycle(self.blocker_id, self.blocked_id)
+    
+    @staticmethod
+    def check_workspaces(blocker_workspace_id, blocked_workspace_id):
+        """Raise ValidationError unless both tasks are in the same workspace."""
+        if blocker_workspace_id != blocked_workspace_id:
+            raise ValidationError('A task can only be blocked by tasks in its own workspace.')
+    
+    @classmethod
+    def check_cycle(cls, blocker_id, blocked_id):
+        """
+        Raise ValidationError if blocker -> blocked would close a cycle.
+        
+        That is the case when ``blocked`` already (transitively) blocks
+        ``blocker``. The graph is walked breadth-first with one query per
+        level, never one per task.
+        """
+        if blocker_id == blocked_id:
+            raise ValidationError('A task cannot block itself.')
+        seen = {blocked_id}
+        frontier = {blocked_id}
+        while frontier:
+            frontier = set(
+                cls.objects.filter(blocker_id__in=frontier).values_list('blocked_id', flat=True)
+            ) - seen
+            if blocker_id in frontier:
+                raise ValidationError('This dependency would create a cycle.')
+            seen |= frontier
+
+
+class TaskHistoryQuerySet(models.QuerySet):
+
+    def record(self, task, changes, user=None):
+        """Insert a single history entry; does nothing if nothing changed."""
+        if not changes:
+            return None
+        return self.create(task=task, changes=changes, changed_by=_user_or_none(user))
+    
+    def record_bulk(self, entries, user=None, batch_size=1000):
+        """
+        Insert history for many tasks with batched INSERT statements.
+        
+        ``entries`` is an iterable of (task_id, changes) pairs.
+        """
+        user = _user_or_none(user)
+        rows = [
+            TaskHistory(task_id=task_id, changes=changes, changed_by=user)
+            for task_id, changes in entries
+            if changes
+        ]
+        return self.bulk_create(rows, batch_size=batch_size)
+    
+    def prune(self, before, batch_size=1000):
+        """
+        Delete entries older than ``before`` in primary-key batches.
+        
+        Small batches keep each DELETE short so pruning never holds long
+        locks on the history table. Returns the number of deleted rows.
+        """
+        deleted = 0
+        while True:
+            pks = list(
+                self.filter(changed_at__lt=before)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return deleted
+            deleted += self.filter(pk__in=pks).delete()[0]
+
+
+def _user_or_none(user):
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return None
+    return user
+
+
+class TaskHistory(models.Model):
+    """
+    Audit trail entry for a Task.
+    
+    Only changed fields are stored, as {field: [old, new]} in ``changes``.
+    A task that was just created has every tracked field with old=None.
+    """
+    
+    task = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name='history',
+    )
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+    )
+    changed_at = models.DateTimeField(auto_now_add=True)
+    changes = models.JSONField(encoder=DjangoJSONEncoder)
+    
+    objects = TaskHistoryQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['-changed_at']
+        verbose_name_plural = 'task history'
+        indexes = [
+            models.Index(fields=['task', '-changed_at']),
+            models.Index(fields=['changed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.task_id} @ {self.changed_at:%Y-%m-%d %H:%M}: {', '.join(self.changes)}"
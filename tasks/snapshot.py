@@ -0,0 +1,291 @@
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from itertools import accumulate
+
+from django.conf import settings
+
+
+MAGIC = b'TSNAP\x00\x00\x01'
+FORMAT_VERSION = 1
+
+# Magic, header length as a little-endian uint32, and padding to 8 bytes.
+PREFIX = struct.Struct('<8sI4x')
+
+# name: kind of every column, in file order.
+# - int64, uint32: stored raw
+# - date: days since 1970-01-01, as int32
+# - datetime: microseconds since 1970-01-01 UTC, as int64
+# - dict: one-byte codes into the column's list of distinct values
+# - string: uint64 offsets into the UTF-8 text of all rows, zlib-compressed
+COLUMNS = {
+    'id': 'int64',
+    'parent_id': 'int64',
+    'title': 'string',
+    'description': 'string',
+    'due_date': 'date',
+    'priority': 'dict',
+    'status': 'dict',
+    'tags': 'string',
+    'created_at': 'datetime',
+    'updated_at': 'datetime',
+    'version': 'uint32',
+}
+
+TYPECODES = {'int64': 'q', 'uint32': 'I', 'date': 'i', 'datetime': 'q', 'dict': 'B'}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MICROSECOND = timedelta(microseconds=1)
+
+# Fastest zlib level: text columns shrink about 3x either way.
+ZLIB_LEVEL = 1
+
+
+def snapshot_path(slug):
+    """Return the snapshot file of workspace ``slug``, or None if snapshots are disabled."""
+    directory = (getattr(settings, 'TASKS_SNAPSHOTS', None) or {}).get('DIR')
+    if not directory:
+        return None
+    return os.path.join(directory, f'{slug}.tsnap')
+
+
+def _raw(values):
+    """Return the little-endian bytes of array ``values``."""
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _encode(kind, values):
+    """Return the blocks of a column as a list of (part, bytes) and its extra header fields."""
+    if kind == 'string':
+        encoded = [value.encode() for value in values]
+        offsets = array('Q', accumulate(map(len, encoded), initial=0))
+        return [('offsets', _raw(offsets)), ('data', zlib.compress(b''.join(encoded), ZLIB_LEVEL))], {}
+    extra = {}
+    if kind == 'dict':
+        dictionary = sorted(set(values))
+        if len(dictionary) > 256:
+            raise ValueError(f"A dict column holds at most 256 distinct values, not {len(dictionary)}.")
+        codes = {value: code for code, value in enumerate(dictionary)}
+        values = [codes[value] for value in values]
+        extra['values'] = dictionary
+    elif kind == 'date':
+        values = [value.toordinal() - EPOCH_ORDINAL for value in values]
+    elif kind == 'datetime':
+        values = [(value - EPOCH) // MICROSECOND for value in values]
+    return [('data', _raw(array(TYPECODES[kind], values)))], extra
+
+
+def write_snapshot(path, columns, meta):
+    """
+    Write ``columns``, {name: list of values} for every name in COLUMNS, to ``path``.
+    
+    Values are plain Python values: ints, strs, dates and aware datetimes.
+    ``meta`` is stored in the header as it is. Returns the file size.
+    
+    The file is written next to ``path`` and renamed over it, so readers
+    never see half a snapshot, and readers that have the old file mapped
+    keep reading the old file.
+    """
+    rows = len(columns['id'])
+    blocks, specs, offset = [], {}, 0
+    for name, kind in COLUMNS.items():
+        values = columns[name]
+        if len(values) != rows:
+            raise ValueError(f"Column '{name}' has {len(values)} values, not {rows}.")
+        parts, spec = _encode(kind, values)
+        spec['kind'] = kind
+        for part, data in parts:
+            # Every block starts 8-byte aligned, so it can be cast in place.
+            padding = -len(data) % 8
+            spec[part] = [offset, len(data)]
+            blocks += [data, b'\0' * padding]
+            offset += len(data) + padding
+        specs[name] = spec
+    header = json.dumps({'format': FORMAT_VERSION, 'rows': rows, 'meta': meta, 'columns': specs}).encode()
+    header += b' ' * (-len(header) % 8)
+    
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(PREFIX.pack(MAGIC, len(header)))
+            f.write(header)
+            f.writelines(blocks)
+        # mkstemp() makes the file private; a web server may serve it.
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return PREFIX.size + len(header) + offset
+
+
+class SnapshotReader:
+    """
+    Read a snapshot file through a memory map, without a database.
+    
+    Fixed-width columns are memoryviews over the map, so opening a snapshot
+    and scanning a column copies nothing; string columns are decompressed
+    on first use. Rows are in id order.
+    
+        with SnapshotReader('snapshots/default.tsnap') as snapshot:
+            for row in snapshot.rows(snapshot.filter(status='To Do', tag='urgent')):
+                ...
+    
+    Views returned by column() are released by close().
+    """
+    
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        self._blocks = {}
+        self._strings = {}
+        try:
+            magic, length = PREFIX.unpack_from(self._map)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a task snapshot.")
+            header = json.loads(self._map[PREFIX.size:PREFIX.size + length])
+            if header['format'] != FORMAT_VERSION:
+                raise ValueError(f"{path} has snapshot format {header['format']}, not {FORMAT_VERSION}.")
+        except BaseException:
+            self._map.close()
+            raise
+        self._start = PREFIX.size + length
+        self._columns = header['columns']
+        self.meta = header['meta']
+        self.row_count = header['rows']
+    
+    def __len__(self):
+        return self.row_count
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._blocks.clear()
+        self._map.close()
+    
+    def _block(self, name, part='data', typecode='B'):
+        key = (name, part)
+        if key not in self._blocks:
+            self._blocks[key] = self._map_block(name, part, typecode)
+        return self._blocks[key]
+    
+    def _map_block(self, name, part, typecode):
+        offset, size = self._columns[name][part]
+        start = self._start + offset
+        view = memoryview(self._map)[start:start + size]
+        self._views.append(view)
+        if typecode == 'B':
+            return view
+        if sys.byteorder != 'little':
+            values = array(typecode)
+            values.frombytes(view)
+            values.byteswap()
+            return values
+        view = view.cast(typecode)
+        self._views.append(view)
+        return view
+    
+    def column(self, name):
+        """
+        Return the stored values of column ``name``.
+        
+        A sequence of ints for fixed-width columns: dates and datetimes as
+        stored, dict columns as codes into dictionary(name). A list of strs
+        for string columns.
+        """
+        kind = self._columns[name]['kind']
+        if kind != 'string':
+            return self._block(name, typecode=TYPECODES[kind])
+        if name not in self._strings:
+            offsets = self._block(name, 'offsets', 'Q')
+            text = zlib.decompress(self._block(name))
+            self._strings[name] = [text[offsets[i]:offsets[i + 1]].decode() for i in range(self.row_count)]
+        return self._strings[name]
+    
+    def dictionary(self, name):
+        """Return the distinct values of dict column ``name``, indexed by code."""
+        return self._columns[name]['values']
+    
+    def decode(self, name, value):
+        """Return stored ``value`` of column ``name`` as a Python value."""
+        kind = self._columns[name]['kind']
+        if kind == 'date':
+            return date.fromordinal(value + EPOCH_ORDINAL)
+        if kind == 'datetime':
+            return EPOCH + value * MICROSECOND
+        if kind == 'dict':
+            return self._columns[name]['values'][value]
+        return value
+    
+    def values(self, name):
+        """Return all values of column ``name`` as a list of Python values."""
+        kind, values = self._columns[name]['kind'], self.column(name)
+        if kind == 'date':
+            return [date.fromordinal(value + EPOCH_ORDINAL) for value in values]
+        if kind == 'datetime':
+            return [EPOCH + value * MICROSECOND for value in values]
+        if kind == 'dict':
+            dictionary = self.dictionary(name)
+            return [dictionary[code] for code in values]
+        return list(values)
+    
+    def filter(self, status=None, priority=None, due_from=None, due_to=None, tag=None):
+        """
+        Return the indexes of rows matching all given conditions.
+        
+        ``due_from`` is inclusive and ``due_to`` exclusive. Status and
+        priority are found with a regex scan of their one-byte codes,
+        which runs at memory speed; the other conditions are then checked
+        on the matching rows only.
+        """
+        indexes = None
+        for name, value in (('status', status), ('priority', priority)):
+            if value is None:
+                continue
+            values = self.dictionary(name)
+            if value not in values:
+                return []
+            code, codes = values.index(value), self._block(name)
+            if indexes is None:
+                indexes = [match.start() for match in re.finditer(re.escape(bytes([code])), codes)]
+            else:
+                indexes = [i for i in indexes if codes[i] == code]
+        if indexes is None:
+            indexes = range(self.row_count)
+        if due_from is not None or due_to is not None:
+            days = self.column('due_date')
+            low = -2 ** 31 if due_from is None else due_from.toordinal() - EPOCH_ORDINAL
+            high = 2 ** 31 if due_to is None else due_to.toordinal() - EPOCH_ORDINAL
+            indexes = [i for i in indexes if low <= days[i] < high]
+        if tag is not None:
+            tags = self.column('tags')
+            indexes = [i for i in indexes if tag in tags[i].split(',')]
+        return list(indexes)
+    
+    def rows(self, indexes=None, names=None):
+        """Yield rows as dicts of Python values, all of them or those at ``indexes``."""
+        names = list(names or COLUMNS)
+        columns = [(name, self.column(name)) for name in names]
+        for i in range(self.row_count) if indexes is None else indexes:
+            yield {name: self.decode(name, values[i]) for name, values in columns}
@@ -0,0 +1,114 @@
+import math
+import random
+from datetime import date, timedelta
+from itertools import accumulate
+
+
+# Share of tasks in each status and priority.
+STATUS_WEIGHTS = {'To Do': 40, 'In Progress': 15, 'Done': 45}
+PRIORITY_WEIGHTS = {1: 20, 2: 50, 3: 30}
+
+# Share of tasks without a description.
+EMPTY_DESCRIPTION_RATIO = 0.3
+MAX_DESCRIPTION_WORDS = 2000
+
+VERBS = (
+    'Fix', 'Add', 'Update', 'Remove', 'Refactor', 'Review', 'Test', 'Document',
+    'Investigate', 'Migrate', 'Deploy', 'Design', 'Implement', 'Clean up', 'Speed up',
+)
+OBJECTS = (
+    'login form', 'search results', 'billing page', 'email templates', 'user settings',
+    'API client', 'database schema', 'CI pipeline', 'error handling', 'dashboard',
+    'notifications', 'export to CSV', 'password reset', 'audit log', 'mobile layout',
+    'session timeout', 'report generator', 'cache layer', 'admin filters', 'onboarding flow',
+)
+QUALIFIERS = (
+    '', '', '', 'for new customers', 'on Safari', 'before release', 'after upgrade',
+    'in staging', 'for large accounts', 'behind feature flag',
+)
+WORDS = (
+    'the', 'a', 'to', 'and', 'of', 'in', 'for', 'when', 'with', 'on', 'is', 'not',
+    'user', 'users', 'page', 'request', 'response', 'error', 'value', 'field', 'list',
+    'should', 'must', 'can', 'fails', 'returns', 'shows', 'after', 'before', 'empty',
+    'slow', 'missing', 'wrong', 'data', 'server', 'client', 'timeout', 'retry', 'check',
+    'update', 'config', 'test', 'case', 'steps', 'expected', 'actual', 'see', 'logs',
+)
+TAGS = (
+    'backend', 'frontend', 'bug', 'feature', 'urgent', 'docs', 'tests', 'ops',
+    'security', 'performance', 'ux', 'design', 'api', 'database', 'mobile', 'billing',
+    'search', 'email', 'infra', 'tech-debt',
+)
+
+
+class TaskFactory:
+    """
+    Generate task field values that resemble a real task list.
+    
+    - status and priority follow STATUS_WEIGHTS and PRIORITY_WEIGHTS
+    - Done tasks were mostly due in the past weeks; open tasks cluster
+      around the next two weeks, with a tail of overdue ones
+    - descriptions are empty for EMPTY_DESCRIPTION_RATIO of tasks, the rest
+      have log-normally distributed lengths: mostly a sentence or two,
+      occasionally a few hundred words
+    - tags are drawn with a Zipf-like skew, so a few tags are on most tasks
+    
+    The same ``seed`` always produces the same tasks.
+    """
+    
+    def __init__(self, seed=0, tag_count=len(TAGS), today=None):
+        self.rng = random.Random(seed)
+        self.today = today or date.today()
+        self.tags = list(TAGS[:tag_count]) + [f'project-{i}' for i in range(tag_count - len(TAGS))]
+        # Cumulative weights, so each draw is a binary search.
+        self._tag_weights = list(accumulate(1 / (rank + 1) for rank in range(len(self.tags))))
+        self._statuses = list(STATUS_WEIGHTS), list(accumulate(STATUS_WEIGHTS.values()))
+        self._priorities = list(PRIORITY_WEIGHTS), list(accumulate(PRIORITY_WEIGHTS.values()))
+        # Descriptions are slices of one long text, which is far cheaper than
+        # joining words for every task.
+        words = self.rng.choices(WORDS, k=MAX_DESCRIPTION_WORDS * 4)
+        self._text = ' '.join(words)
+        self._word_starts = list(accumulate((len(word) + 1 for word in words[:-1]), initial=0))
+    
+    def fields(self):
+        """Return a dict of title, description, due_date, priority and status."""
+        status = self._pick(self._statuses)
+        return {
+            'title': self.title(),
+            'description': self.description(),
+            'due_date': self.due_date(status),
+            'priority': self._pick(self._priorities),
+            'status': status,
+        }
+    
+    def title(self):
+        rng = self.rng
+        return ' '.join(filter(None, (rng.choice(VERBS), rng.choice(OBJECTS), rng.choice(QUALIFIERS))))
+    
+    def description(self):
+        if self.rng.random() < EMPTY_DESCRIPTION_RATIO:
+            return ''
+        # Median of about 20 words.
+        length = min(int(self.rng.lognormvariate(3, 1)) + 1, MAX_DESCRIPTION_WORDS)
+        first = self.rng.randrange(len(self._word_starts) - length)
+        text = self._text[self._word_starts[first]:self._word_starts[first + length] - 1]
+        return text.capitalize() + '.'
+    
+    def due_date(self, status):
+        if status == 'Done':
+            days = -int(self.rng.expovariate(1 / 30)) + self.rng.randint(-3, 7)
+        else:
+            days = int(self.rng.gauss(10, 25))
+        return self.today + timedelta(days=days)
+    
+    def created_at(self, now):
+        """Return a creation time before ``now``, most often in the last few weeks."""
+        return now - timedelta(seconds=int(self.rng.expovariate(1 / (45 * 86400))))
+    
+    def tag_names(self, max_tags=4):
+        """Return 0 to ``max_tags`` distinct tag names; fewer tags are more likely."""
+        count = min(int(math.floor(self.rng.expovariate(1 / 1.5))), max_tags)
+        return sorted(set(self.rng.choices(self.tags, cum_weights=self._tag_weights, k=count)))
+    
+    def _pick(self, choices):
+        values, cum_weights = choices
+        return self.rng.choices(values, cum_weights=cum_weights)[0]
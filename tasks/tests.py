@@ -1,36 +1,85 @@
-from django.test import TestCase, Client
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.core.management.base import CommandError
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.contrib import admin as django_admin
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.test import LiveServerTestCase, TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from datetime import date, timedelta
-from .models import Task
+import importlib
+import io
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import patch
+from . import api, class_views, metrics, timeline, urls, views
+from .coalesce import SingleFlight
+from .forms import TaskForm
+from .management.commands.generate_tasks import insert_rows
+from .management.commands.import_report import package_name
+from .management.commands.loadtest import parse_mix, percentile
+from .metrics import FileStore, MetricsRegistry
+from .models import (
+    Tag, Task, TaskDependency, TaskHistory, TaskTag, StaleTaskError, Workspace, WorkspaceTag, popular_tags,
+)
+from .snapshot import MAGIC, SnapshotReader, snapshot_path
+from .throttle import InMemoryBucketStore
+from .timeline import calendar_range, day_counts
+from .synthetic import TaskFactory
+from .validation import task_validator
+
+
+def bulk_create_tasks(*tasks):
+    """
+    Insert ``tasks`` with one INSERT, giving them increasing created_at.
+    
+    bulk_create() stamps every row with practically the same created_at, so
+    the values are spread a second apart, oldest first, in one more query.
+    """
+    Task.objects.bulk_create(tasks)
+    start = timezone.now() - timedelta(seconds=len(tasks))
+    for offset, task in enumerate(tasks):
+        task.created_at = start + timedelta(seconds=offset)
+    Task.objects.bulk_update(tasks, ['created_at'])
+    return tasks
 
 
 class TaskModelTestCase(TestCase):
     """Test cases for Task model."""
     
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Create test data."""
-        self.task1 = Task.objects.create(
-            title="High Priority Task",
-            description="This is a high priority task",
-            due_date=date.today() + timedelta(days=1),
-            priority=1,
-            status='To Do'
-        )
-        
-        self.task2 = Task.objects.create(
-            title="Medium Priority Task",
-            description="This is a medium priority task",
-            due_date=date.today() + timedelta(days=5),
-            priority=2,
-            status='In Progress'
-        )
-        
-        self.task3 = Task.objects.create(
-            title="Low Priority Task",
-            description="This is a low priority task",
-            due_date=date.today() + timedelta(days=10),
-            priority=3,
-            status='Done'
+        cls.task1, cls.task2, cls.task3 = bulk_create_tasks(
+            Task(
+                title="High Priority Task",
+                description="This is a high priority task",
+                due_date=date.today() + timedelta(days=1),
+                priority=1,
+                status='To Do'
+            ),
+            Task(
+                title="Medium Priority Task",
+                description="This is a medium priority task",
+                due_date=date.today() + timedelta(days=5),
+                priority=2,
+                status='In Progress'
+            ),
+            Task(
+                title="Low Priority Task",
+                description="This is a low priority task",
+                due_date=date.today() + timedelta(days=10),
+                priority=3,
+                status='Done'
+            ),
         )
     
     def test_task_creation(self):
@@ -68,43 +117,44 @@ class TaskModelTestCase(TestCase):
 class TaskListViewTestCase(TestCase):
     """Test cases for task_list view."""
     
+    @classmethod
+    def setUpTestData(cls):
+        """Create tasks with different statuses and priorities."""
+        cls.url = reverse('tasks:task_list')
+        cls.task1, cls.task2, cls.task3, cls.task4 = bulk_create_tasks(
+            Task(
+                title="Task 1 - To Do",
+                description="First task",
+                due_date=date.today() + timedelta(days=1),
+                priority=1,
+                status='To Do'
+            ),
+            Task(
+                title="Task 2 - In Progress",
+                description="Second task",
+                due_date=date.today() + timedelta(days=5),
+                priority=2,
+                status='In Progress'
+            ),
+            Task(
+                title="Task 3 - Done",
+                description="Third task",
+                due_date=date.today() + timedelta(days=10),
+                priority=3,
+                status='Done'
+            ),
+            Task(
+                title="Task 4 - To Do",
+                description="Fourth task",
+                due_date=date.today() + timedelta(days=3),
+                priority=1,
+                status='To Do'
+            ),
+        )
+    
     def setUp(self):
-        """Create test data and client."""
+        """Create the client."""
         self.client = Client()
-        self.url = reverse('tasks:task_list')
-        
-        # Create tasks with different statuses and priorities
-        self.task1 = Task.objects.create(
-            title="Task 1 - To Do",
-            description="First task",
-            due_date=date.today() + timedelta(days=1),
-            priority=1,
-            status='To Do'
-        )
-        
-        self.task2 = Task.objects.create(
-            title="Task 2 - In Progress",
-            description="Second task",
-            due_date=date.today() + timedelta(days=5),
-            priority=2,
-            status='In Progress'
-        )
-        
-        self.task3 = Task.objects.create(
-            title="Task 3 - Done",
-            description="Third task",
-            due_date=date.today() + timedelta(days=10),
-            priority=3,
-            status='Done'
-        )
-        
-        self.task4 = Task.objects.create(
-            title="Task 4 - To Do",
-            description="Fourth task",
-            due_date=date.today() + timedelta(days=3),
-            priority=1,
-            status='To Do'
-        )
     
     def test_task_list_view_returns_200(self):
         """Test that task_list view returns 200 status code."""
@@ -270,3 +320,1476 @@ class TaskListViewTestCase(TestCase):
         response = self.client.get(self.url, {'sort': 'priority'})
         
         self.assertEqual(response.context['current_sort'], 'priority')
+    
+    def pages(self, url, **params):
+        """Return the task ids of every page of an API list, following ``next``."""
+        pages, after = [], None
+        while True:
+            query = {**params, 'limit': 1} if after is None else {**params, 'limit': 1, 'after': after}
+            data = self.client.get(url, query).json()
+            pages.append([task['id'] for task in data['results']])
+            after = data['next']
+            if after is None:
+                return pages
+    
+    def test_api_list_pages_by_cursor(self):
+        """Test that API lists come in pages that follow the sort, ties ordered by id."""
+        url = reverse('tasks:api_task_list')
+        
+        pages = self.pages(url, sort='priority')
+        self.assertEqual(pages, [[self.task1.pk], [self.task4.pk], [self.task2.pk], [self.task3.pk]])
+        pages = self.pages(url, sort='-priority')
+        self.assertEqual(pages, [[self.task3.pk], [self.task2.pk], [self.task4.pk], [self.task1.pk]])
+        pages = self.pages(reverse('tasks:api_ready_tasks'))
+        self.assertEqual(pages, [[self.task1.pk], [self.task4.pk], [self.task2.pk]])
+    
+    def test_api_list_page_size_is_capped(self):
+        """Test that limit is capped and a bad cursor is refused."""
+        url = reverse('tasks:api_task_list')
+        with patch.object(api, 'MAX_PAGE_SIZE', 3):
+            data = self.client.get(url, {'limit': 1000}).json()
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(data['next'], data['results'][-1]['id'])
+        
+        self.assertEqual(self.client.get(url, {'after': 0}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': 'all'}).status_code, 400)
+
+
+class TaskHistoryTestCase(TestCase):
+    """Test cases for the task audit trail."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        """Create a task through the form so it has a creation entry."""
+        form = TaskForm({
+            'title': 'Audited Task',
+            'description': 'Original description',
+            'due_date': date.today() + timedelta(days=2),
+            'priority': 2,
+            'status': 'To Do',
+        })
+        # save() raises ValueError if the data did not validate.
+        cls.task = form.save()
+    
+    def edit(self, **changes):
+        task = Task.objects.get(pk=self.task.pk)
+        data = {
+            'title': task.title,
+            'description': task.description,
+            'due_date': task.due_date,
+            'priority': task.priority,
+            'status': task.status,
+        }
+        data.update(changes)
+        form = TaskForm(data, instance=task)
+        self.assertTrue(form.is_valid())
+        return form.save()
+    
+    def test_creation_is_recorded(self):
+        """Test that creating a task records every tracked field."""
+        entry = self.task.history.get()
+        self.assertEqual(set(entry.changes), set(Task.TRACKED_FIELDS))
+        self.assertEqual(entry.changes['title'], [None, 'Audited Task'])
+    
+    def test_only_changed_fields_are_recorded(self):
+        """Test that an edit stores just the fields that changed."""
+        self.edit(status='Done', priority=1)
+        entry = self.task.history.first()
+        self.assertEqual(entry.changes, {
+            'status': ['To Do', 'Done'],
+            'priority': [2, 1],
+        })
+    
+    def test_unchanged_edit_records_nothing(self):
+        """Test that saving without changes does not add an entry."""
+        self.edit()
+        self.assertEqual(self.task.history.count(), 1)
+    
+    def test_edit_view_records_history(self):
+        """Test that edit_task writes an entry for the changed fields."""
+        url = reverse('tasks:edit_task', args=[self.task.pk])
+        self.client.post(url, {
+            'title': 'Renamed Task',
+            'description': 'Original description',
+            'due_date': self.task.due_date,
+            'priority': 2,
+            'status': 'To Do',
+        })
+        entry = self.task.history.first()
+        self.assertEqual(entry.changes, {'title': ['Audited Task', 'Renamed Task']})
+        self.assertIsNone(entry.changed_by)
+    
+    def test_record_bulk(self):
+        """Test that bulk entries skip empty change sets."""
+        TaskHistory.objects.record_bulk([
+            (self.task.pk, {'status': ['To Do', 'Done']}),
+            (self.task.pk, {}),
+        ])
+        self.assertEqual(self.task.history.count(), 2)
+    
+    def test_prune_deletes_old_entries(self):
+        """Test that prune removes entries older than the cutoff only."""
+        self.edit(status='Done')
+        TaskHistory.objects.filter(pk=self.task.history.last().pk).update(
+            changed_at=timezone.now() - timedelta(days=100)
+        )
+        deleted = TaskHistory.objects.prune(timezone.now() - timedelta(days=90), batch_size=1)
+        self.assertEqual(deleted, 1)
+        self.assertEqual(self.task.history.count(), 1)
+
+
+class TaskConcurrencyTestCase(TestCase):
+    """Test cases for optimistic locking on task edits."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        """Create a task and the form data for editing it."""
+        cls.task = Task.objects.create(
+            title="Shared Task",
+            due_date=date.today() + timedelta(days=3),
+            priority=2,
+            status='To Do'
+        )
+        cls.data = {
+            'title': 'Shared Task',
+            'description': '',
+            'due_date': cls.task.due_date,
+            'priority': 2,
+            'status': 'In Progress',
+            'version': cls.task.version,
+        }
+    
+    def test_update_if_current_bumps_version(self):
+        """Test that a conditional update increments the version."""
+        task = Task.objects.get(pk=self.task.pk)
+        task.status = 'Done'
+        
+        self.assertTrue(task.update_if_current(['status']))
+        self.assertEqual(task.version, 2)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).version, 2)
+    
+    def test_plain_saves_never_share_a_version(self):
+        """Test that two saves of the same loaded task write different versions."""
+        first, second = Task.objects.get(pk=self.task.pk), Task.objects.get(pk=self.task.pk)
+        
+        first.save()
+        second.save()
+        
+        self.assertEqual((first.version, second.version), (2, 3))
+        self.assertEqual(Task.objects.get(pk=self.task.pk).version, 3)
+    
+    def test_admin_form_rejects_stale_version(self):
+        """Test that an admin edit based on an old version is refused, then rebased."""
+        request = RequestFactory().get('/')
+        request.workspace = self.task.workspace
+        task_admin = django_admin.site._registry[Task]
+        form_class = task_admin.get_form(request, self.task)
+        data = {**self.data, 'loaded_version': 1}
+        Task.objects.get(pk=self.task.pk).save()
+        
+        form = form_class(data, instance=Task.objects.get(pk=self.task.pk))
+        
+        self.assertFalse(form.is_valid())
+        self.assertTrue(form.non_field_errors())
+        self.assertTrue(form_class(form.data, instance=Task.objects.get(pk=self.task.pk)).is_valid())
+    
+    def test_form_save_rejects_stale_version(self):
+        """Test that a form edit based on an old version is refused."""
+        Task.objects.get(pk=self.task.pk).save()
+        form = TaskForm(self.data, instance=Task.objects.get(pk=self.task.pk))
+        self.assertTrue(form.is_valid())
+        
+        with self.assertRaises(StaleTaskError):
+            form.save()
+        self.assertEqual(Task.objects.get(pk=self.task.pk).status, 'To Do')
+        self.assertEqual(self.task.history.count(), 0)
+    
+    def test_edit_view_reports_conflict(self):
+        """Test that edit_task answers 409 when the task changed meanwhile."""
+        Task.objects.get(pk=self.task.pk).save()
+        url = reverse('tasks:edit_task', args=[self.task.pk])
+        
+        response = self.client.post(url, self.data)
+        
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.assertEqual(Task.objects.get(pk=self.task.pk).status, 'To Do')
+        
+        # Resubmitting the rebased form overwrites the other change.
+        response = self.client.post(url, response.context['form'].data)
+        self.assertRedirects(response, reverse('tasks:task_list'))
+        self.assertEqual(Task.objects.get(pk=self.task.pk).status, 'In Progress')
+    
+    def test_class_update_view_records_user_and_reports_conflict(self):
+        """Test that TaskUpdateView saves like edit_task: with history, or 409 on conflict."""
+        user = User.objects.create_user('editor')
+        view = class_views.TaskUpdateView.as_view()
+        def post(data):
+            request = RequestFactory().post('/', data)
+            request.user, request.workspace = user, self.task.workspace
+            return view(request, pk=self.task.pk)
+        Task.objects.get(pk=self.task.pk).save()
+        
+        response = post(self.data)
+        
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.context_data['form'].non_field_errors())
+        self.assertEqual(Task.objects.get(pk=self.task.pk).status, 'To Do')
+        response = post(response.context_data['form'].data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.task.history.get().changed_by, user)
+    
+    def test_api_patch_with_current_version(self):
+        """Test that the API applies a PATCH sent with the current version."""
+        url = reverse('tasks:api_task_detail', args=[self.task.pk])
+        response = self.client.patch(
+            url, json.dumps({'status': 'Done', 'version': 1}),
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'Done')
+        self.assertEqual(response.json()['version'], 2)
+    
+    def test_api_patch_with_stale_version(self):
+        """Test that the API answers 409 with the current task on conflict."""
+        Task.objects.get(pk=self.task.pk).save()
+        url = reverse('tasks:api_task_detail', args=[self.task.pk])
+        response = self.client.patch(
+            url, json.dumps({'status': 'Done', 'version': 1}),
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['current']['version'], 2)
+    
+    def test_api_writes_without_csrf_token(self):
+        """Test that API clients can write without a CSRF cookie or header."""
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('tasks:api_task_detail', args=[self.task.pk])
+        data = {'title': 'Other', 'due_date': '2030-01-01', 'priority': 2, 'status': 'To Do'}
+        
+        response = client.post(reverse('tasks:api_task_list'), data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = client.patch(url, {'status': 'Done', 'version': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        relations = reverse('tasks:api_task_relations', args=[self.task.pk])
+        self.assertEqual(client.put(relations, {'blocked_by': []}, content_type='application/json').status_code, 200)
+        self.assertEqual(client.delete(url).status_code, 204)
+        restore = reverse('tasks:api_restore_task', args=[self.task.pk])
+        self.assertEqual(client.post(restore).status_code, 200)
+    
+    def test_api_update_requires_version(self):
+        """Test that the API refuses updates without a version."""
+        url = reverse('tasks:api_task_detail', args=[self.task.pk])
+        response = self.client.patch(
+            url, json.dumps({'status': 'Done'}),
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskTagTestCase(TestCase):
+    """Test cases for tagging and tag-filtered task lists."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        """Create tasks with overlapping tags."""
+        cls.url = reverse('tasks:task_list')
+        cls.backend, cls.frontend, cls.untagged = bulk_create_tasks(
+            Task(title="Backend Task", due_date=date.today() + timedelta(days=1)),
+            Task(title="Frontend Task", due_date=date.today() + timedelta(days=2)),
+            Task(title="Untagged Task", due_date=date.today() + timedelta(days=3)),
+        )
+        cls.backend.set_tags(['backend', 'urgent'])
+        cls.frontend.set_tags(['frontend', 'urgent'])
+    
+    def setUp(self):
+        """Forget cached tag counts from other tests."""
+        cache.clear()
+    
+    def titles(self, tasks):
+        return sorted(task.title for task in tasks)
+    
+    def test_with_tags_any(self):
+        """Test that match='any' keeps tasks with at least one tag."""
+        tasks = Task.objects.with_tags(['backend', 'frontend'])
+        self.assertEqual(self.titles(tasks), ["Backend Task", "Frontend Task"])
+    
+    def test_with_tags_all(self):
+        """Test that match='all' keeps tasks with every tag."""
+        tasks = Task.objects.with_tags(['backend', 'urgent'], match='all')
+        self.assertEqual(self.titles(tasks), ["Backend Task"])
+    
+    def test_with_unknown_tag(self):
+        """Test that an unknown tag matches nothing in 'all' mode."""
+        self.assertFalse(Task.objects.with_tags(['urgent', 'missing'], match='all').exists())
+        self.assertEqual(Task.objects.with_tags(['urgent', 'missing']).count(), 2)
+    
+    def test_list_view_filters_by_tag(self):
+        """Test that task_list filters by comma-separated tags."""
+        response = self.client.get(self.url, {'tag': 'backend, frontend'})
+        self.assertEqual(self.titles(response.context['tasks']), ["Backend Task", "Frontend Task"])
+        
+        response = self.client.get(self.url, {'tag': 'urgent,frontend', 'tag_mode': 'all'})
+        self.assertEqual(self.titles(response.context['tasks']), ["Frontend Task"])
+    
+    def test_list_view_query_count_is_constant(self):
+        """Test that rendering more tagged tasks does not add queries."""
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        
+        for i in range(5):
+            task = Task.objects.create(title=f"Extra {i}", due_date=date.today())
+            task.set_tags(['extra', f'label-{i}'])
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+    
+    def test_form_sets_tags_and_records_history(self):
+        """Test that TaskForm creates missing tags and logs tag changes."""
+        form = TaskForm({
+            'title': 'Backend Task',
+            'description': '',
+            'due_date': self.backend.due_date,
+            'priority': 2,
+            'status': 'To Do',
+            'tags': 'backend, release',
+        }, instance=Task.objects.get(pk=self.backend.pk))
+        self.assertTrue(form.is_valid())
+        form.save()
+        
+        self.assertEqual(sorted(tag.name for tag in self.backend.tags.all()), ['backend', 'release'])
+        self.assertTrue(Tag.objects.filter(name='release').exists())
+        self.assertEqual(
+            self.backend.history.first().changes['tags'],
+            [['backend', 'urgent'], ['backend', 'release']]
+        )
+    
+    def test_api_filters_and_returns_tags(self):
+        """Test that the API filters by tag and lists each task's tags."""
+        response = self.client.get(reverse('tasks:api_task_list'), {'tag': 'backend'})
+        results = response.json()['results']
+        
+        self.assertEqual(len(results), 1)
+        self.assertEqual(sorted(results[0]['tags']), ['backend', 'urgent'])
+    
+    def test_tag_counts_follow_tags_and_trash(self):
+        """Test that per-workspace tag counts stay in step with every tag and trash write."""
+        workspace = Workspace.objects.get(slug='default')
+        def counts():
+            cache.clear()
+            return dict(popular_tags(workspace=workspace))
+        self.assertEqual(counts(), {'urgent': 2, 'backend': 1, 'frontend': 1})
+        
+        self.backend.soft_delete()
+        self.assertEqual(counts(), {'urgent': 1, 'frontend': 1})
+        self.backend.restore()
+        self.frontend.set_tags(['frontend'])
+        self.assertEqual(counts(), {'urgent': 1, 'backend': 1, 'frontend': 1})
+        
+        Task.objects.bulk_import([
+            {'title': 'Imported', 'description': '', 'due_date': date.today(), 'priority': 2,
+             'status': 'To Do', 'tags': ['urgent']},
+        ])
+        Task.objects.filter(pk=self.backend.pk).bulk_delete()
+        Task.objects.get(pk=self.frontend.pk).delete()
+        self.assertEqual(counts(), {'urgent': 1})
+        
+        stored = set(WorkspaceTag.objects.filter(task_count__gt=0).values_list('tag_id', 'task_count'))
+        Workspace.objects.recount_tags()
+        self.assertEqual(set(WorkspaceTag.objects.values_list('tag_id', 'task_count')), stored)
+    
+    def test_api_patch_keeps_tags(self):
+        """Test that a PATCH without tags leaves them untouched."""
+        url = reverse('tasks:api_task_detail', args=[self.backend.pk])
+        self.client.patch(
+            url, json.dumps({'status': 'Done', 'version': 1}),
+            content_type='application/json'
+        )
+        self.assertEqual(self.backend.tags.count(), 2)
+
+
+class TaskRelationsTestCase(TestCase):
+    """Test cases for subtasks and blocking dependencies."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        """Create a small project tree: project > phase > step."""
+        due = date.today() + timedelta(days=7)
+        cls.project = Task.objects.create(title="Project", due_date=due)
+        cls.phase = Task.objects.create(title="Phase", due_date=due, parent=cls.project)
+        cls.step = Task.objects.create(title="Step", due_date=due, parent=cls.phase)
+        cls.other = Task.objects.create(title="Other", due_date=due)
+    
+    def test_paths_follow_ancestors(self):
+        """Test that each task's path lists its ancestors."""
+        self.assertEqual(self.project.path, '')
+        self.assertEqual(self.step.path, self.phase.subtree_prefix)
+        self.assertEqual(self.step.depth, 2)
+    
+    def test_subtree(self):
+        """Test that subtree() returns all descendants and nothing else."""
+        titles = set(Task.objects.subtree(self.project).values_list('title', flat=True))
+        self.assertEqual(titles, {"Phase", "Step"})
+    
+    def test_moving_a_task_moves_its_subtree(self):
+        """Test that reparenting rewrites descendant paths."""
+        phase = Task.objects.get(pk=self.phase.pk)
+        phase.parent = self.other
+        phase.save()
+        
+        step = Task.objects.get(pk=self.step.pk)
+        self.assertEqual(step.path, path_prefix(self.other, phase))
+        self.assertFalse(Task.objects.subtree(self.project).exists())
+    
+    def test_parent_cycle_is_refused(self):
+        """Test that a task cannot be moved under its own subtask."""
+        project = Task.objects.get(pk=self.project.pk)
+        project.parent = self.step
+        with self.assertRaises(ValidationError):
+            project.save()
+    
+    def test_dependency_cycle_is_refused(self):
+        """Test that closing a chain of blockers into a loop fails."""
+        self.step.add_blocker(self.phase)
+        self.other.add_blocker(self.step)
+        with self.assertRaises(ValidationError):
+            self.phase.add_blocker(self.other)
+        with self.assertRaises(ValidationError):
+            TaskDependency.check_cycle(self.step.pk, self.step.pk)
+    
+    def test_ready_tasks(self):
+        """Test that ready() excludes tasks with unfinished blockers."""
+        self.step.add_blocker(self.phase)
+        self.step.add_blocker(self.other)
+        self.other.status = 'Done'
+        self.other.save()
+        
+        with self.assertNumQueries(1):
+            ready = set(Task.objects.ready().values_list('title', flat=True))
+        self.assertEqual(ready, {"Project", "Phase"})
+        
+        self.phase.status = 'Done'
+        self.phase.save()
+        self.assertTrue(Task.objects.get(pk=self.step.pk).is_ready())
+    
+    def test_api_tree_uses_fixed_queries(self):
+        """Test that the tree endpoint does not query per node."""
+        url = reverse('tasks:api_task_tree', args=[self.project.pk])
+        # Root, descendants and all their tags.
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        depths = {node['title']: node['depth'] for node in response.json()['results']}
+        self.assertEqual(depths, {"Project": 0, "Phase": 1, "Step": 2})
+    
+    def test_api_relations_refuse_cycles(self):
+        """Test that the relations endpoint answers 400 for a cycle."""
+        url = reverse('tasks:api_task_relations', args=[self.project.pk])
+        response = self.client.put(
+            url, json.dumps({'parent': self.step.pk}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.put(
+            url, json.dumps({'blocked_by': [self.other.pk]}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['blocked_by'], [self.other.pk])
+    
+    def test_api_relations_write_only_the_parent(self):
+        """Test that moving a task leaves its other columns to concurrent edits."""
+        url = reverse('tasks:api_task_relations', args=[self.other.pk])
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(
+                url, json.dumps({'parent': self.project.pk}), content_type='application/json'
+            )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 2)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "tasks_task"')]
+        self.assertTrue(updates)
+        self.assertFalse([sql for sql in updates if '"title"' in sql])
+        self.assertEqual(Task.objects.get(pk=self.other.pk).path, path_prefix(self.project))
+
+
+def path_prefix(*ancestors):
+    return ''.join(f'{task.pk:010d}/' for task in ancestors)
+
+
+@override_settings(TASKS_ADMIN_PERFORMANCE_MODE=True)
+class TaskAdminPerformanceTestCase(TestCase):
+    """Test cases for the admin performance mode."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        """Create an admin user and a handful of tasks."""
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.url = reverse('admin:tasks_task_changelist')
+        cls.tasks = bulk_create_tasks(*[
+            Task(title=f"Task {i}", due_date=date.today(), status='To Do')
+            for i in range(5)
+        ])
+        # bulk_create() leaves the workspace's task count alone.
+        Workspace.objects.recount_tasks()
+    
+    def setUp(self):
+        """Log in as the admin user, with no workspace cached by other tests."""
+        self.client.force_login(self.user)
+        cache.clear()
+    
+    def test_changelist_uses_keyset_pagination(self):
+        """Test that the cursor selects tasks with a lower id."""
+        response = self.client.get(self.url, {'after': self.tasks[2].pk})
+        
+        self.assertEqual(response.status_code, 200)
+        cl = response.context['cl']
+        self.assertEqual([task.pk for task in cl.result_list], [self.tasks[1].pk, self.tasks[0].pk])
+        self.assertIsNotNone(cl.first_url)
+    
+    def test_unfiltered_changelist_runs_no_count(self):
+        """Test that the unfiltered count is the workspace's, and filters are counted."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        
+        self.assertEqual(response.context['cl'].result_count, 5)
+        self.assertFalse([q for q in queries if '"__count"' in q['sql']])
+        
+        response = self.client.get(self.url, {'status__exact': 'Done'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+        self.assertTrue(response.context['cl'].result_count_exact)
+    
+    def test_changelist_filters_by_date(self):
+        """Test that the created_at filter is offered and applied."""
+        response = self.client.get(self.url, {'created_at__gte': str(date.today() + timedelta(days=1))})
+        
+        cl = response.context['cl']
+        self.assertIn('created_at', [spec.field_path for spec in cl.filter_specs if hasattr(spec, 'field_path')])
+        self.assertEqual(list(cl.result_list), [])
+    
+    def test_search_by_id_and_title_prefix(self):
+        """Test that search matches an exact id or a title prefix."""
+        response = self.client.get(self.url, {'q': str(self.tasks[3].pk)})
+        self.assertEqual(list(response.context['cl'].result_list), [self.tasks[3]])
+        
+        response = self.client.get(self.url, {'q': 'task 4'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.tasks[4]])
+    
+    def test_mark_done_action(self):
+        """Test that the status action updates rows and records history."""
+        self.client.post(self.url, {
+            'action': 'mark_done',
+            'index': 0,
+            helpers.ACTION_CHECKBOX_NAME: [self.tasks[0].pk, self.tasks[1].pk],
+        })
+        
+        self.assertEqual(Task.objects.filter(status='Done').count(), 2)
+        entry = self.tasks[0].history.get()
+        self.assertEqual(entry.changes, {'status': ['To Do', 'Done']})
+        self.assertEqual(entry.changed_by, self.user)
+    
+    def test_bulk_delete_action(self):
+        """Test that bulk delete asks first, then removes tasks and subtasks."""
+        Task.objects.create(title="Subtask", due_date=date.today(), parent=self.tasks[0])
+        data = {
+            'action': 'bulk_delete',
+            'index': 0,
+            helpers.ACTION_CHECKBOX_NAME: [self.tasks[0].pk],
+        }
+        
+        response = self.client.post(self.url, data)
+        self.assertTemplateUsed(response, 'admin/tasks/task/bulk_delete_confirmation.html')
+        self.assertEqual(Task.objects.count(), 6)
+        
+        self.client.post(self.url, {**data, 'post': 'yes'})
+        self.assertEqual(Task.objects.count(), 4)
+        self.assertFalse(Task.objects.filter(title="Subtask").exists())
+
+
+class TaskRateLimitTestCase(TestCase):
+    """Test cases for rate limiting and request coalescing."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        """Create a task to list."""
+        Task.objects.create(title="Listed task", due_date=date.today())
+    
+    @override_settings(TASKS_RATE_LIMIT={'RATE': 1, 'BURST': 2})
+    def test_requests_over_burst_are_rejected(self):
+        """Test that requests beyond the burst get 429 with Retry-After."""
+        client = Client()
+        url = reverse('tasks:api_task_list')
+        
+        self.assertEqual(client.get(url).status_code, 200)
+        self.assertEqual(client.get(url).status_code, 200)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+    
+    @override_settings(TASKS_RATE_LIMIT={'RATE': 1, 'BURST': 1})
+    def test_admin_is_not_rate_limited(self):
+        """Test that only the tasks views are limited."""
+        client = Client()
+        client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        url = reverse('admin:tasks_task_changelist')
+        
+        self.assertEqual(client.get(url).status_code, 200)
+        self.assertEqual(client.get(url).status_code, 200)
+    
+    @override_settings(TASKS_RATE_LIMIT={'RATE': 1, 'BURST': 1, 'CLIENT_IP_HEADER': 'X-Forwarded-For'})
+    def test_client_ip_header(self):
+        """Test that clients behind a proxy get their own buckets, keyed by the last forwarded address."""
+        client = Client()
+        url = reverse('tasks:api_task_list')
+        
+        self.assertEqual(client.get(url, headers={'x-forwarded-for': '10.0.0.1'}).status_code, 200)
+        self.assertEqual(client.get(url, headers={'x-forwarded-for': 'spoofed, 10.0.0.2'}).status_code, 200)
+        self.assertEqual(client.get(url, headers={'x-forwarded-for': '10.0.0.2'}).status_code, 429)
+    
+    def test_full_buckets_are_dropped(self):
+        """Test that the in-memory store forgets buckets that have refilled."""
+        store = InMemoryBucketStore()
+        store.take('old', rate=1, capacity=5, now=0)
+        store.take('busy', rate=1, capacity=5, now=0)
+        
+        for _ in range(3):
+            store.take('busy', rate=1, capacity=5, now=61)
+        
+        self.assertEqual(list(store._buckets), ['busy'])
+    
+    def test_bucket_refills_over_time(self):
+        """Test that tokens come back at the configured rate."""
+        store = InMemoryBucketStore()
+        
+        self.assertEqual(store.take('client', rate=2, capacity=1, now=0), (True, 0.0))
+        self.assertEqual(store.take('client', rate=2, capacity=1, now=0.25), (False, 0.25))
+        self.assertEqual(store.take('client', rate=2, capacity=1, now=0.5), (True, 0.0))
+    
+    def test_single_flight_shares_result(self):
+        """Test that concurrent callers with the same key run the function once."""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+        
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'page'
+        
+        leader = threading.Thread(target=lambda: results.append(flight.do('key', work)))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=lambda: results.append(flight.do('key', work)))
+        follower.start()
+        # Give the follower time to start waiting on the leader.
+        follower.join(0.1)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('page', False), ('page', True)])
+    
+    def test_single_flight_follower_timeout(self):
+        """Test that a follower stops waiting for a stuck leader and runs the function itself."""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        
+        def stuck():
+            started.set()
+            release.wait(5)
+            return 'leader'
+        
+        leader = threading.Thread(target=flight.do, args=('key', stuck))
+        leader.start()
+        started.wait(5)
+        
+        result = flight.do('key', lambda: 'follower', timeout=0.05)
+        
+        release.set()
+        leader.join(5)
+        self.assertEqual(result, ('follower', False))
+    
+    def test_coalesced_list_view_renders(self):
+        """Test that the coalesced list view still renders its context."""
+        response = self.client.get(reverse('tasks:task_list'), {'status': 'To Do'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Listed task")
+        self.assertEqual(response.context['current_status_filter'], 'To Do')
+
+
+class TaskValidationTestCase(TestCase):
+    """Test cases for TaskValidator, bulk creation and imports."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        """Set up a valid row."""
+        cls.row = {
+            'title': 'Imported task',
+            'due_date': '2030-01-15',
+            'priority': '1',
+            'tags': 'import, backend',
+        }
+    
+    def test_validate_cleans_and_fills_defaults(self):
+        """Test that values are converted and missing fields get defaults."""
+        cleaned, errors = task_validator.validate(self.row)
+        
+        self.assertEqual(errors, {})
+        self.assertEqual(cleaned, {
+            'title': 'Imported task',
+            'description': '',
+            'due_date': date(2030, 1, 15),
+            'priority': 1,
+            'status': 'To Do',
+            'tags': ['import', 'backend'],
+        })
+    
+    def test_validate_reports_structured_errors(self):
+        """Test that every invalid field is reported."""
+        _, errors = task_validator.validate({
+            'title': 'x' * 201,
+            'due_date': '15/01/2030',
+            'priority': True,
+            'status': 'Blocked',
+        })
+        
+        self.assertEqual(set(errors), {'title', 'due_date', 'priority', 'status'})
+        self.assertEqual(errors['due_date'], ['Enter a valid date.'])
+        self.assertEqual(task_validator.validate({})[1]['title'], ['This field is required.'])
+    
+    def test_validate_many_indexes_errors(self):
+        """Test that invalid rows are reported by index and valid ones kept."""
+        cleaned, errors = task_validator.validate_many([self.row, {'title': 'No date'}, 'junk'])
+        
+        self.assertEqual(len(cleaned), 1)
+        self.assertEqual(set(errors), {1, 2})
+        self.assertIn('due_date', errors[1])
+    
+    def test_form_uses_validator_errors(self):
+        """Test that TaskForm still rejects out-of-range priorities."""
+        form = TaskForm(data={'title': 'Form task', 'due_date': '2030-01-15', 'priority': 4, 'status': 'To Do'})
+        
+        self.assertFalse(form.is_valid())
+        self.assertIn('priority', form.errors)
+    
+    def test_api_bulk_create(self):
+        """Test that a JSON array creates all tasks with tags and history."""
+        response = self.client.post(
+            reverse('tasks:api_task_list'),
+            json.dumps([self.row, {**self.row, 'title': 'Second', 'tags': []}]),
+            content_type='application/json',
+        )
+        
+        self.assertEqual(response.status_code, 201)
+        results = response.json()['results']
+        self.assertEqual([task['title'] for task in results], ['Imported task', 'Second'])
+        first = Task.objects.get(pk=results[0]['id'])
+        self.assertEqual(sorted(tag.name for tag in first.tags.all()), ['backend', 'import'])
+        self.assertEqual(first.history.get().changes['tags'], [[], ['import', 'backend']])
+    
+    def test_api_bulk_create_is_all_or_nothing(self):
+        """Test that one invalid item rejects the whole array."""
+        response = self.client.post(
+            reverse('tasks:api_task_list'),
+            json.dumps([self.row, {**self.row, 'status': 'Blocked'}]),
+            content_type='application/json',
+        )
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['errors']), ['1'])
+        self.assertFalse(Task.objects.exists())
+    
+    def test_import_tasks_command(self):
+        """Test importing a CSV file, refusing it while a row is invalid."""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('title,due_date,priority,status,tags\n')
+            f.write('First,2030-01-15,1,To Do,import\n')
+            f.write('Second,not a date,2,Done,\n')
+        self.addCleanup(os.remove, f.name)
+        
+        with self.assertRaises(CommandError):
+            call_command('import_tasks', f.name, stderr=io.StringIO())
+        self.assertFalse(Task.objects.exists())
+        
+        call_command('import_tasks', f.name, skip_invalid=True, stdout=io.StringIO(), stderr=io.StringIO())
+        task = Task.objects.get()
+        self.assertEqual(task.title, 'First')
+        self.assertEqual([tag.name for tag in task.tags.all()], ['import'])
+
+
+class TaskCalendarTestCase(TestCase):
+    """Test cases for the calendar view and API."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        """Create tasks spread over January 2030."""
+        cls.workspace = Workspace.objects.get(slug='default')
+        cls.task1, cls.task2, cls.task3, _ = bulk_create_tasks(
+            Task(title="Early", due_date=date(2030, 1, 2), priority=2),
+            Task(title="Urgent", due_date=date(2030, 1, 2), priority=1, status='Done'),
+            Task(title="Later", due_date=date(2030, 1, 20)),
+            Task(title="Next month", due_date=date(2030, 2, 10)),
+        )
+    
+    def setUp(self):
+        """Forget calendar counts cached by other tests."""
+        cache.clear()
+    
+    def test_month_range_covers_whole_weeks(self):
+        """Test that a month grid runs from Monday to Sunday."""
+        start, end, previous, following = calendar_range('month', date(2030, 1, 15))
+        
+        self.assertEqual(start, date(2029, 12, 31))
+        self.assertEqual(end, date(2030, 2, 4))
+        self.assertEqual((previous, following), (date(2029, 12, 1), date(2030, 2, 1)))
+    
+    def test_day_counts_are_cached_until_tasks_change(self):
+        """Test that counts take one query, then none until a task is saved."""
+        start, end = date(2030, 1, 1), date(2030, 2, 1)
+        with self.assertNumQueries(1):
+            counts = day_counts(self.workspace, start, end)
+        self.assertEqual(counts, {date(2030, 1, 2): 2, date(2030, 1, 20): 1})
+        with self.assertNumQueries(0):
+            day_counts(self.workspace, start, end)
+        
+        self.task3.due_date = date(2030, 1, 2)
+        self.task3.save()
+        self.assertEqual(day_counts(self.workspace, start, end), {date(2030, 1, 2): 3})
+        self.assertEqual(day_counts(self.workspace, start, end, status='Done'), {date(2030, 1, 2): 1})
+    
+    def test_local_cache_keeps_counts_briefly(self):
+        """Test that counts only a shared cache would retire are kept briefly."""
+        start, end = date(2030, 1, 1), date(2030, 2, 1)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        
+        with patch('tasks.timeline.cache') as timeline_cache:
+            timeline_cache.get.return_value = None
+            day_counts(self.workspace, start, end)
+            with override_settings(CACHES=shared):
+                day_counts(self.workspace, start, end)
+        
+        timeouts = [call.args[2] for call in timeline_cache.set.call_args_list]
+        self.assertEqual(timeouts, [timeline.CALENDAR_LOCAL_CACHE_TIMEOUT, timeline.CALENDAR_CACHE_TIMEOUT])
+    
+    def test_tag_only_edit_retires_cached_counts(self):
+        """Test that changing only a task's tags refreshes tag-filtered counts."""
+        start, end = date(2030, 1, 1), date(2030, 2, 1)
+        self.assertEqual(day_counts(self.workspace, start, end, tags=['home']), {})
+        form = TaskForm({
+            'title': 'Later', 'description': '', 'due_date': date(2030, 1, 20),
+            'priority': 3, 'status': 'To Do', 'tags': 'home', 'version': self.task3.version,
+        }, instance=Task.objects.get(pk=self.task3.pk))
+        
+        form.save()
+        
+        self.assertEqual(day_counts(self.workspace, start, end, tags=['home']), {date(2030, 1, 20): 1})
+    
+    def test_api_week(self):
+        """Test that the week view lists tasks by due date and priority."""
+        response = self.client.get(reverse('tasks:api_task_calendar'), {'view': 'week', 'date': '2030-01-03'})
+        
+        data = response.json()
+        self.assertEqual((data['start'], data['end']), ('2029-12-31', '2030-01-07'))
+        self.assertEqual(data['counts'], {'2030-01-02': 2})
+        self.assertEqual([task['title'] for task in data['results']], ['Urgent', 'Early'])
+        self.assertFalse(data['truncated'])
+    
+    def test_calendar_views_render(self):
+        """Test that the month grid and agenda pages render."""
+        url = reverse('tasks:task_calendar')
+        
+        response = self.client.get(url, {'date': '2030-01-15'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['weeks']), 5)
+        self.assertContains(response, '2 tasks')
+        
+        response = self.client.get(url, {'view': 'agenda', 'date': '2030-01-01'})
+        self.assertEqual([day for day, count, _ in response.context['days']], [date(2030, 1, 2)])
+        self.assertContains(response, 'Urgent')
+    
+    def test_dates_near_the_limits(self):
+        """Test that anchors near date.min and date.max are clamped instead of failing."""
+        api_url, url = reverse('tasks:api_task_calendar'), reverse('tasks:task_calendar')
+        for view, day in [('month', '9999-12-10'), ('week', '0001-01-01'), ('agenda', '9999-12-30')]:
+            self.assertEqual(self.client.get(api_url, {'view': view, 'date': day}).status_code, 200)
+            self.assertEqual(self.client.get(url, {'view': view, 'date': day}).status_code, 200)
+        
+        data = self.client.get(api_url, {'view': 'month', 'date': '9999-12-10'}).json()
+        self.assertEqual(data['next'], '9999-12-01')
+
+
+class TaskStartupTestCase(TestCase):
+    """Test cases for lazy view imports and API-only workers."""
+    
+    def test_class_based_views_load_lazily(self):
+        """Test that tasks.views still exposes the class-based views."""
+        self.assertIs(views.TaskUpdateView, class_views.TaskUpdateView)
+        with self.assertRaises(AttributeError):
+            views.MissingView
+    
+    def test_api_only_urls(self):
+        """Test that API-only mode routes the API and nothing else."""
+        self.addCleanup(importlib.reload, urls)
+        with override_settings(TASKS_API_ONLY=True):
+            names = {pattern.name for pattern in importlib.reload(urls).urlpatterns}
+        
+        self.assertIn('api_task_list', names)
+        self.assertNotIn('task_list', names)
+    
+    def test_api_works_without_auth_middleware(self):
+        """Test that the API accepts requests that have no user attribute."""
+        request = RequestFactory().post(
+            '/tasks/api/',
+            json.dumps({'title': 'Anonymous', 'due_date': '2030-01-01', 'priority': 2, 'status': 'To Do'}),
+            content_type='application/json',
+        )
+        # Set by WorkspaceMiddleware, which settings_api keeps.
+        request.workspace = Workspace.objects.get(slug='default')
+        
+        response = api.task_list(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(TaskHistory.objects.get().changed_by)
+    
+    def test_api_only_worker_accepts_writes(self):
+        """Test that a client can create a task through the settings_api middleware."""
+        from task_project import settings_api
+        data = {'title': 'Lean', 'due_date': '2030-01-01', 'priority': 2, 'status': 'To Do'}
+        
+        with override_settings(MIDDLEWARE=settings_api.MIDDLEWARE):
+            response = Client(enforce_csrf_checks=True).post(
+                reverse('tasks:api_task_list'), data, content_type='application/json'
+            )
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(TaskHistory.objects.get().changed_by)
+    
+    def test_import_report_groups_packages(self):
+        """Test that import times are grouped by package."""
+        self.assertEqual(package_name('django.contrib.admin.sites'), 'django.contrib.admin')
+        self.assertEqual(package_name('django.db.models.base'), 'django.db')
+        self.assertEqual(package_name('json'), 'json')
+
+
+class TaskMetricsTestCase(TestCase):
+    """Test cases for the Prometheus metrics endpoint."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        bulk_create_tasks(
+            Task(title='A', due_date=date(2030, 1, 1), priority=3, status='To Do'),
+            Task(title='B', due_date=date(2030, 1, 2), priority=3, status='To Do'),
+            Task(title='C', due_date=date(2030, 1, 3), priority=1, status='Done'),
+        )
+    
+    def setUp(self):
+        cache.clear()
+    
+    def test_requests_are_counted(self):
+        """Test that a request is recorded under its URL name with its queries."""
+        key = ('tasks_http_requests_total', (('view', 'tasks:api_task_list'), ('method', 'GET'), ('status', '200')))
+        before = metrics.registry.snapshot()
+        
+        self.client.get(reverse('tasks:api_task_list'))
+        
+        after = metrics.registry.snapshot()
+        self.assertEqual(after[key] - before[key], 1)
+        queries = ('tasks_db_queries_total', (('view', 'tasks:api_task_list'),))
+        self.assertGreater(after[queries] - before[queries], 0)
+        
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertContains(response, '# TYPE tasks_http_request_duration_seconds histogram')
+        self.assertContains(response, 'tasks_http_request_duration_seconds_count{view="tasks:api_task_list"}')
+    
+    def test_task_counts_are_cached(self):
+        """Test that task counts come from one query, then from the cache."""
+        with self.assertNumQueries(1):
+            self.client.get('/metrics')
+        with self.assertNumQueries(0):
+            response = self.client.get('/metrics')
+        
+        self.assertContains(response, 'tasks_tasks{status="To Do",priority="3"} 2\n')
+        self.assertContains(response, 'tasks_tasks{status="Done",priority="1"} 1\n')
+        self.assertContains(response, 'tasks_cache_requests_total{cache="task_counts",result="hit"}')
+    
+    @override_settings(TASKS_METRICS=None)
+    def test_disabled(self):
+        """Test that the endpoint is hidden when metrics are disabled."""
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+    
+    def test_histogram_is_cumulative(self):
+        """Test that histogram buckets are rendered as running totals."""
+        registry = MetricsRegistry()
+        labels = (('view', 'v'),)
+        for seconds in (0.001, 0.02, 0.02, 30):
+            registry.observe('tasks_http_request_duration_seconds', labels, seconds)
+        
+        text = metrics.render(registry.snapshot())
+        self.assertIn('tasks_http_request_duration_seconds_bucket{view="v",le="0.005"} 1\n', text)
+        self.assertIn('tasks_http_request_duration_seconds_bucket{view="v",le="0.025"} 3\n', text)
+        self.assertIn('tasks_http_request_duration_seconds_bucket{view="v",le="10.0"} 3\n', text)
+        self.assertIn('tasks_http_request_duration_seconds_bucket{view="v",le="+Inf"} 4\n', text)
+        self.assertIn('tasks_http_request_duration_seconds_count{view="v"} 4\n', text)
+    
+    def test_counts_from_finished_threads_are_kept(self):
+        """Test that a thread's counts survive the thread."""
+        registry = MetricsRegistry()
+        thread = threading.Thread(target=registry.inc, args=('hits', ()))
+        thread.start()
+        thread.join()
+        registry.inc('hits')
+        
+        self.assertEqual(registry.snapshot()[('hits', ())], 2)
+        self.assertEqual(registry.snapshot()[('hits', ())], 2)
+    
+    def test_file_store_sums_processes(self):
+        """Test that the file store adds up the counters of every worker."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for number, hits in enumerate((2, 3)):
+            registry = MetricsRegistry()
+            registry.inc('tasks_cache_requests_total', (('cache', 'c'), ('result', 'hit')), hits)
+            registry.inc('tasks_cache_requests_total', (('cache', 'c'), ('result', 'miss')))
+            store = FileStore(directory.name)
+            store.path = os.path.join(directory.name, f'worker-{number}.json')
+            store.write(registry.snapshot())
+        
+        totals = FileStore(directory.name).read()
+        self.assertEqual(totals[('tasks_cache_requests_total', (('cache', 'c'), ('result', 'hit')))], 5)
+        self.assertIn('tasks_cache_hit_ratio{cache="c"} 0.7142857142857143\n', metrics.render(totals))
+    
+    def test_file_store_retires_exited_processes(self):
+        """Test that files of exited processes are merged into one, keeping their counts."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = FileStore(directory.name)
+        # Linux process ids are at most 2 ** 22, so the second one has exited.
+        for pid in (os.getpid(), 2 ** 22 + 1):
+            store._write(os.path.join(directory.name, f'{store.prefix}{pid}.json'), [['hits', [], 2]])
+        
+        totals = store.read()
+        
+        self.assertEqual(totals[('hits', ())], 4)
+        self.assertEqual(sorted(os.listdir(directory.name)), sorted([
+            os.path.basename(store.path), 'retired.json', 'retired.lock',
+        ]))
+        self.assertEqual(store.read()[('hits', ())], 4)
+    
+    def test_large_counters_are_exact(self):
+        """Test that whole numbers are rendered in full and fractions with full precision."""
+        self.assertEqual(metrics._sample('hits', (), 1234567.0), 'hits 1234567')
+        self.assertEqual(metrics._sample('seconds', (), 0.1 + 0.2), 'seconds 0.30000000000000004')
+    
+    @override_settings(TASKS_METRICS={'ALLOWED_IPS': [], 'TOKEN': 'secret'})
+    def test_access_is_restricted(self):
+        """Test that only allowed addresses or holders of the token can scrape."""
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'authorization': 'Bearer wrong'}).status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'authorization': 'Bearer secret'}).status_code, 200)
+
+
+class TaskLoadTestToolsTestCase(TestCase):
+    """Test cases for the synthetic data generator and the load driver helpers."""
+    
+    def test_generate_tasks(self):
+        """Test that generated tasks and tag links are inserted in batches."""
+        call_command('generate_tasks', tasks=250, batch_size=100, tags=30, stdout=io.StringIO())
+        
+        self.assertEqual(Task.objects.count(), 250)
+        self.assertEqual(Tag.objects.count(), 30)
+        self.assertEqual(
+            set(Task.objects.values_list('status', flat=True)), {'To Do', 'In Progress', 'Done'}
+        )
+        self.assertTrue(TaskTag.objects.exists())
+        task = Task.objects.filter(description__gt='').first()
+        self.assertEqual(task.version, 1)
+        self.assertLessEqual(task.created_at, timezone.now())
+    
+    def test_factory_is_deterministic(self):
+        """Test that the same seed generates the same tasks."""
+        first, second = TaskFactory(seed=5), TaskFactory(seed=5)
+        self.assertEqual([first.fields() for _ in range(20)], [second.fields() for _ in range(20)])
+    
+    def test_insert_rows_fills_defaults(self):
+        """Test that fields missing from the rows get their defaults."""
+        now = timezone.now()
+        insert_rows(Task, [{
+            'title': 'Raw', 'due_date': date(2030, 1, 1), 'created_at': now, 'updated_at': now,
+        }])
+        
+        task = Task.objects.get()
+        self.assertEqual((task.priority, task.status, task.description), (2, 'To Do', ''))
+        self.assertEqual(task.due_date, date(2030, 1, 1))
+    
+    def test_parse_mix(self):
+        """Test that the operation mix is parsed and checked."""
+        self.assertEqual(parse_mix('list=3, create=1'), {'list': 3.0, 'create': 1.0})
+        for value in ('list=3,jump=1', 'list=x', 'list=0'):
+            with self.assertRaises(ValueError):
+                parse_mix(value)
+    
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile(values, 1.0), 100)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+
+class TaskLoadTestTestCase(LiveServerTestCase):
+    """Test case for running the load driver against a live server."""
+    
+    def test_loadtest(self):
+        """Test that every operation in the mix succeeds against the server."""
+        call_command('generate_tasks', tasks=20, stdout=io.StringIO())
+        out = io.StringIO()
+        
+        call_command(
+            'loadtest', url=self.live_server_url, requests=60, concurrency=2,
+            max_error_rate=0, stdout=out,
+        )
+        
+        report = out.getvalue()
+        self.assertIn('60 operations', report)
+        self.assertIn('error rate 0.00%', report)
+
+
+class TaskTrashTestCase(TestCase):
+    """Test cases for soft deletion, the trash and purging."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = Task.objects.create(title='Parent', due_date=date(2030, 1, 1), priority=2, status='To Do')
+        cls.child = Task.objects.create(
+            title='Child', due_date=date(2030, 1, 1), priority=2, status='To Do', parent=cls.parent
+        )
+        cls.other = Task.objects.create(title='Other', due_date=date(2030, 1, 2), priority=1, status='To Do')
+    
+    def test_delete_moves_task_and_subtasks_to_trash(self):
+        """Test that deleting hides the task and its subtasks without removing them."""
+        response = self.client.post(reverse('tasks:delete_task', args=[self.parent.pk]))
+        
+        self.assertRedirects(response, reverse('tasks:task_list'))
+        self.assertEqual(list(Task.objects.all()), [self.other])
+        self.assertEqual(Task.all_objects.filter(deleted_at__isnull=False).count(), 2)
+        self.assertIn('deleted_at', TaskHistory.objects.filter(task=self.child).first().changes)
+        self.assertEqual(self.client.get(reverse('tasks:edit_task', args=[self.parent.pk])).status_code, 404)
+        
+        response = self.client.get(reverse('tasks:task_trash'))
+        self.assertContains(response, 'Parent')
+        self.assertContains(response, 'Child')
+        self.assertNotContains(response, 'Other')
+    
+    def test_restore(self):
+        """Test that restoring brings back the subtasks trashed at the same time only."""
+        self.child.soft_delete()
+        Task.all_objects.filter(pk=self.child.pk).update(deleted_at=timezone.now() - timedelta(days=1))
+        self.parent.soft_delete()
+        
+        response = self.client.post(reverse('tasks:restore_task', args=[self.parent.pk]))
+        
+        self.assertRedirects(response, reverse('tasks:task_trash'))
+        self.assertEqual(set(Task.objects.all()), {self.parent, self.other})
+    
+    def test_restore_subtask_restores_ancestors(self):
+        """Test that a restored subtask is never left under a trashed parent."""
+        self.parent.soft_delete()
+        
+        self.child.restore()
+        
+        self.assertEqual(Task.objects.count(), 3)
+    
+    def test_api_delete_and_restore(self):
+        """Test that the API trashes on DELETE and restores on POST."""
+        url = reverse('tasks:api_task_detail', args=[self.other.pk])
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        
+        response = self.client.post(reverse('tasks:api_restore_task', args=[self.other.pk]))
+        
+        self.assertEqual(response.json()['title'], 'Other')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(
+            self.client.post(reverse('tasks:api_restore_task', args=[self.other.pk])).status_code, 404
+        )
+    
+    def test_edit_of_trashed_task_is_refused(self):
+        """Test that an edit started before the task was trashed does not land."""
+        data = {
+            'title': 'Renamed', 'description': '', 'due_date': date(2030, 1, 2),
+            'priority': 1, 'status': 'To Do', 'version': self.other.version,
+        }
+        form = TaskForm(data, instance=Task.objects.get(pk=self.other.pk))
+        self.assertTrue(form.is_valid())
+        Task.objects.get(pk=self.other.pk).soft_delete()
+        
+        with self.assertRaises(StaleTaskError):
+            form.save()
+        self.assertEqual(Task.all_objects.get(pk=self.other.pk).title, 'Other')
+        with self.assertRaises(Http404):
+            views._report_conflict(form, self.other.pk)
+    
+    def test_trashed_blockers_and_calendar(self):
+        """Test that trashed tasks neither block others nor count in the calendar."""
+        self.other.add_blocker(self.parent)
+        self.assertFalse(Task.objects.ready().filter(pk=self.other.pk).exists())
+        
+        self.parent.soft_delete()
+        
+        self.assertTrue(Task.objects.ready().filter(pk=self.other.pk).exists())
+        self.assertEqual(
+            day_counts(self.parent.workspace, date(2030, 1, 1), date(2030, 1, 3)), {date(2030, 1, 2): 1}
+        )
+    
+    def test_purge(self):
+        """Test that purging deletes expired tasks with their subtasks, in batches."""
+        self.parent.soft_delete()
+        self.other.soft_delete()
+        Task.all_objects.filter(pk__in=[self.parent.pk, self.child.pk]).update(
+            deleted_at=timezone.now() - timedelta(days=31)
+        )
+        out = io.StringIO()
+        
+        call_command('purge_tasks', days=30, batch_size=1, pause=0, stdout=out)
+        
+        self.assertIn('Deleted 2 tasks', out.getvalue())
+        self.assertEqual(list(Task.all_objects.all()), [self.other])
+        self.assertFalse(TaskHistory.objects.filter(task_id=self.child.pk).exists())
+
+
+class TaskWorkspaceTestCase(TestCase):
+    """Test cases for workspaces, their quota and per-workspace caches."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.default = Workspace.objects.get(slug='default')
+        cls.acme = Workspace.objects.create(name='Acme', slug='acme', task_quota=2)
+        cls.shared = Task.objects.create(title='Default task', due_date=date(2030, 1, 2))
+        cls.private = Task.objects.create(title='Acme task', due_date=date(2030, 1, 2), workspace=cls.acme)
+    
+    def setUp(self):
+        """Forget workspaces and calendar counts cached by other tests."""
+        cache.clear()
+    
+    def test_requests_are_scoped_to_workspace(self):
+        """Test that the header picks the workspace and other workspaces' tasks are hidden."""
+        acme = {'x-workspace': 'acme'}
+        response = self.client.get(reverse('tasks:api_task_list'), headers=acme)
+        self.assertEqual([task['title'] for task in response.json()['results']], ['Acme task'])
+        
+        detail = reverse('tasks:api_task_detail', args=[self.shared.pk])
+        self.assertEqual(self.client.get(detail, headers=acme).status_code, 404)
+        self.assertEqual(self.client.get(detail).status_code, 200)
+        
+        self.client.cookies['workspace'] = 'acme'
+        self.assertContains(self.client.get(reverse('tasks:task_list')), 'Acme task')
+        response = self.client.get(reverse('tasks:api_task_list'), headers={'x-workspace': 'nope'})
+        self.assertEqual(response.status_code, 404)
+    
+    def test_header_from_trusted_proxies_only(self):
+        """Test that TRUSTED_PROXIES limits who may pick a workspace, and COOKIE None ignores cookies."""
+        config = {**settings.TASKS_WORKSPACES, 'TRUSTED_PROXIES': ['10.0.0.1'], 'COOKIE': None}
+        url = reverse('tasks:api_task_list')
+        with override_settings(TASKS_WORKSPACES=config):
+            client = Client()
+            client.cookies['workspace'] = 'acme'
+            
+            direct = client.get(url, headers={'x-workspace': 'acme'})
+            proxied = client.get(url, headers={'x-workspace': 'acme'}, REMOTE_ADDR='10.0.0.1')
+        
+        self.assertEqual([task['title'] for task in direct.json()['results']], ['Default task'])
+        self.assertEqual([task['title'] for task in proxied.json()['results']], ['Acme task'])
+    
+    def test_quota(self):
+        """Test that creating past the quota is refused until a task is trashed."""
+        def create():
+            data = {'title': 'New', 'due_date': '2030-01-03', 'priority': 2, 'status': 'To Do'}
+            return self.client.post(
+                reverse('tasks:api_task_list'), data, content_type='application/json',
+                headers={'x-workspace': 'acme'},
+            )
+        self.assertEqual(create().status_code, 201)
+        
+        response = create()
+        
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Task.objects.filter(workspace=self.acme).count(), 2)
+        self.private.soft_delete()
+        self.assertEqual(create().status_code, 201)
+        restore = reverse('tasks:api_restore_task', args=[self.private.pk])
+        self.assertEqual(self.client.post(restore, headers={'x-workspace': 'acme'}).status_code, 403)
+        self.acme.refresh_from_db()
+        self.assertEqual(self.acme.task_count, 2)
+    
+    def test_class_create_view_enforces_quota(self):
+        """Test that TaskCreateView answers 403 past the quota and records who created a task."""
+        user = User.objects.create_user('creator')
+        view = class_views.TaskCreateView.as_view()
+        def create():
+            data = {'title': 'New', 'due_date': '2030-01-03', 'priority': 2, 'status': 'To Do', 'version': 1}
+            request = RequestFactory().post('/', data)
+            request.user, request.workspace = user, self.acme
+            return view(request)
+        
+        self.assertEqual(create().status_code, 302)
+        response = create()
+        
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(response.context_data['form'].non_field_errors())
+        self.assertEqual(Task.objects.filter(workspace=self.acme).count(), 2)
+        self.assertEqual(Task.objects.get(title='New').history.get().changed_by, user)
+    
+    def test_no_quota_by_default(self):
+        """Test that generated tasks past any quota do not block creates unless one is configured."""
+        self.assertIsNone(self.default.quota)
+        call_command('generate_tasks', tasks=30, batch_size=10, stdout=io.StringIO())
+        data = {'title': 'New', 'due_date': '2030-01-03', 'priority': 2, 'status': 'To Do'}
+        
+        response = self.client.post(reverse('tasks:api_task_list'), data, content_type='application/json')
+        
+        self.assertEqual(response.status_code, 201)
+        self.default.refresh_from_db()
+        self.assertEqual(self.default.task_count, 32)
+        with override_settings(TASKS_WORKSPACES={'DEFAULT': 'default', 'TASK_QUOTA': 10}):
+            response = self.client.post(reverse('tasks:api_task_list'), data, content_type='application/json')
+            self.assertEqual(response.status_code, 403)
+    
+    def test_calendar_cache_is_per_workspace(self):
+        """Test that saving a task only invalidates its own workspace's calendar counts."""
+        start, end = date(2030, 1, 1), date(2030, 2, 1)
+        day_counts(self.default, start, end)
+        day_counts(self.acme, start, end)
+        
+        self.private.due_date = date(2030, 1, 3)
+        self.private.save()
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(day_counts(self.default, start, end), {date(2030, 1, 2): 1})
+        self.assertEqual(day_counts(self.acme, start, end), {date(2030, 1, 3): 1})
+    
+    def test_relations_stay_in_workspace(self):
+        """Test that parents and blockers from another workspace are refused."""
+        with self.assertRaises(ValidationError):
+            Task.objects.create(
+                title='Child', due_date=date(2030, 1, 2), workspace=self.acme, parent=self.shared
+            )
+        with self.assertRaises(ValidationError):
+            self.private.add_blocker(self.shared)
+    
+    def test_queryset_delete_keeps_counts(self):
+        """Test that deleting through a queryset, as the admin does, updates the task count."""
+        tasks = [Task.objects.create(title=f'Task {i}', due_date=date(2030, 1, 2)) for i in range(3)]
+        self.default.refresh_from_db()
+        count = self.default.task_count
+        
+        deleted, _ = Task.objects.filter(pk__in=[tasks[0].pk, tasks[1].pk]).delete()
+        
+        self.assertEqual(deleted, 2)
+        self.default.refresh_from_db()
+        self.assertEqual(self.default.task_count, count - 2)
+        self.assertEqual(self.default.task_count, Task.objects.filter(workspace=self.default).count())
+        
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.client.post(reverse('admin:tasks_task_changelist'), {
+            'action': 'delete_selected',
+            'post': 'yes',
+            helpers.ACTION_CHECKBOX_NAME: [tasks[2].pk],
+        })
+        self.default.refresh_from_db()
+        self.assertEqual(self.default.task_count, count - 3)
+    
+    def test_recount_tasks(self):
+        """Test that counts drifted by writes around the ORM are recomputed."""
+        Task.objects.bulk_create([Task(title='Bulk', due_date=date(2030, 1, 2), workspace=self.acme)])
+        self.acme.refresh_from_db()
+        self.assertEqual(self.acme.task_count, 1)
+        
+        Workspace.objects.recount_tasks()
+        
+        self.acme.refresh_from_db()
+        self.assertEqual(self.acme.task_count, 2)
+
+
+class TaskSnapshotTestCase(TestCase):
+    """Test cases for columnar snapshots, their reader and download."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = Task.objects.create(title='Parent', due_date=date(2030, 1, 1), priority=1, status='To Do')
+        cls.child = Task.objects.create(
+            title='Tâche', description='Details', due_date=date(2030, 1, 5), status='Done', parent=cls.parent
+        )
+        cls.child.set_tags(['ops', 'backend'])
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(TASKS_SNAPSHOTS={'DIR': directory.name}))
+        self.path = snapshot_path('default')
+    
+    def snapshot(self, **options):
+        out = io.StringIO()
+        call_command('snapshot_tasks', overlap=0, stdout=out, **options)
+        return out.getvalue()
+    
+    def test_snapshot_round_trip(self):
+        """Test that the reader returns the tasks as written and filters them."""
+        self.assertIn('full: 2 read', self.snapshot())
+        
+        with SnapshotReader(self.path) as snapshot:
+            self.assertEqual(list(snapshot.column('id')), [self.parent.pk, self.child.pk])
+            self.assertEqual(snapshot.dictionary('status'), ['Done', 'To Do'])
+            child = list(snapshot.rows([1]))[0]
+            self.assertEqual(child['title'], 'Tâche')
+            self.assertEqual(child['parent_id'], self.parent.pk)
+            self.assertEqual(child['tags'], 'backend,ops')
+            self.assertEqual(child['due_date'], date(2030, 1, 5))
+            self.assertEqual(child['updated_at'], Task.objects.get(pk=self.child.pk).updated_at)
+            self.assertEqual(snapshot.filter(status='Done', tag='ops'), [1])
+            self.assertEqual(snapshot.filter(priority=1, due_to=date(2030, 1, 2)), [0])
+            self.assertEqual(snapshot.filter(status='In Progress'), [])
+    
+    def test_incremental_snapshot(self):
+        """Test that a second run reads only updated tasks and drops trashed ones."""
+        self.snapshot()
+        self.assertIn('up to date', self.snapshot())
+        other = Task.objects.create(title='Other', due_date=date(2030, 1, 2))
+        self.child.soft_delete()
+        
+        output = self.snapshot()
+        
+        self.assertIn('incremental: 2 read, 1 removed', output)
+        with SnapshotReader(self.path) as snapshot:
+            self.assertEqual(list(snapshot.column('id')), [self.parent.pk, other.pk])
+        self.child.restore()
+        self.snapshot()
+        with SnapshotReader(self.path) as snapshot:
+            self.assertEqual(list(snapshot.column('id')), [self.parent.pk, self.child.pk, other.pk])
+    
+    def test_download(self):
+        """Test that the workspace's snapshot is downloaded, with conditional requests."""
+        url = reverse('tasks:api_task_snapshot')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        Workspace.objects.create(name='Acme', slug='acme')
+        self.snapshot()
+        
+        response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content)[:len(MAGIC)], MAGIC)
+        self.assertIn('default.tsnap', response['Content-Disposition'])
+        response = self.client.get(url, headers={'if-modified-since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+        with SnapshotReader(snapshot_path('acme')) as snapshot:
+            self.assertEqual(len(snapshot), 0)
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from django.core.cache import caches
+
+
+# Seconds between sweeps of the in-memory buckets that are full again.
+SWEEP_INTERVAL = 60
+
+
+class InMemoryBucketStore:
+    """
+    Token buckets kept in this process.
+    
+    Fast and exact, but every worker process has its own buckets, so the
+    effective limit is multiplied by the number of workers. Buckets that
+    have refilled to capacity are dropped every SWEEP_INTERVAL seconds, so
+    memory is bounded by the clients seen recently, not by all clients.
+    """
+    
+    def __init__(self, **options):
+        # key: (tokens, updated, time the bucket is full again)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_sweep = None
+    
+    def take(self, key, rate, capacity, now=None):
+        """
+        Take one token from ``key``'s bucket.
+        
+        Returns (allowed, retry_after) where ``retry_after`` is the number
+        of seconds until a token will be available again.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens, allowed, retry_after = _refill_and_take(tokens, updated, now, rate, capacity)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if self._next_sweep is None:
+                self._next_sweep = now + SWEEP_INTERVAL
+            elif now >= self._next_sweep:
+                # A missing bucket counts as full, so dropping these changes nothing.
+                self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+                self._next_sweep = now + SWEEP_INTERVAL
+        return allowed, retry_after
+
+
+class CacheBucketStore:
+    """
+    Token buckets kept in a Django cache shared by all workers.
+    
+    Point ``CACHE`` at a shared backend such as Redis or Memcached. The
+    read-modify-write is not atomic, so under heavy contention a client
+    may occasionally get a request or two more than its limit.
+    """
+    
+    def __init__(self, CACHE='default', PREFIX='tasks:ratelimit:', **options):
+        self.cache = caches[CACHE]
+        self.prefix = PREFIX
+    
+    def take(self, key, rate, capacity, now=None):
+        now = time.time() if now is None else now
+        cache_key = self.prefix + key
+        tokens, updated = self.cache.get(cache_key, (capacity, now))
+        tokens, allowed, retry_after = _refill_and_take(tokens, updated, now, rate, capacity)
+        # Buckets left alone until full again are simply forgotten.
+        self.cache.set(cache_key, (tokens, now), timeout=int(capacity / rate) + 1)
+        return allowed, retry_after
+
+
+def _refill_and_take(tokens, updated, now, rate, capacity):
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, True, 0.0
+    return tokens, False, (1 - tokens) / rate
@@ -0,0 +1,120 @@
+import hashlib
+from datetime import date, timedelta
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Count, Q
+
+from .metrics import record_cache
+from .models import Task, calendar_generation
+
+
+CALENDAR_VIEWS = ('month', 'week', 'agenda')
+
+# Days shown by the agenda view.
+AGENDA_DAYS = 14
+
+# Most tasks listed by the week and agenda views.
+CALENDAR_TASK_LIMIT = 500
+
+CALENDAR_CACHE_TIMEOUT = 300
+
+# A per-process cache misses invalidate_calendar() calls made by other
+# processes, so with one counts may be stale for this long instead.
+CALENDAR_LOCAL_CACHE_TIMEOUT = 10
+
+# Anchors are kept far enough from date.min and date.max that every view's
+# range and its previous and next anchors are valid dates.
+MIN_ANCHOR = date(1, 2, 1)
+MAX_ANCHOR = date(9999, 11, 30)
+
+
+def parse_anchor(value):
+    """
+    Return the date in ``value`` ('YYYY-MM-DD'), or today if invalid.
+    
+    Dates outside [MIN_ANCHOR, MAX_ANCHOR] are moved to the nearest one.
+    """
+    try:
+        anchor = date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return date.today()
+    return min(max(anchor, MIN_ANCHOR), MAX_ANCHOR)
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def calendar_range(view, anchor):
+    """
+    Return (start, end, previous, next) for ``view`` around ``anchor``.
+    
+    ``end`` is exclusive. A month covers whole weeks, Monday to Sunday, so
+    the grid includes the last days of the previous month and the first of
+    the next. ``previous`` and ``next`` are anchors for navigation.
+    """
+    if view == 'month':
+        first = anchor.replace(day=1)
+        start = first - timedelta(days=first.weekday())
+        last = _add_months(first, 1) - timedelta(days=1)
+        end = last + timedelta(days=7 - last.weekday())
+        return start, end, _add_months(first, -1), _add_months(first, 1)
+    if view == 'week':
+        start = anchor - timedelta(days=anchor.weekday())
+        return start, start + timedelta(days=7), start - timedelta(days=7), start + timedelta(days=7)
+    step = timedelta(days=AGENDA_DAYS)
+    return anchor, anchor + step, anchor - step, anchor + step
+
+
+def tasks_between(workspace, start, end, status='', tags=(), tag_mode='any'):
+    """
+    Return tasks in ``workspace`` due in [start, end), earliest first.
+    
+    The due_date range is a scan of the (workspace, due_date, status) index.
+    """
+    tasks = Task.objects.filter(workspace=workspace, due_date__gte=start, due_date__lt=end)
+    if status:
+        tasks = tasks.filter(status=status)
+    return tasks.with_tags(tags, match=tag_mode, workspace=workspace)
+
+
+def day_counts(workspace, start, end, status='', tags=(), tag_mode='any'):
+    """
+    Return {date: number of tasks due that day} in ``workspace`` for [start, end).
+    
+    All days come from one GROUP BY query over the due_date range. The
+    result is cached per range and filter until the workspace's tasks are
+    next written, provided the cache is shared by all processes (see
+    CACHES in settings); a local-memory cache keeps it only for
+    CALENDAR_LOCAL_CACHE_TIMEOUT seconds. Days without tasks are left out.
+    """
+    params = f'{start}:{end}:{status}:{tag_mode}:{",".join(sorted(tags))}'
+    key = 'tasks:calendar:{}:{}:{}'.format(
+        workspace.pk, calendar_generation(workspace.pk), hashlib.md5(params.encode()).hexdigest()
+    )
+    counts = cache.get(key)
+    record_cache('calendar_day_counts', counts is not None)
+    if counts is None:
+        # The status is tested inside the aggregate rather than in WHERE, so
+        # planners cannot trade the due_date range for the status index;
+        # the (workspace, due_date, status) index alone answers the query.
+        rows = (
+            tasks_between(workspace, start, end, tags=tags, tag_mode=tag_mode)
+            .order_by()
+            .values_list('due_date')
+            .annotate(count=Count('pk', filter=Q(status=status) if status else None))
+        )
+        counts = {day: count for day, count in rows if count}
+        local = isinstance(caches['default'], LocMemCache)
+        cache.set(key, counts, CALENDAR_LOCAL_CACHE_TIMEOUT if local else CALENDAR_CACHE_TIMEOUT)
+    return counts
+
+
+def calendar_days(start, end, counts):
+    """Return [(date, count), ...] for every day in [start, end)."""
+    return [
+        (day, counts.get(day, 0))
+        for day in (start + timedelta(days=i) for i in range((end - start).days))
+    ]
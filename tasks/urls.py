@@ -1,18 +1,42 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api
 
 app_name = 'tasks'
 
 urlpatterns = [
-    # List and view tasks
-    path('', views.task_list, name='task_list'),
-    
-    # Create task
-    path('add/', views.add_task, name='add_task'),
-    
-    # Edit task
-    path('<int:pk>/edit/', views.edit_task, name='edit_task'),
-    
-    # Delete task
-    path('<int:pk>/delete/', views.delete_task, name='delete_task'),
+    # JSON API
+    path('api/', api.task_list, name='api_task_list'),
+    path('api/<int:pk>/', api.task_detail, name='api_task_detail'),
+    path('api/<int:pk>/restore/', api.restore_task, name='api_restore_task'),
+    path('api/<int:pk>/tree/', api.task_tree, name='api_task_tree'),
+    path('api/<int:pk>/relations/', api.task_relations, name='api_task_relations'),
+    path('api/ready/', api.ready_tasks, name='api_ready_tasks'),
+    path('api/calendar/', api.task_calendar, name='api_task_calendar'),
+    path('api/snapshot/', api.task_snapshot, name='api_task_snapshot'),
 ]
+
+# API-only workers (settings_api) never import the HTML views.
+if not getattr(settings, 'TASKS_API_ONLY', False):
+    from . import views
+    
+    urlpatterns += [
+        # List and view tasks
+        path('', views.task_list, name='task_list'),
+        
+        # Create task
+        path('add/', views.add_task, name='add_task'),
+        
+        # Edit task
+        path('<int:pk>/edit/', views.edit_task, name='edit_task'),
+        
+        # Delete task
+        path('<int:pk>/delete/', views.delete_task, name='delete_task'),
+        
+        # Calendar by due date
+        path('calendar/', views.task_calendar, name='task_calendar'),
+        
+        # Deleted tasks
+        path('trash/', views.task_trash, name='task_trash'),
+        path('<int:pk>/restore/', views.restore_task, name='restore_task'),
+    ]
@@ -0,0 +1,160 @@
+from datetime import date, datetime
+from functools import lru_cache
+
+from django.core.exceptions import ValidationError
+
+from .models import Tag, Task, parse_tag_names
+
+
+class TaskValidator:
+    """
+    Validate plain dicts of task fields without building forms or models.
+    
+    Choice sets, length limits and defaults are read from the Task model
+    once, when the validator is created, so checking a row is a handful of
+    dict and set lookups. Used by TaskForm, the JSON API and the bulk
+    import, which all report errors as {field: [message, ...]}.
+    
+    Fields:
+    - title: Required, at most Task.title.max_length characters
+    - description: Optional text
+    - due_date: Required date or ISO 8601 'YYYY-MM-DD' string
+    - priority: One of the priority values; defaults to the model default
+    - status: One of the status values; defaults to the model default
+    - tags: List or comma-separated string of tag names
+    """
+    
+    FIELDS = ('title', 'description', 'due_date', 'priority', 'status', 'tags')
+    
+    def __init__(self):
+        opts = Task._meta
+        self.title_max_length = opts.get_field('title').max_length
+        self.tag_max_length = Tag._meta.get_field('name').max_length
+        self.statuses = frozenset(value for value, _ in Task.STATUS_CHOICES)
+        # Priorities arrive as ints from JSON and as strings from CSV.
+        self.priorities = {}
+        for value, _ in Task.PRIORITY_CHOICES:
+            self.priorities[value] = self.priorities[str(value)] = value
+        self.defaults = {
+            'description': '',
+            'priority': opts.get_field('priority').get_default(),
+            'status': opts.get_field('status').get_default(),
+            'tags': [],
+        }
+        self._cleaners = [(name, getattr(self, f'clean_{name}')) for name in self.FIELDS]
+        # Imports repeat the same dates and tag lists over and over.
+        self._parse_date = lru_cache(maxsize=4096)(date.fromisoformat)
+        self._parse_tags = lru_cache(maxsize=1024)(self._clean_tag_names)
+    
+    def validate(self, data, partial=False):
+        """
+        Return (cleaned, errors) for one dict of field values.
+        
+        Missing optional fields get their defaults. With ``partial=True``
+        only the fields present in ``data`` are checked and returned.
+        ``errors`` is empty when the row is valid.
+        """
+        cleaned = {}
+        errors = {}
+        defaults = self.defaults
+        for name, clean in self._cleaners:
+            if name in data:
+                value = data[name]
+            elif partial:
+                continue
+            elif name in defaults:
+                cleaned[name] = defaults[name]
+                continue
+            else:
+                errors[name] = ['This field is required.']
+                continue
+            try:
+                cleaned[name] = clean(value)
+            except ValidationError as exc:
+                errors[name] = exc.messages
+        return cleaned, errors
+    
+    def validate_many(self, rows):
+        """
+        Validate an iterable of dicts in one pass.
+        
+        Returns (cleaned_rows, errors) where ``cleaned_rows`` holds the valid
+        rows in order and ``errors`` maps the index of each invalid row to
+        its {field: [message, ...]} errors.
+        """
+        validate = self.validate
+        cleaned_rows = []
+        errors = {}
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                errors[index] = {'__all__': ['Expected an object of task fields.']}
+                continue
+            cleaned, row_errors = validate(row)
+            if row_errors:
+                errors[index] = row_errors
+            else:
+                cleaned_rows.append(cleaned)
+        return cleaned_rows, errors
+    
+    def clean_title(self, value):
+        value = '' if value is None else str(value).strip()
+        if not value:
+            raise ValidationError('This field is required.')
+        if len(value) > self.title_max_length:
+            raise ValidationError(
+                f'Ensure this value has at most {self.title_max_length} characters '
+                f'(it has {len(value)}).'
+            )
+        return value
+    
+    def clean_description(self, value):
+        return '' if value is None else str(value).strip()
+    
+    def clean_due_date(self, value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        if not value:
+            raise ValidationError('This field is required.')
+        try:
+            return self._parse_date(str(value).strip())
+        except ValueError:
+            raise ValidationError('Enter a valid date.')
+    
+    def clean_priority(self, value):
+        try:
+            # bool is an int subclass; True must not pass as priority 1.
+            if not isinstance(value, bool):
+                return self.priorities[value]
+        except (KeyError, TypeError):
+            pass
+        raise ValidationError(
+            f'Select a valid choice. {value} is not one of the available choices.'
+        )
+    
+    def clean_status(self, value):
+        if not isinstance(value, str) or value not in self.statuses:
+            raise ValidationError(
+                f'Select a valid choice. {value} is not one of the available choices.'
+            )
+        return value
+    
+    def clean_tags(self, value):
+        if not value:
+            return []
+        if isinstance(value, str):
+            return list(self._parse_tags(value))
+        return list(self._clean_tag_names(value))
+    
+    def _clean_tag_names(self, value):
+        names = parse_tag_names(value)
+        too_long = [name for name in names if len(name) > self.tag_max_length]
+        if too_long:
+            raise ValidationError(
+                f"Tag names must be at most {self.tag_max_length} characters: {', '.join(too_long)}"
+            )
+        return tuple(names)
+
+
+task_validator = TaskValidator()
@@ -1,72 +1,67 @@
+from datetime import timedelta
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views import View
-from django.views.generic import CreateView, UpdateView, DeleteView
-from django.db.models import Q
-from django.urls import reverse_lazy
-from .models import Task
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
+from .coalesce import coalesce_get
+from .models import QuotaExceededError, Task, StaleTaskError, parse_tag_names, popular_tags
 from .forms import TaskForm
+from .timeline import (
+    CALENDAR_TASK_LIMIT, CALENDAR_VIEWS, calendar_days, calendar_range,
+    day_counts, parse_anchor, tasks_between,
+)
 
 
-class TaskListView(View):
+# Generic class-based views, imported from tasks.class_views on first use.
+CLASS_BASED_VIEWS = ('TaskListView', 'TaskCreateView', 'TaskUpdateView', 'TaskDeleteView')
+
+
+def __getattr__(name):
+    if name in CLASS_BASED_VIEWS:
+        from . import class_views
+        return getattr(class_views, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Most tasks listed by the trash view.
+TRASH_PAGE_SIZE = 200
+
+
+CONFLICT_MESSAGE = (
+    "This task was changed by someone else while you were editing it. "
+    "Submit again to overwrite their changes, or cancel to keep them."
+)
+
+
+def _report_conflict(form, pk):
     """
-    View to display all tasks with filtering and sorting capabilities.
+    Flag an edit conflict on a bound form and rebase it on the latest version.
     
-    GET Parameters:
-    - status: Filter tasks by status (To Do, In Progress, Done)
-    - sort: Sort tasks by 'priority' or 'due_date'
+    Raises Http404 if the task was moved to the trash in the meantime.
     """
-    
-    template_name = 'tasks/task_list.html'
-    
-    def get(self, request):
-        """
-        Handle GET request to display filtered and sorted tasks.
-        """
-        # Get all tasks
-        tasks = Task.objects.all()
-        
-        # Get filter and sort parameters from request
-        status_filter = request.GET.get('status', '')
-        sort_by = request.GET.get('sort', '-created_at')
-        
-        # Apply status filter if provided
-        if status_filter and status_filter in ['To Do', 'In Progress', 'Done']:
-            tasks = tasks.filter(status=status_filter)
-        
-        # Apply sorting
-        valid_sort_fields = [
-            'priority', '-priority',
-            'due_date', '-due_date',
-            'created_at', '-created_at'
-        ]
-        if sort_by in valid_sort_fields:
-            tasks = tasks.order_by(sort_by)
-        else:
-            tasks = tasks.order_by('-created_at')
-        
-        # Prepare context data
-        context = {
-            'tasks': tasks,
-            'status_choices': Task.STATUS_CHOICES,
-            'priority_choices': Task.PRIORITY_CHOICES,
-            'current_status_filter': status_filter,
-            'current_sort': sort_by,
-        }
-        
-        return render(request, self.template_name, context)
+    version = get_object_or_404(Task.objects.values_list('version', flat=True), pk=pk)
+    form.add_error(None, CONFLICT_MESSAGE)
+    form.data = form.data.copy()
+    form.data['version'] = version
 
 
 # Function-based view alternative (optional)
+@coalesce_get
 def task_list(request):
     """
     Function-based view for task list with filtering and sorting.
     
+    Lists the tasks of the request's workspace.
+    
     GET Parameters:
     - status: Filter tasks by status (To Do, In Progress, Done)
     - sort: Sort tasks by 'priority' or 'due_date'
+    - tag: Filter tasks by comma-separated tag names; may be repeated
+    - tag_mode: 'any' (default) or 'all' of the given tags
     """
-    # Get all tasks
-    tasks = Task.objects.all()
+    # Get all tasks of the workspace
+    tasks = Task.objects.filter(workspace=request.workspace)
     
     # Get filter and sort parameters from request
     status_filter = request.GET.get('status', '')
@@ -76,6 +71,11 @@ def task_list(request):
     if status_filter and status_filter in ['To Do', 'In Progress', 'Done']:
         tasks = tasks.filter(status=status_filter)
     
+    # Apply tag filter if provided
+    tag_filter = parse_tag_names(','.join(request.GET.getlist('tag')))
+    tag_mode = 'all' if request.GET.get('tag_mode') == 'all' else 'any'
+    tasks = tasks.with_tags(tag_filter, match=tag_mode, workspace=request.workspace).prefetch_related('tags')
+    
     # Apply sorting
     valid_sort_fields = [
         'priority', '-priority',
@@ -94,76 +94,130 @@ def task_list(request):
         'priority_choices': Task.PRIORITY_CHOICES,
         'current_status_filter': status_filter,
         'current_sort': sort_by,
+        'tag_counts': popular_tags(workspace=request.workspace),
+        'current_tag_filter': tag_filter,
+        'current_tag_mode': tag_mode,
     }
     
     return render(request, 'tasks/task_list.html', context)
 
 
-# Create Task View
-class TaskCreateView(CreateView):
+@coalesce_get
+def task_calendar(request):
     """
-    View to create a new task.
+    Calendar of tasks by due date.
+    
+    GET Parameters:
+    - view: 'month' (default), 'week' or 'agenda'
+    - date: Any day in the period to show, as YYYY-MM-DD (default: today)
+    - status: Filter tasks by status (To Do, In Progress, Done)
+    - tag: Filter tasks by comma-separated tag names; may be repeated
+    - tag_mode: 'any' (default) or 'all' of the given tags
+    
+    The month view shows per-day counts only; week and agenda list the
+    tasks themselves, up to CALENDAR_TASK_LIMIT.
     """
-    model = Task
-    form_class = TaskForm
-    template_name = 'tasks/task_form.html'
-    success_url = reverse_lazy('tasks:task_list')
+    view = request.GET.get('view', 'month')
+    if view not in CALENDAR_VIEWS:
+        view = 'month'
+    anchor = parse_anchor(request.GET.get('date'))
+    status_filter = request.GET.get('status', '')
+    if status_filter not in ['To Do', 'In Progress', 'Done']:
+        status_filter = ''
+    tag_filter = parse_tag_names(','.join(request.GET.getlist('tag')))
+    tag_mode = 'all' if request.GET.get('tag_mode') == 'all' else 'any'
+    
+    start, end, previous, following = calendar_range(view, anchor)
+    counts = day_counts(request.workspace, start, end, status_filter, tag_filter, tag_mode)
+    days = calendar_days(start, end, counts)
+    
+    context = {
+        'view': view,
+        'anchor': anchor,
+        'start': start,
+        'end': end,
+        'last': end - timedelta(days=1),
+        'previous': previous,
+        'next': following,
+        'status_choices': Task.STATUS_CHOICES,
+        'current_status_filter': status_filter,
+        'current_tag_filter': tag_filter,
+        'current_tag_mode': tag_mode,
+        # Keeps the filters when navigating between periods and views.
+        'filter_query': urlencode({
+            'status': status_filter,
+            'tag': ', '.join(tag_filter),
+            'tag_mode': tag_mode,
+        }),
+        'truncated': False,
+    }
+    if view == 'month':
+        context['weeks'] = [days[i:i + 7] for i in range(0, len(days), 7)]
+    else:
+        tasks = list(
+            tasks_between(request.workspace, start, end, status_filter, tag_filter, tag_mode)
+            .order_by('due_date', 'priority', 'pk')
+            .prefetch_related('tags')[:CALENDAR_TASK_LIMIT + 1]
+        )
+        context['truncated'] = len(tasks) > CALENDAR_TASK_LIMIT
+        by_day = {}
+        for task in tasks[:CALENDAR_TASK_LIMIT]:
+            by_day.setdefault(task.due_date, []).append(task)
+        # The agenda skips empty days; the week shows all seven.
+        context['days'] = [
+            (day, count, by_day.get(day, []))
+            for day, count in days
+            if count or view == 'week'
+        ]
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['title'] = 'Add New Task'
-        context['button_text'] = 'Create Task'
-        return context
+    return render(request, 'tasks/task_calendar.html', context)
 
 
 def add_task(request):
     """
     Function-based view to add a new task.
     """
+    status = 200
+    
     if request.method == 'POST':
-        form = TaskForm(request.POST)
+        form = TaskForm(request.POST, workspace=request.workspace)
         if form.is_valid():
-            form.save()
-            return redirect('tasks:task_list')
+            try:
+                form.save(user=request.user)
+            except QuotaExceededError as exc:
+                form.add_error(None, str(exc))
+                status = 403
+            else:
+                return redirect('tasks:task_list')
     else:
-        form = TaskForm()
+        form = TaskForm(workspace=request.workspace)
     
     context = {
         'form': form,
         'title': 'Add New Task',
         'button_text': 'Create Task',
     }
-    return render(request, 'tasks/task_form.html', context)
-
-
-# Update Task View
-class TaskUpdateView(UpdateView):
-    """
-    View to edit an existing task.
-    """
-    model = Task
-    form_class = TaskForm
-    template_name = 'tasks/task_form.html'
-    success_url = reverse_lazy('tasks:task_list')
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['title'] = f'Edit Task: {self.object.title}'
-        context['button_text'] = 'Update Task'
-        return context
+    return render(request, 'tasks/task_form.html', context, status=status)
 
 
 def edit_task(request, pk):
     """
     Function-based view to edit a task.
     """
-    task = get_object_or_404(Task, pk=pk)
+    task = get_object_or_404(Task, pk=pk, workspace=request.workspace)
+    
+    status = 200
     
     if request.method == 'POST':
         form = TaskForm(request.POST, instance=task)
         if form.is_valid():
-            form.save()
-            return redirect('tasks:task_list')
+            try:
+                form.save(user=request.user)
+            except StaleTaskError:
+                _report_conflict(form, pk)
+                status = 409
+            else:
+                return redirect('tasks:task_list')
     else:
         form = TaskForm(instance=task)
     
@@ -173,31 +227,56 @@ def edit_task(request, pk):
         'title': f'Edit Task: {task.title}',
         'button_text': 'Update Task',
     }
-    return render(request, 'tasks/task_form.html', context)
-
-
-# Delete Task View
-class TaskDeleteView(DeleteView):
-    """
-    View to delete a task.
-    """
-    model = Task
-    template_name = 'tasks/task_confirm_delete.html'
-    success_url = reverse_lazy('tasks:task_list')
+    return render(request, 'tasks/task_form.html', context, status=status)
 
 
 def delete_task(request, pk):
     """
-    Function-based view to delete a task.
+    Function-based view to move a task and its subtasks to the trash.
     """
-    task = get_object_or_404(Task, pk=pk)
+    task = get_object_or_404(Task, pk=pk, workspace=request.workspace)
     
     if request.method == 'POST':
-        task.delete()
+        task.soft_delete(user=request.user)
         return redirect('tasks:task_list')
     
     context = {
         'task': task,
+        'retention_days': settings.TASKS_TRASH_RETENTION_DAYS,
     }
     return render(request, 'tasks/task_confirm_delete.html', context)
 
+
+def task_trash(request):
+    """
+    Tasks in the trash, most recently deleted first.
+    
+    Shows up to TRASH_PAGE_SIZE tasks, read through the partial index on
+    (workspace, deleted_at) that only covers trashed tasks.
+    """
+    tasks = list(
+        Task.all_objects.filter(workspace=request.workspace, deleted_at__isnull=False)
+        .order_by('-deleted_at')[:TRASH_PAGE_SIZE + 1]
+    )
+    context = {
+        'tasks': tasks[:TRASH_PAGE_SIZE],
+        'truncated': len(tasks) > TRASH_PAGE_SIZE,
+        'retention_days': settings.TASKS_TRASH_RETENTION_DAYS,
+    }
+    return render(request, 'tasks/task_trash.html', context)
+
+
+@require_POST
+def restore_task(request, pk):
+    """
+    Take a task out of the trash, with the subtasks deleted along with it.
+    """
+    task = get_object_or_404(
+        Task.all_objects.filter(workspace=request.workspace, deleted_at__isnull=False), pk=pk
+    )
+    try:
+        task.restore(user=request.user)
+    except QuotaExceededError as exc:
+        return HttpResponse(str(exc), status=403, content_type='text/plain')
+    return redirect('tasks:task_trash')
+